@@ -1,6 +1,14 @@
+import hashlib
+import os
+import secrets
+import threading
+
 import numpy as np
 import pandas as pd
 
+from grid_history import GridHistory, VALUATION_DATE, dated_rows, history_path, read_history, valuation_dates
+from tracing import span, traced
+
 # --- OIS Curve Mapping ---
 ois_curve_map = {
     "USD": "USD.OIS",
@@ -9,118 +17,311 @@ ois_curve_map = {
     "JPY": "JPY.OIS"
 }
 #--- Load Observability Grids ---
-ir_grid = pd.read_csv("ir_delta_observability_grid.csv")
-ir_grid.columns = ir_grid.columns.str.strip()
-ir_grid["Observable Tenor (Years)"] = pd.to_numeric(ir_grid["Observable Tenor (Years)"], errors="coerce")
-vol_grid = pd.read_csv("volatility_observability_grid.csv")
-vol_grid.columns = vol_grid.columns.str.strip()
+def _clean_ir_grid(ir_grid):
+    ir_grid = ir_grid.rename(columns={"Stress Factor (%)": "Stress Factor"})
+    ir_grid["Stress Factor"] = pd.to_numeric(ir_grid["Stress Factor"], errors="coerce")
+    ir_grid["Observable Tenor (Years)"] = pd.to_numeric(ir_grid["Observable Tenor (Years)"], errors="coerce")
+    return ir_grid
+
+
+def load_observability_grids(ir_path="ir_delta_observability_grid.csv", vol_path="volatility_observability_grid.csv"):
+    ir_grid = pd.read_csv(ir_path)
+    ir_grid.columns = ir_grid.columns.str.strip()
+    ir_grid = _clean_ir_grid(ir_grid)
+    vol_grid = pd.read_csv(vol_path)
+    vol_grid.columns = vol_grid.columns.str.strip()
+    return ir_grid, vol_grid
+
+
+# Bond credit spread and cap/floor caplet vol grids, keyed by currency
+def load_product_grids(credit_path="credit_spread_observability_grid.csv", caplet_path="caplet_vol_observability_grid.csv"):
+    credit_grid = pd.read_csv(credit_path)
+    credit_grid.columns = credit_grid.columns.str.strip()
+    caplet_grid = pd.read_csv(caplet_path)
+    caplet_grid.columns = caplet_grid.columns.str.strip()
+    return credit_grid, caplet_grid
+
+
+# Loaded once per process on import and shared by every caller
+ir_grid, vol_grid = load_observability_grids()
+credit_grid, caplet_grid = load_product_grids()
+
+IR_GRID_FILE = "ir_delta_observability_grid.csv"
+VOL_GRID_FILE = "volatility_observability_grid.csv"
+CREDIT_GRID_FILE = "credit_spread_observability_grid.csv"
+CAPLET_GRID_FILE = "caplet_vol_observability_grid.csv"
+GRID_FILES = [IR_GRID_FILE, VOL_GRID_FILE, CREDIT_GRID_FILE, CAPLET_GRID_FILE]
+
+
+# Dated grid versions (grid_history.py) for trades that carry a valuation date, one history per grid file.
+# Rules look the history up at call time, so a reloaded set applies to every product.
+def load_grid_histories(root=None):
+    return {
+        IR_GRID_FILE: GridHistory(dated_rows(ir_grid, read_history(history_path(IR_GRID_FILE, root), _clean_ir_grid),
+                                             ["Curve ID"]), "Curve ID"),
+        VOL_GRID_FILE: GridHistory(dated_rows(vol_grid, read_history(history_path(VOL_GRID_FILE, root)),
+                                              ["Risk Type", "Currency"]), "Currency"),
+        CREDIT_GRID_FILE: GridHistory(dated_rows(credit_grid, read_history(history_path(CREDIT_GRID_FILE, root)),
+                                                 ["Currency"]), "Currency"),
+        CAPLET_GRID_FILE: GridHistory(dated_rows(caplet_grid, read_history(history_path(CAPLET_GRID_FILE, root)),
+                                                 ["Currency"]), "Currency"),
+    }
+
+
+grid_histories = load_grid_histories()
+
+
+# Content hash of the grid files and their histories, recorded with every audited decision
+def grid_version(paths=GRID_FILES):
+    digest = hashlib.sha256()
+    for path in paths + [history_path(path) for path in paths]:
+        if path in paths or os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+GRID_VERSION = grid_version()
+
+
+# --- Observability rules: trades frame -> (observable mask, stress factor) per risk factor ---
+# A factor is observable when a grid row for the trade's key covers every limit; otherwise it
+# is stressed by the first grid row's factor for that key (1.0 when the key is not in the grid).
+# Trades with a valuation date (or a known_at) are tested against the dated grid rows in force on that
+# date instead, all dates in the same pass; `history` returns the grid's GridHistory.
+def grid_rule(grid, key_column, trade_key, limits, history):
+    def rule(trades, known_at=None):
+        keys = trade_key(trades)
+        if VALUATION_DATE in trades.columns or known_at is not None:
+            return dated_rule(history().as_of(known_at), trades, keys, limits)
+        observable = np.zeros(len(trades), dtype=bool)
+        for _, row in grid.iterrows():
+            covered = keys == row[key_column]
+            for grid_column, trade_value in limits.items():
+                covered &= trade_value(trades) <= row[grid_column]
+            observable |= covered
+        factors = grid.drop_duplicates(key_column).set_index(key_column)["Stress Factor"]
+        return observable, pd.Series(keys).map(factors).fillna(1.0).to_numpy(dtype=float)
+    return rule
+
+
+def dated_rule(grid, trades, keys, limits):
+    ids = grid.lookup(keys, valuation_dates(trades))
+    found = ids >= 0
+    observable = np.zeros(len(trades), dtype=bool)
+    # Usually one grid row per key and interval; rank r tests each interval's r-th row
+    for rank in range(grid.depth):
+        covered = found & (grid.count[ids] > rank)
+        row = np.where(covered, grid.first[ids] + rank, 0)
+        for grid_column, trade_value in limits.items():
+            covered &= trade_value(trades) <= grid.rows[grid_column].to_numpy(dtype=float)[row]
+        observable |= covered
+    return observable, grid.factors[ids]
+
+
+def _curve_ids(trades):
+    # Plain strings first: a categorical currency (trade_schema uploads) cannot take the "UNKNOWN" fill
+    return trades["currency"].astype(object).map(ois_curve_map).fillna("UNKNOWN").to_numpy()
+
+
+def _currencies(trades):
+    return trades["currency"].to_numpy()
+
+
+def ir_bucket_rule(tenor_years):
+    return grid_rule(ir_grid, "Curve ID", _curve_ids, {"Observable Tenor (Years)": lambda trades: tenor_years},
+                     lambda: grid_histories[IR_GRID_FILE])
+
+
+def swaption_vol_rule(risk):
+    return grid_rule(vol_grid[vol_grid["Risk Type"] == risk], "Currency", _currencies, {
+        "Max Observable Tenor": lambda trades: trades["maturity_tenor"].to_numpy(dtype=float),
+        "Max Observable Expiry": lambda trades: trades["expiry_tenor"].to_numpy(dtype=float)
+    }, lambda: grid_histories[VOL_GRID_FILE].subset("Risk Type", risk))
+
+
+def caplet_vol_rule(expiry_years):
+    return grid_rule(caplet_grid, "Currency", _currencies, {"Max Observable Expiry": lambda trades: expiry_years},
+                     lambda: grid_histories[CAPLET_GRID_FILE])
+
+
+credit_spread_rule = grid_rule(credit_grid, "Currency", _currencies, {
+    "Max Observable Maturity": lambda trades: trades["maturity_tenor"].to_numpy(dtype=float)
+}, lambda: grid_histories[CREDIT_GRID_FILE])
+
+
+# --- Vectorized greek generators: trades frame -> one column per risk factor ---
+def _base(trades):
+    return trades["notional"].to_numpy(dtype=float) / 1_000_000
+
+
+def _tenor_factor(trades):
+    return trades["maturity_tenor"].to_numpy(dtype=float) / 10
+
+
+def _live_buckets(trades, tenors):
+    # Buckets up to the first one at or beyond maturity carry risk; later buckets are zero
+    maturity = trades["maturity_tenor"].to_numpy(dtype=float)[:, None]
+    previous = np.array([0] + list(tenors[:-1]), dtype=float)[None, :]
+    return previous < maturity
+
+
+IR_TENORS = [1, 5, 10, 30]
+IR_WEIGHTS = [0.5, 1.0, 1.5, 2.0]
+BOND_LADDER = [1, 2, 5, 10, 20, 30]
+CAPLET_EXPIRIES = [1, 2, 5, 10]
+
+
+def _ir_delta_columns(trades, scale=1.0):
+    base, tenor_factor = _base(trades), _tenor_factor(trades)
+    return {f"IRDelta {t}Y": base * w * scale * tenor_factor for t, w in zip(IR_TENORS, IR_WEIGHTS)}
+
+
+def swaption_greeks(trades):
+    base = _base(trades)
+    vol_factor = 0.01 * np.random.uniform(0.8, 1.2, len(trades))
+    return pd.DataFrame({
+        **_ir_delta_columns(trades),
+        "Vega": base * 0.6 * vol_factor,
+        "Vanna": base * 0.3 * vol_factor,
+        "Volga": base * 0.4 * vol_factor,
+    }, index=trades.index)
+
+
+def swap_greeks(trades):
+    return pd.DataFrame(_ir_delta_columns(trades), index=trades.index)
+
+
+def bond_greeks(trades):
+    base = _base(trades)
+    live = _live_buckets(trades, BOND_LADDER)
+    maturity = trades["maturity_tenor"].to_numpy(dtype=float)
+    spread_factor = np.random.uniform(0.8, 1.2, len(trades))
+    columns = {f"IRDelta {t}Y": base * 0.1 * min(t, 10) * live[:, i] for i, t in enumerate(BOND_LADDER)}
+    columns["Credit Spread 01"] = base * 0.08 * maturity * spread_factor
+    return pd.DataFrame(columns, index=trades.index)
+
+
+def capfloor_greeks(trades):
+    base = _base(trades)
+    live = _live_buckets(trades, CAPLET_EXPIRIES)
+    vol_factor = 0.01 * np.random.uniform(0.8, 1.2, len(trades))
+    columns = _ir_delta_columns(trades, scale=0.5)
+    for i, t in enumerate(CAPLET_EXPIRIES):
+        columns[f"Caplet Vega {t}Y"] = base * 0.4 * vol_factor * live[:, i]
+    return pd.DataFrame(columns, index=trades.index)
+
+
+# --- Product registry: greek generator plus (risk factor, test group, observability rule) ---
+# Group "ir" feeds the IR delta test and ir_summary; "vol" feeds the volatility / spread test and vol_summary.
+PRODUCT_RISK = {}
+
+
+def register_product(product_type, greeks, factors):
+    PRODUCT_RISK[product_type] = {"greeks": greeks, "factors": factors}
+
+
+def _ir_factors(tenors):
+    return [(f"IRDelta {t}Y", "ir", ir_bucket_rule(t)) for t in tenors]
+
+
+DEFAULT_PRODUCT = "IR Swaption"
+register_product("IR Swaption", swaption_greeks, _ir_factors(IR_TENORS) + [
+    (risk, "vol", swaption_vol_rule(risk)) for risk in ["Vega", "Vanna", "Volga"]
+])
+register_product("IRSwap", swap_greeks, _ir_factors(IR_TENORS))
+register_product("Bond", bond_greeks, _ir_factors(BOND_LADDER) + [("Credit Spread 01", "vol", credit_spread_rule)])
+register_product("CapFloor", capfloor_greeks, _ir_factors(IR_TENORS) + [
+    (f"Caplet Vega {t}Y", "vol", caplet_vol_rule(t)) for t in CAPLET_EXPIRIES
+])
+
+
+def product_risk(product_type):
+    # Unknown products are stressed as swaptions, as every product was before the registry
+    return PRODUCT_RISK.get(product_type, PRODUCT_RISK[DEFAULT_PRODUCT])
+
+
+def simulate_greeks_frame(trades):
+    # Unrounded: a factor is live wherever its sensitivity is non-zero, however small
+    return product_risk(trades["product_type"].iloc[0])["greeks"](trades)
+
+
+def generate_pv_frame(greeks):
+    # One PV per live risk factor; factors with zero sensitivity (e.g. bond buckets past maturity) carry no PV
+    draws = np.random.uniform(5000, 20000, greeks.shape).round(2)
+    return pd.DataFrame(np.where(greeks.to_numpy() != 0, draws, 0.0), index=greeks.index,
+                        columns=[f"{name} PV" for name in greeks.columns])
 
 
 # Generate Risk Factors
+@traced("stress.simulate_greeks")
 def simulate_greeks(trade):
-
-    base = trade["notional"] / 1_000_000
-    tenor_factor = trade["maturity_tenor"] / 10
-    vol_factor = 0.01 * np.random.uniform(0.8, 1.2)
+    trades = pd.DataFrame([trade])
+    greeks = simulate_greeks_frame(trades).iloc[0]
     return {
         "OIS Curve": ois_curve_map.get(trade["currency"], "UNKNOWN"),
-        "IRDelta 1Y": round(base * 0.5 * tenor_factor, 2),
-        "IRDelta 5Y": round(base * 1.0 * tenor_factor, 2),
-        "IRDelta 10Y": round(base * 1.5 * tenor_factor, 2),
-        "IRDelta 30Y": round(base * 2.0 * tenor_factor, 2),
-        "Vega": round(base * 0.6 * vol_factor, 2),
-        "Vanna": round(base * 0.3 * vol_factor, 2),
-        "Volga": round(base * 0.4 * vol_factor, 2),
+        **{name: round(float(value), 2) for name, value in greeks.items() if value != 0}
     }
 
 # Generate Trade PV and Risk Factor PVs
 def generate_trade_pv_and_risk_pvs(greeks):
     pv_greeks = {}
     total_pv = 0
-    for key in ["IRDelta 1Y", "IRDelta 5Y", "IRDelta 10Y", "IRDelta 30Y", "Vega", "Vanna", "Volga"]:
+    for key, value in greeks.items():
+        if key == "OIS Curve" or key.endswith(" PV"):
+            continue
         pv = round(np.random.uniform(5000, 20000), 2)
         pv_greeks[key + " PV"] = pv
         total_pv += abs(pv)
     return total_pv, pv_greeks
 
-# IR Delta Stress Test
-def ir_delta_stress_test(trade, greeks):
-    messages = []
-    stressed = {}
-    report = {}
-    total_stress_pv = 0
-
-    curve_id = ois_curve_map[trade["currency"]]
 
-    # ✅ Rename before using the column
-    ir_grid.rename(columns={"Stress Factor (%)": "Stress Factor"}, inplace=True)
-    ir_grid["Stress Factor"] = pd.to_numeric(ir_grid["Stress Factor"], errors="coerce")
-    ir_grid["Observable Tenor (Years)"] = pd.to_numeric(ir_grid["Observable Tenor (Years)"], errors="coerce")
+# Seeded single-trade simulation - an audited decision records its seed so the greeks and PVs can be
+# drawn again. The global NumPy state is swapped out around the draw so other callers are unaffected.
+_seed_lock = threading.Lock()
 
-    for tenor in ["1Y", "5Y", "10Y", "30Y"]:
-        col_name = f"IRDelta {tenor}"
-        tenor_years = int(tenor.strip("Y"))
-        base_pv = greeks.get(col_name + " PV", 0)
 
-        grid_row = ir_grid[
-            (ir_grid["Curve ID"] == curve_id) &
-            (ir_grid["Observable Tenor (Years)"] >= tenor_years)
-        ]
+def new_seed():
+    return secrets.randbits(32)
 
-        observable = not grid_row.empty
-        if observable:
-            stress_factor = 0.0
-            stressed_pv = base_pv * stress_factor
-        else:
-            fallback_row = ir_grid[ir_grid["Curve ID"] == curve_id]
-            stress_factor = fallback_row["Stress Factor"].values[0] if not fallback_row.empty else 1.0
-            stressed_pv = base_pv * stress_factor
-            messages.append(f"⚠️ {col_name} for {curve_id} risk considered Unobservable")
-            total_stress_pv += abs(stressed_pv)
 
-        stressed[col_name] = stressed_pv
-        report[col_name] = {
-            "Observable": observable,
-            "Base PV": base_pv,
-            "Stressed PV": stressed_pv,
-            "StressFactor": stress_factor if not observable else 0.0
-        }
+def simulate_trade(trade, seed):
+    with _seed_lock:
+        state = np.random.get_state()
+        np.random.seed(seed)
+        try:
+            greeks = simulate_greeks(trade)
+            trade_pv, generated_pvs = generate_trade_pv_and_risk_pvs(greeks)
+        finally:
+            np.random.set_state(state)
+    return greeks, trade_pv, generated_pvs
 
-    return stressed, report, total_stress_pv, messages
 
-# Volatility Risk Stress Test
-def vol_risk_stress_test(trade, greeks):
+# Single-trade stress for one test group, over the factors the trade's greeks carry
+def _stress_group(trade, greeks, group, known_at=None):
     messages = []
     stressed = {}
     report = {}
     total_stress_pv = 0
+    trades = pd.DataFrame([trade])
+    curve_id = ois_curve_map.get(trade["currency"], "UNKNOWN")
 
-    for risk in ["Vega", "Vanna", "Volga"]:
-        base_pv = greeks.get(risk + " PV", 0)
-
-        grid_row = vol_grid[
-            (vol_grid["Risk Type"] == risk) &
-            (vol_grid["Currency"] == trade["currency"]) &
-            (vol_grid["Max Observable Tenor"] >= trade["maturity_tenor"]) &
-            (vol_grid["Max Observable Expiry"] >= trade["expiry_tenor"])
-        ]
-
-        observable = not grid_row.empty
+    for name, factor_group, rule in product_risk(trade.get("product_type"))["factors"]:
+        if factor_group != group or name not in greeks:
+            continue
+        base_pv = greeks.get(name + " PV", 0)
+        observable, stress_factor = rule(trades, known_at)
+        observable, stress_factor = bool(observable[0]), float(stress_factor[0])
         if observable:
-            stress_factor = 0.0
-            stressed_pv = base_pv * stress_factor
+            stressed_pv = 0.0
         else:
-            fallback_row = vol_grid[
-                (vol_grid["Risk Type"] == risk) &
-                (vol_grid["Currency"] == trade["currency"])
-            ]
-            stress_factor = fallback_row["Stress Factor"].values[0] if not fallback_row.empty else 1.0
             stressed_pv = base_pv * stress_factor
-            messages.append(f"⚠️ {risk} risk considered Unobservable")
+            messages.append(f"⚠️ {name} for {curve_id} risk considered Unobservable" if group == "ir"
+                            else f"⚠️ {name} risk considered Unobservable")
             total_stress_pv += abs(stressed_pv)
 
-        stressed[risk] = stressed_pv
-        report[risk] = {
+        stressed[name] = stressed_pv
+        report[name] = {
             "Observable": observable,
             "Base PV": base_pv,
             "Stressed PV": stressed_pv,
@@ -129,16 +330,28 @@ def vol_risk_stress_test(trade, greeks):
 
     return stressed, report, total_stress_pv, messages
 
+
+# IR Delta Stress Test
+@traced("stress.ir_delta")
+def ir_delta_stress_test(trade, greeks, known_at=None):
+    return _stress_group(trade, greeks, "ir", known_at)
+
+# Volatility Risk Stress Test (vol buckets for swaptions and caps/floors, credit spread for bonds)
+@traced("stress.vol")
+def vol_risk_stress_test(trade, greeks, known_at=None):
+    return _stress_group(trade, greeks, "vol", known_at)
+
 # Decion Maker - Combine & Final Assessment
-def run_full_observability_stress_test(trade, greeks):
+# known_at: test against the grids as recorded at that time (as run_observability_for_frame does)
+def run_full_observability_stress_test(trade, greeks, known_at=None):
     # Ensure PVs are generated
     if "trade_pv" not in trade:
         trade["trade_pv"], generated_pvs = generate_trade_pv_and_risk_pvs(greeks)
         greeks.update(generated_pvs)
 
     # Run individual stress tests
-    ir_stressed, ir_report, ir_stress_pv, ir_msgs = ir_delta_stress_test(trade, greeks)
-    vol_stressed, vol_report, vol_stress_pv, vol_msgs = vol_risk_stress_test(trade, greeks)
+    ir_stressed, ir_report, ir_stress_pv, ir_msgs = ir_delta_stress_test(trade, greeks, known_at)
+    vol_stressed, vol_report, vol_stress_pv, vol_msgs = vol_risk_stress_test(trade, greeks, known_at)
 
     total_stress_pv = ir_stress_pv + vol_stress_pv
     final_level = "Level 3" if total_stress_pv > 0.1 * trade["trade_pv"] else "Level 2"
@@ -152,3 +365,96 @@ def run_full_observability_stress_test(trade, greeks):
 
     messages = ir_msgs + vol_msgs
     return final_stressed, final_report, messages
+
+
+# Process-pool initializer - forked workers inherit the parent's NumPy state; reseed so they draw different greeks
+def reseed_worker():
+    np.random.seed()
+
+
+# --- Batch stress: one vectorized pass per product group ---
+def _summaries(unobservable, names, labels):
+    # Identical (unobservable factors, label) patterns share one summary string
+    if not names:
+        return np.full(len(labels), "", dtype=object)
+    pattern = np.packbits(unobservable, axis=1, bitorder="little")
+    keys = pd.MultiIndex.from_arrays([labels] + [pattern[:, i] for i in range(pattern.shape[1])])
+    codes, uniques = pd.factorize(keys)
+    text = []
+    for i, key in enumerate(uniques):
+        row = unobservable[np.argmax(codes == i)]
+        text.append("\n".join(
+            f"⚠️ {name} for {key[0]} risk considered Unobservable" if key[0] else f"⚠️ {name} risk considered Unobservable"
+            for name, flag in zip(names, row) if flag
+        ))
+    return np.array(text, dtype=object)[codes]
+
+
+# One product's stress on greek and PV arrays (rows x the product's factors, in registry order):
+# (trade PV, unobservable stress PV, unobservable mask) per trade
+def stress_arrays(trades, spec, greeks, pvs, known_at=None):
+    live = greeks != 0
+    trade_pv = np.abs(pvs).sum(axis=1)
+    total_stress_pv = np.zeros(len(trades))
+    unobservable = np.zeros(live.shape, dtype=bool)
+    for i, (name, group, rule) in enumerate(spec["factors"]):
+        observable, stress_factor = rule(trades, known_at)
+        unobservable[:, i] = live[:, i] & ~observable
+        total_stress_pv += np.where(unobservable[:, i], np.abs(pvs[:, i] * stress_factor), 0.0)
+    return trade_pv, total_stress_pv, unobservable
+
+
+def stress_product_frame(trades, product_type, detail=False, known_at=None):
+    spec = product_risk(product_type)
+    greeks = spec["greeks"](trades)
+    pvs = generate_pv_frame(greeks).to_numpy()
+    live = greeks.to_numpy() != 0
+    trade_pv, total_stress_pv, unobservable_all = stress_arrays(trades, spec, greeks.to_numpy(), pvs, known_at)
+
+    summaries = {}
+    for group, labels in (("ir", _curve_ids(trades)), ("vol", np.full(len(trades), ""))):
+        columns = [i for i, (_, factor_group, _) in enumerate(spec["factors"]) if factor_group == group]
+        summaries[group] = _summaries(unobservable_all[:, columns], [spec["factors"][i][0] for i in columns], labels)
+
+    result = pd.DataFrame({
+        "ir_summary": summaries["ir"],
+        "vol_summary": summaries["vol"],
+        "Trade PV": trade_pv.round(2),
+        "Unobservable PV": total_stress_pv.round(2),
+        "Observability Level": np.where(total_stress_pv > 0.1 * trade_pv, "Level 3", "Level 2")
+    }, index=trades.index)
+    if detail:
+        # Per-trade greeks, PVs and unobservable factors, in the single-trade layout (audit log records)
+        names = list(greeks.columns)
+        values = greeks.to_numpy()
+        result["greeks"] = [
+            {names[i]: float(values[row, i]) for i in np.flatnonzero(live[row])} for row in range(len(trades))
+        ]
+        result["risk_pvs"] = [
+            {f"{names[i]} PV": float(pvs[row, i]) for i in np.flatnonzero(live[row])} for row in range(len(trades))
+        ]
+        result["unobservable"] = [[names[i] for i in np.flatnonzero(row)] for row in unobservable_all]
+    return result
+
+
+# Batch helper - simulate and stress every trade row of a DataFrame, grouped by product.
+# detail=True adds the per-trade greeks, risk_pvs and unobservable columns. With a valuation_date column
+# each trade is tested against the grids valid on its date; known_at replays the grids as recorded then.
+def run_observability_for_frame(trades_df, detail=False, known_at=None):
+    products = trades_df["product_type"].astype(object)
+    products = products.where(products.isin(list(PRODUCT_RISK)), DEFAULT_PRODUCT)
+    columns = ["ir_summary", "vol_summary", "Trade PV", "Unobservable PV", "Observability Level"]
+    if detail:
+        columns += ["greeks", "risk_pvs", "unobservable"]
+    result = pd.DataFrame(index=range(len(trades_df)), columns=columns)
+    if VALUATION_DATE in trades_df.columns:
+        trades_df = trades_df.assign(**{VALUATION_DATE: valuation_dates(trades_df)})  # parsed once, not per rule
+    with span("stress.batch", rows=len(trades_df)):
+        for product_type, positions in pd.Series(range(len(trades_df))).groupby(products.to_numpy()).groups.items():
+            with span("stress.product", product=product_type, rows=len(positions)):
+                group = trades_df.iloc[positions]
+                result.iloc[positions] = stress_product_frame(group, product_type, detail, known_at).to_numpy()
+    result["Trade PV"] = result["Trade PV"].astype(float)
+    result["Unobservable PV"] = result["Unobservable PV"].astype(float)
+    result.index = trades_df.index
+    return result
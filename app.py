@@ -5,15 +5,24 @@ import os
 import json
 import time
 from datetime import date
-from openai import AzureOpenAI
+from streamlit.errors import StreamlitAPIException
 from Observability_Stress_Module import (
     run_full_observability_stress_test,
-    simulate_greeks,
+    simulate_trade,
+    new_seed,
     ir_delta_stress_test,
     vol_risk_stress_test,
-    generate_trade_pv_and_risk_pvs,
     ois_curve_map
 )
+from audit_log import get_audit_log, rationale_hash, report_decision
+from ml_client import build_payload, get_ml_endpoint
+from shared_resources import get_ml_dispatcher, get_openai_client
+from session_store import get_artifact, get_artifact_store, has_artifacts, put_artifact
+from tracing import traced
+from what_if import mark_fresh, what_if_sidebar
+from gpt_client import build_rationale_messages, chat_completion, stream_chat_completion
+from classification_rules import classify_trade
+from rationale_templates import rationale_from_reports, route_rationale, routing_stats
 from workflow_styles import (
     get_workflow_css,
     get_workflow_html_ml,
@@ -26,13 +35,6 @@ for key in ["ml_done", "rf_done", "rat_done"]:
     if key not in st.session_state:
         st.session_state[key] = False
 
-# --- Load Observability Grids ---
-ir_grid = pd.read_csv("ir_delta_observability_grid.csv")
-ir_grid.columns = ir_grid.columns.str.strip()
-ir_grid["Observable Tenor (Years)"] = pd.to_numeric(ir_grid["Observable Tenor (Years)"], errors="coerce")
-vol_grid = pd.read_csv("volatility_observability_grid.csv")
-vol_grid.columns = vol_grid.columns.str.strip()
-
 # --- Page Config ---
 st.set_page_config(page_title="FAIR&SQ - IFRS13 Fair Value Classification Model", layout="wide")
 
@@ -93,318 +95,362 @@ trade = {
     "notional": notional
 }
 
-# --- Model Prediction Mock ---
-def mock_model_prediction(trade):
-    if trade["expiry_tenor"] < 5 and trade["maturity_tenor"] < 15 and trade["strike"] < 3.0:
-        return "Level 2"
-    return "Level 3"
-
 # --- Azure GPT-4o Client ---
-def get_rationale_from_gpt(ir_summary, vol_summary, model_pred):
-    client = AzureOpenAI(
-        api_key=st.secrets["AZURE_OPENAI_API_KEY"],
-        api_version="2024-02-01",
-        azure_endpoint=st.secrets["AZURE_OPENAI_ENDPOINT"]
-    )
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a financial analyst who explains IFRS 13 classification decisions "
-                "clearly and concisely based on input data. Do not include background information "
-                "about IFRS 13. Focus strictly on justifying the classification result."
-            )
-        },
-        {
-            "role": "user",
-            "content": (
-                f"IR Delta Observability Summary: {ir_summary}\n\n"
-                f"Volatility Observability Summary: {vol_summary}\n\n"
-                f"Model Predicted Level: {model_pred}\n\n"
-                "Analyze Model predicted IFRS 13 level and risk factor observability results (using 10% threshold on trade PV) and decide on the IFRS 13 level for the trade. "
-                "Display the chosen level in bold and provide a brief, direct justification for the predicted IFRS 13 level. "
-                "Conclude with a single line that summarizes confidence level High, Medium or Low and the reasoning or notes confidence in the classification."
-            )
-        }
-    ]
-    response = client.chat.completions.create(
-        model=st.secrets["AZURE_OPENAI_MODEL"],
-        messages=messages,
-        temperature=0.5
+def get_rationale_from_gpt(ir_summary, vol_summary, model_pred, refresh=False, stream=False):
+    messages = build_rationale_messages(ir_summary, vol_summary, model_pred)
+    if stream:
+        # Generator of text deltas, rendered incrementally by the caller
+        return stream_chat_completion(messages, temperature=0.5, refresh=refresh, client=get_openai_client())
+    return chat_completion(messages, temperature=0.5, refresh=refresh, client=get_openai_client())
+
+def render_rationale_box(target, text):
+    target.markdown(
+        f"""<div style='background-color:#f1f1f1;color:#000000;padding:10px;
+        border-left:5px solid #0078D7;border-radius:5px'>
+        <b>Explanation:</b><br>{text}</div>""",
+        unsafe_allow_html=True
     )
-    return response.choices[0].message.content
-
-import requests
 
 def call_azure_ml_model(trade):
-    # Format the input in Azure expected tabular format
-    payload = {
-        "input_data": {
-            "columns": [
-                "product_type",
-                "currency",
-                "option_type",
-                "notional",
-                "strike",
-                "expiry_tenor",
-                "maturity_tenor"
-            ],
-            "index": [0],
-            "data": [[
-                trade["product_type"],
-                trade["currency"],
-                trade["option_type"],
-                trade["notional"],
-                trade["strike"],
-                trade["expiry_tenor"],
-                trade["maturity_tenor"]
-            ]]
-        }
-    }
-
-    endpoint = os.getenv("AZURE_ML_ENDPOINT", st.secrets.get("AZURE_ML_ENDPOINT", ""))
-    api_key =  os.getenv("AZURE_ML_API_KEY", st.secrets.get("AZURE_ML_API_KEY", ""))
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-
-    response = requests.post(endpoint, headers=headers, json=payload)
-    response.raise_for_status()  # Raise an error if bad response
+    # Single-trade requests from every session are coalesced into shared multi-row calls.
+    # While the endpoint is unhealthy (circuit open, timeout, error) use the rule-based fallback.
+    try:
+        return get_ml_dispatcher().predict(trade), False
+    except Exception:
+        return classify_trade(trade), True
+
+# --- What-if mode: sidebar edits recompute only the stale stages, debounced ---
+what_if_sidebar(trade, ["model", "greeks", "stress"], predict=call_azure_ml_model)
+
+# --- Workflow sections ---
+# Each section is a fragment: its buttons rerun only that section instead of the whole
+# script (grids, sidebar and the other two sections). Sections exchange results through
+# session state; the sidebar badges are placeholders the fragments fill in place.
+ml_badge = st.sidebar.empty()
+rf_badge = st.sidebar.empty()
+
+def rerun_section():
+    # Redraw only the calling section; a full script run (no fragment rerun in
+    # progress) cannot rerun a single fragment, so it reruns the app instead
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
 
-    result = response.json()
-    return result[0]  # e.g., "Level 3"
+def render_ml_badge():
+    if "model_pred" in st.session_state:
+        ml_badge.markdown(f"""
+        <div style='background-color:#d4edda;color:#155724;padding:10px;
+        border-left:5px solid #28a745;border-radius:5px;margin-top:10px;
+        font-weight:bold'>Model Predicted IFRS13 Level:<br>{st.session_state['model_pred']}</div>
+        """, unsafe_allow_html=True)
+    else:
+        ml_badge.empty()  # claims the sidebar slot for later fragment reruns
+
+def render_rf_badge():
+    if "final_level" in st.session_state:
+        rf_badge.markdown(f"""
+        <div style='background-color:#f8d7da;color:#721c24;padding:10px;
+        border-left:5px solid #dc3545;border-radius:5px;margin-top:10px;
+        font-weight:bold'>Risk Factor based IFRS13 Level:<br>{st.session_state['final_level']}</div>
+        """, unsafe_allow_html=True)
+    else:
+        rf_badge.empty()
 
 # --- Section: Machine Learning Model Prediction ---
-with st.container(border=True):
-    st.subheader("1. Machine Learning Model Prediction")
-
-    # Stepper
-    step = 3 if st.session_state.get("ml_done") else 0
-    st.markdown(get_workflow_html_ml(step), unsafe_allow_html=True)
-
-    if st.button("\u25B6 Run Model Inference", key="run_ml"):
-        # Build Payload
-        payload = {
-            "input_data": {
-                "columns": [
-                    "product_type", "currency", "option_type",
-                    "notional", "strike", "expiry_tenor", "maturity_tenor"
-                ],
-                "index": [0],
-                "data": [[
-                    trade["product_type"],
-                    trade["currency"],
-                    trade["option_type"],
-                    trade["notional"],
-                    trade["strike"],
-                    trade["expiry_tenor"],
-                    trade["maturity_tenor"]
-                ]]
-            }
-        }
-
-        # Store payload in session for reuse
-        st.session_state["model_payload"] = payload
-        with st.spinner("Running model..."):
-            start_time = time.time()  # Start timer
-        # 🔁 Call endpoint
-        try:
-            endpoint = st.secrets["AZURE_ML_ENDPOINT"]
-            api_key = st.secrets["AZURE_ML_API_KEY"]
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}"
-            }
-
-            response = requests.post(endpoint, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            end_time = time.time()  # End timer
-            elapsed = round(end_time - start_time, 4)  # Time in seconds
-            st.session_state["model_output"] = result
-            st.session_state["model_pred"] = result[0]
-            st.session_state["ifrs13_level"] = result[0]
-            st.session_state["ml_done"] = True
-            st.session_state["ML_Model_elapsed_time"] = elapsed
-            st.rerun()
-
-        except Exception as e:
-            st.error(f"🚨 Model call failed: {e}")
-
-    # === Subsections ===
-    if st.session_state.get("ml_done"):
-
-        with st.expander(" Model Input Payload", expanded=False):
-            st.code(json.dumps(st.session_state["model_payload"], indent=2), language="json")
+@st.fragment
+@traced("app.ml_prediction_section")
+def ml_prediction_section(trade):
+    with st.container(border=True):
+        st.subheader("1. Machine Learning Model Prediction")
+
+        # Stepper
+        step = 3 if st.session_state.get("ml_done") else 0
+        st.markdown(get_workflow_html_ml(step), unsafe_allow_html=True)
+
+        if st.button("\u25B6 Run Model Inference", key="run_ml"):
+            # Build Payload (as sent to the endpoint for this trade)
+            payload = build_payload([trade])
+
+            # Store payload in the shared artifact store for reuse; the session keeps a handle
+            put_artifact("model_payload", payload)
+            # 🔁 Call endpoint
+            try:
+                with st.spinner("Running model..."):
+                    start_time = time.time()  # Start timer
+                    prediction, used_fallback = call_azure_ml_model(trade)
+                    end_time = time.time()  # End timer
+                elapsed = round(end_time - start_time, 4)  # Time in seconds
+                result = [prediction]
+                put_artifact("model_output", result)
+                st.session_state["model_pred"] = result[0]
+                st.session_state["ifrs13_level"] = result[0]
+                st.session_state["ml_done"] = True
+                st.session_state["ML_Model_elapsed_time"] = elapsed
+                st.session_state["ML_Model_fallback"] = used_fallback
+                mark_fresh(trade, ["model"])
+                rerun_section()
+
+            except Exception as e:
+                st.error(f"🚨 Model call failed: {e}")
+
+        # === Subsections ===
+        if st.session_state.get("ml_done"):
+            if st.session_state.get("ML_Model_fallback"):
+                st.warning("⚠️ Model endpoint unavailable - prediction produced by the rule-based fallback.")
+
+            with st.expander(" Model Input Payload", expanded=False):
+                st.code(json.dumps(get_artifact("model_payload"), indent=2), language="json")
 
         
-        with st.expander("Machine Learning Model Details", expanded=False):
-            st.markdown(
-                """
-                <div style='font-weight: bold; font-size: 18px; margin-bottom: 10px;'>📘 Machine Learning Model Details</div>
-                <div style='text-align: left; overflow-y: auto; max-height: 250px;
-                            padding: 10px; background-color: #111111;
-                            border-radius: 8px; color: #f0f0f0;
-                            font-family: monospace; font-size: 14px;'>
-                    <strong>Model:</strong> Gradient Boosting (AutoML)<br>
-                    <strong>Version:</strong> Gradient Boosting (AutoML)<br>
-                    <strong>Trained on:</strong> Synthetic IR Swaption Trades<br>
-                    <strong>Features:</strong> product_type, currency, option_type, notional, strike, expiry_tenor, maturity_tenor<br>
-                    <strong>Accuracy:</strong> 86.2%<br>
-                    <strong>AUC:</strong> 0.74<br>
-                    <strong>Last Trained:</strong> 01-Jun-2025<br><br>
-                    This model predicts IFRS13 Level based on risk and trade characteristics.<br>
-                    AutoML handled class imbalance and feature engineering.
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+            with st.expander("Machine Learning Model Details", expanded=False):
+                st.markdown(
+                    """
+                    <div style='font-weight: bold; font-size: 18px; margin-bottom: 10px;'>📘 Machine Learning Model Details</div>
+                    <div style='text-align: left; overflow-y: auto; max-height: 250px;
+                                padding: 10px; background-color: #111111;
+                                border-radius: 8px; color: #f0f0f0;
+                                font-family: monospace; font-size: 14px;'>
+                        <strong>Model:</strong> Gradient Boosting (AutoML)<br>
+                        <strong>Version:</strong> Gradient Boosting (AutoML)<br>
+                        <strong>Trained on:</strong> Synthetic IR Swaption Trades<br>
+                        <strong>Features:</strong> product_type, currency, option_type, notional, strike, expiry_tenor, maturity_tenor<br>
+                        <strong>Accuracy:</strong> 86.2%<br>
+                        <strong>AUC:</strong> 0.74<br>
+                        <strong>Last Trained:</strong> 01-Jun-2025<br><br>
+                        This model predicts IFRS13 Level based on risk and trade characteristics.<br>
+                        AutoML handled class imbalance and feature engineering.
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            with st.expander(" Model Inference Result", expanded=False):
+                st.markdown(f"🕒 Model run completed in {st.session_state['ML_Model_elapsed_time']} seconds.")
+                ml_metrics = get_ml_endpoint().metrics()
+                if ml_metrics["calls"]:
+                    st.caption(
+                        f"Endpoint latency p50 {ml_metrics['p50_s']:.3f}s · p99 {ml_metrics['p99_s']:.3f}s · "
+                        f"{ml_metrics['calls']} calls · {ml_metrics['hedged']} hedged · circuit {ml_metrics['circuit']}"
+                    )
+                st.code(json.dumps(get_artifact("model_output", [st.session_state["model_pred"]]), indent=2), language="json")
+                st.success(f"✅ Predicted IFRS13 Level: {st.session_state['model_pred']}")
+
+    render_ml_badge()
 
-        with st.expander(" Model Inference Result", expanded=False):
-            st.markdown(f"🕒 Model run completed in {st.session_state['ML_Model_elapsed_time']} seconds.")
-            st.code(json.dumps(st.session_state["model_output"], indent=2), language="json")
-            st.success(f"✅ Predicted IFRS13 Level: {st.session_state['model_pred']}")
+# --- Section: Risk Factor-based Inference ---
+@st.fragment
+@traced("app.risk_factor_section")
+def risk_factor_section(trade):
+    with st.container(border=True):
+        st.subheader("2. Risk Factor Observability testing")
+        step = 4 if st.session_state.rf_done else 0
+        st.markdown(get_workflow_html_rf(step), unsafe_allow_html=True)
+
+        if st.button("\u25B6 Run Risk Factor Inference Workflow"):
+            # Seeded, so the audited decision can regenerate these greeks and PVs
+            seed = new_seed()
+            greeks, trade["trade_pv"], generated_pvs = simulate_trade(trade, seed)
+            greeks.update(generated_pvs)
+
+            # ✅ Save to the shared artifact store for persistent view
+            put_artifact("greeks", greeks)
+            put_artifact("generated_pvs", generated_pvs)
+
+            st.success("✅ Risk factors and PV contributions simulated")
+
+            # Run stress tests
+            st.success("✅ IR Delta Observability Test Completed")
+            ir_stressed, ir_report, ir_stress_pv, ir_msgs = ir_delta_stress_test(trade, greeks)
+            st.session_state["ir_summary"] = ir_msgs
+            st.dataframe(pd.DataFrame(ir_report).T)
+
+            st.success("✅ Volatility Observability Test Completed")
+            vol_stressed, vol_report, vol_stress_pv, vol_msgs = vol_risk_stress_test(trade, greeks)
+            st.session_state["vol_summary"] = vol_msgs
+            st.dataframe(pd.DataFrame(vol_report).T)
 
+            total_stress_pv = ir_stress_pv + vol_stress_pv
+            final_level = "Level 3" if total_stress_pv > 0.1 * trade["trade_pv"] else "Level 2"
+            st.metric("Total Stress PV", total_stress_pv)
 
-if "model_pred" in st.session_state:
-    st.sidebar.markdown(f"""
-    <div style='background-color:#d4edda;color:#155724;padding:10px;
-    border-left:5px solid #28a745;border-radius:5px;margin-top:10px;
-    font-weight:bold'>Model Predicted IFRS13 Level:<br>{st.session_state['model_pred']}</div>
-    """, unsafe_allow_html=True)
+            put_artifact("ir_report_df", pd.DataFrame(ir_report).T)
+            put_artifact("vol_report_df", pd.DataFrame(vol_report).T)
+            st.session_state["trade_pv"] = trade["trade_pv"]
+            st.session_state["ir_stress_pv"] = ir_stress_pv
+            st.session_state["vol_stress_pv"] = vol_stress_pv
 
-# --- Section: Risk Factor-based Inference ---
-with st.container(border=True):
-    st.subheader("2. Risk Factor Observability testing")
-    step = 4 if st.session_state.rf_done else 0
-    st.markdown(get_workflow_html_rf(step), unsafe_allow_html=True)
-
-    if st.button("\u25B6 Run Risk Factor Inference Workflow"):
-        greeks = simulate_greeks(trade)
-        trade["trade_pv"], generated_pvs = generate_trade_pv_and_risk_pvs(greeks)
-        greeks.update(generated_pvs)
-
-        # ✅ Save to session state for persistent view
-        st.session_state["greeks"] = greeks
-        st.session_state["generated_pvs"] = generated_pvs
-
-        st.success("✅ Risk factors and PV contributions simulated")
-
-        # Run stress tests
-        st.success("✅ IR Delta Observability Test Completed")
-        ir_stressed, ir_report, ir_stress_pv, ir_msgs = ir_delta_stress_test(trade, greeks)
-        st.session_state["ir_summary"] = ir_msgs
-        st.dataframe(pd.DataFrame(ir_report).T)
-
-        st.success("✅ Volatility Observability Test Completed")
-        vol_stressed, vol_report, vol_stress_pv, vol_msgs = vol_risk_stress_test(trade, greeks)
-        st.session_state["vol_summary"] = vol_msgs
-        st.dataframe(pd.DataFrame(vol_report).T)
-
-        total_stress_pv = ir_stress_pv + vol_stress_pv
-        final_level = "Level 3" if total_stress_pv > 0.1 * trade["trade_pv"] else "Level 2"
-        st.metric("Total Stress PV", total_stress_pv)
-
-        st.session_state["ir_report_df"] = pd.DataFrame(ir_report).T
-        st.session_state["vol_report_df"] = pd.DataFrame(vol_report).T
-        st.session_state["trade_pv"] = trade["trade_pv"]
-        st.session_state["ir_stress_pv"] = ir_stress_pv
-        st.session_state["vol_stress_pv"] = vol_stress_pv
-
-
-        if final_level == "Level 3":
-            st.error("🔴 Unobservable risk exceeds 10% of total PV  → Level 3")
-        else:
-            st.success("🟢 Unobservable risk within threshold → Level 2")
-
-        st.session_state["final_level"] = final_level
-        st.session_state.rf_done = True
-        st.rerun()
 
-    # ✅ Always show stored greeks and PV breakdown
-    if "greeks" in st.session_state and "generated_pvs" in st.session_state:
-        with st.expander("Simulated Risk Factors", expanded=False):
-            df_greeks = pd.DataFrame.from_dict(
-                {k: str(v) for k, v in st.session_state["greeks"].items()},
-                orient="index",
-                columns=["Value"]
-            )
-            st.dataframe(df_greeks)
+            if final_level == "Level 3":
+                st.error("🔴 Unobservable risk exceeds 10% of total PV  → Level 3")
+            else:
+                st.success("🟢 Unobservable risk within threshold → Level 2")
 
-        with st.expander("PV Contribution by Risk Factors", expanded=False):
-            pv_df = pd.DataFrame.from_dict(
-                {k: str(v) for k, v in st.session_state["generated_pvs"].items()},
-                orient="index",
-                columns=["PV"]
+            st.session_state["final_level"] = final_level
+            st.session_state.rf_done = True
+
+            # Append-only audit trail; the rationale step appends the same decision with its rationale hash
+            decision = report_decision(
+                trade, greeks, {**ir_report, **vol_report}, model_pred=st.session_state.get("model_pred"), seed=seed
             )
-            st.dataframe(pv_df)
-    if "ir_report_df" in st.session_state:
-        with st.expander(" IR Delta Observability Test Results", expanded=False):
-            st.dataframe(st.session_state["ir_report_df"])
+            get_audit_log().append(dict(decision))
+            st.session_state["audit_decision"] = decision
+            mark_fresh(trade, ["greeks", "stress"], seed=seed, greeks=greeks, trade_pv=trade["trade_pv"],
+                       generated_pvs=generated_pvs)
+            rerun_section()
+
+        # ✅ Always show stored greeks and PV breakdown
+        if has_artifacts("greeks", "generated_pvs"):
+            with st.expander("Simulated Risk Factors", expanded=False):
+                df_greeks = pd.DataFrame.from_dict(
+                    {k: str(v) for k, v in get_artifact("greeks").items()},
+                    orient="index",
+                    columns=["Value"]
+                )
+                st.dataframe(df_greeks)
+
+            with st.expander("PV Contribution by Risk Factors", expanded=False):
+                pv_df = pd.DataFrame.from_dict(
+                    {k: str(v) for k, v in get_artifact("generated_pvs").items()},
+                    orient="index",
+                    columns=["PV"]
+                )
+                st.dataframe(pv_df)
+        ir_report_df = get_artifact("ir_report_df")
+        if ir_report_df is not None:
+            with st.expander(" IR Delta Observability Test Results", expanded=False):
+                st.dataframe(ir_report_df)
             
-    if "vol_report_df" in st.session_state:
-        with st.expander(" Volatility Observability Test Results", expanded=False):
-            st.dataframe(st.session_state["vol_report_df"])
+        vol_report_df = get_artifact("vol_report_df")
+        if vol_report_df is not None:
+            with st.expander(" Volatility Observability Test Results", expanded=False):
+                st.dataframe(vol_report_df)
             
     
-    # --- PV and Stress Test Summary Box ---
-        with st.container():
-            st.subheader("Observability Summary")
+        # --- PV and Stress Test Summary Box ---
+            with st.container():
+                st.subheader("Observability Summary")
         
-        # Validate keys exist
-        required_keys = ["trade_pv", "ir_stress_pv", "vol_stress_pv", "final_level"]
-        if all(k in st.session_state for k in required_keys):
-            trade_pv = st.session_state["trade_pv"]
-            ir_stress_pv = st.session_state["ir_stress_pv"]
-            vol_stress_pv = st.session_state["vol_stress_pv"]
-            total_stress_pv = ir_stress_pv + vol_stress_pv
-            stress_pct = (total_stress_pv / trade_pv) * 100 if trade_pv else 0
+            # Validate keys exist
+            required_keys = ["trade_pv", "ir_stress_pv", "vol_stress_pv", "final_level"]
+            if all(k in st.session_state for k in required_keys):
+                trade_pv = st.session_state["trade_pv"]
+                ir_stress_pv = st.session_state["ir_stress_pv"]
+                vol_stress_pv = st.session_state["vol_stress_pv"]
+                total_stress_pv = ir_stress_pv + vol_stress_pv
+                stress_pct = (total_stress_pv / trade_pv) * 100 if trade_pv else 0
+
+                col1, col2, col3 = st.columns(3)
+                col1.metric(" Trade PV", f"{trade_pv:,.2f}")
+                col2.metric(" Unobservable PV component", f"{total_stress_pv:,.2f}")
+                col3.metric(" Unobservable % of Total PV", f"{stress_pct:.2f}%")
+
+                col2.metric(" IR Stress PV", f"{ir_stress_pv:,.2f}")
+                col2.metric(" Volatility Stress PV", f"{vol_stress_pv:,.2f}")
+                st.metric(" Observability Level", st.session_state["final_level"])
+                store_metrics = get_artifact_store().metrics()
+                st.caption(
+                    f"Session data store: {store_metrics['resident_bytes'] / 2**20:.1f} MiB resident · "
+                    f"{store_metrics['artifacts']} artifacts · {store_metrics['sessions']} sessions · "
+                    f"{store_metrics['evictions']} evictions"
+                )
+            # else:
+            #     st.warning("Observability stress results not available.")
+
+    render_rf_badge()
 
-            col1, col2, col3 = st.columns(3)
-            col1.metric(" Trade PV", f"{trade_pv:,.2f}")
-            col2.metric(" Unobservable PV component", f"{total_stress_pv:,.2f}")
-            col3.metric(" Unobservable % of Total PV", f"{stress_pct:.2f}%")
-
-            col2.metric(" IR Stress PV", f"{ir_stress_pv:,.2f}")
-            col2.metric(" Volatility Stress PV", f"{vol_stress_pv:,.2f}")
-            st.metric(" Observability Level", st.session_state["final_level"])
-        # else:
-        #     st.warning("Observability stress results not available.")
-
-    
-# Update sidebar with both predictions
-
-if "final_level" in st.session_state:
-    st.sidebar.markdown(f"""
-    <div style='background-color:#f8d7da;color:#721c24;padding:10px;
-    border-left:5px solid #dc3545;border-radius:5px;margin-top:10px;
-    font-weight:bold'>Risk Factor based IFRS13 Level:<br>{st.session_state['final_level']}</div>
-    """, unsafe_allow_html=True)
 # --- Section: Rationale Explanation ---
-with st.container(border=True):
-    st.subheader("3. Analytical Review and Rationale Generation")
-    step = 3 if st.session_state.get("rat_done") else 0
-    st.markdown(get_workflow_html_rat(step), unsafe_allow_html=True)
+@st.fragment
+@traced("app.rationale_section")
+def rationale_section():
+    with st.container(border=True):
+        st.subheader("3. Analytical Review and Rationale Generation")
+        step = 3 if st.session_state.get("rat_done") else 0
+        st.markdown(get_workflow_html_rat(step), unsafe_allow_html=True)
 
     
-    if st.button("\u25B6 Run Rationale Generation Workflow"):
-      if all(k in st.session_state for k in ["ir_summary", "vol_summary", "model_pred"]):
-        st.session_state["rat_done"] = True  # ✅ Mark early
-        rationale = get_rationale_from_gpt(
-            ir_summary="\n".join(st.session_state["ir_summary"]),
-            vol_summary="\n".join(st.session_state["vol_summary"]),
-            model_pred=st.session_state["model_pred"]
-        )
-        st.session_state["rationale_text"] = rationale
-        st.rerun()  # ✅ Trigger UI update
-      else:
-          st.warning("Run both ML and Risk Factor workflows before generating rationale.")
-    if "rationale_text" in st.session_state:
-            st.markdown(
-                f"""<div style='background-color:#f1f1f1;color:#000000;padding:10px;
-                border-left:5px solid #0078D7;border-radius:5px'>
-                <b>Explanation:</b><br>{st.session_state["rationale_text"]}</div>""",
-                unsafe_allow_html=True
+        run_rationale = st.button("\u25B6 Run Rationale Generation Workflow")
+        # Identical classifications are served from the rationale cache; regenerate bypasses it
+        refresh_rationale = "rationale_text" in st.session_state and st.button("\u21BB Regenerate Rationale")
+        stream_rationale = st.toggle("Stream rationale as it is generated", value=True, key="stream_rationale")
+        if run_rationale or refresh_rationale:
+          if all(k in st.session_state for k in ["ir_summary", "vol_summary", "model_pred"]):
+            st.session_state["rat_done"] = True  # ✅ Mark early
+            rationale_inputs = {
+                "ir_summary": "\n".join(st.session_state["ir_summary"]),
+                "vol_summary": "\n".join(st.session_state["vol_summary"]),
+                "model_pred": st.session_state["model_pred"],
+                "refresh": refresh_rationale
+            }
+            # Unambiguous cases (model and risk factors agree, far from 10%) skip GPT entirely
+            rationale_route = route_rationale(
+                st.session_state["model_pred"],
+                st.session_state["trade_pv"],
+                st.session_state["ir_stress_pv"] + st.session_state["vol_stress_pv"]
             )
+            report_dfs = get_artifact("ir_report_df"), get_artifact("vol_report_df")
+            if any(df is None for df in report_dfs):
+                # Reports evicted under the memory budget; the summaries in session state still feed GPT
+                rationale_route = "llm"
+            routing_stats.record(rationale_route)
+            st.session_state["rationale_route"] = rationale_route
+            rationale = None
+            if rationale_route == "llm":
+                try:
+                    if stream_rationale:
+                        rationale_box = st.empty()
+                        start_time = time.time()
+                        parts = []
+                        for delta in get_rationale_from_gpt(**rationale_inputs, stream=True):
+                            if not parts:
+                                st.session_state["rationale_ttft"] = round(time.time() - start_time, 3)
+                            parts.append(delta)
+                            render_rationale_box(rationale_box, "".join(parts))
+                        rationale = "".join(parts)
+                    else:
+                        rationale = get_rationale_from_gpt(**rationale_inputs)
+                        st.session_state.pop("rationale_ttft", None)
+                except Exception as e:
+                    # Endpoint down, circuit open or the stream broke off: fall back to the template rationale
+                    if any(df is None for df in report_dfs):
+                        st.error(f"❌ Rationale generation failed ({e}). Rerun the risk factor workflow and try again.")
+                        return
+                    st.session_state["rationale_route"] = rationale_route = "fallback"
+            if rationale is None:
+                rationale = rationale_from_reports(
+                    st.session_state["model_pred"],
+                    *report_dfs,
+                    st.session_state["trade_pv"],
+                    st.session_state["ir_stress_pv"],
+                    st.session_state["vol_stress_pv"]
+                )
+                st.session_state.pop("rationale_ttft", None)
+            st.session_state["rationale_text"] = rationale
+            st.session_state.pop("rationale_stale", None)
+            if "audit_decision" in st.session_state:
+                get_audit_log().append({
+                    **st.session_state["audit_decision"],
+                    "ts": time.time(),
+                    "model_pred": st.session_state["model_pred"],
+                    "rationale_hash": rationale_hash(rationale),
+                    "rationale_route": rationale_route
+                })
+            rerun_section()  # ✅ Trigger UI update
+          else:
+              st.warning("Run both ML and Risk Factor workflows before generating rationale.")
+        if "rationale_text" in st.session_state:
+                if st.session_state.get("rationale_stale"):
+                    st.warning("Trade inputs changed since this rationale was generated - regenerate it for the current results.")
+                render_rationale_box(st, st.session_state["rationale_text"])
+                if st.session_state.get("rationale_route") == "template":
+                    st.caption("⚡ Deterministic rationale - model and risk factor levels agree away from the 10% threshold (no GPT call).")
+                elif st.session_state.get("rationale_route") == "fallback":
+                    st.caption("⚠️ GPT rationale unavailable - deterministic rationale from the stress reports instead.")
+                if "rationale_ttft" in st.session_state:
+                    st.caption(f"⏱️ Time to first token: {st.session_state['rationale_ttft']}s")
+                st.caption(f"Fast-path share of rationale requests (this server): {routing_stats.fast_path_share():.0%}")
+
+
+ml_prediction_section(trade)
+risk_factor_section(trade)
+rationale_section()
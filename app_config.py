@@ -0,0 +1,28 @@
+import os
+
+
+# --- Load secrets from environment variables, falling back to Streamlit secrets ---
+def get_secret(key, default=""):
+    value = os.getenv(key)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        return st.secrets.get(key, default)
+    except Exception:
+        # No secrets.toml (headless runs) or Streamlit not installed
+        return default
+
+
+def get_int_setting(key, default):
+    try:
+        return int(get_secret(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_float_setting(key, default):
+    try:
+        return float(get_secret(key, default))
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,324 @@
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from app_config import get_secret, get_float_setting
+
+# Record framing: payload length, CRC32 of the payload, decision timestamp; then the payload, a
+# zlib-compressed JSON document (level 1: about half the size for a fraction of the append cost)
+HEADER = struct.Struct("<IId")
+FEATURE_FIELDS = ["product_type", "currency", "option_type", "notional", "strike", "expiry_tenor", "maturity_tenor"]
+
+
+# --- Append-only decision log: binary records on disk, SQLite sidecar index by trade id and time ---
+class AuditLog:
+    def __init__(self, root, flush_seconds=1.0, fsync=False):
+        self.root = root
+        self.log_path = os.path.join(root, "decisions.log")
+        self.index_path = os.path.join(root, "decisions.idx.sqlite3")
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self._pending = []  # (trade_id, ts, level, encoded record)
+        self.corrupt_offsets = set()  # complete records whose CRC did not match; skipped, never truncated
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS decisions (trade_id TEXT NOT NULL, ts REAL NOT NULL, "
+                "level TEXT, offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS decisions_trade_ts ON decisions (trade_id, ts)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS decisions_offset ON decisions (offset)")
+        self.recover()
+        self._thread = threading.Thread(target=self._flush_loop, name="audit-flush", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    # --- Writing ---
+    def append(self, record):
+        record.setdefault("ts", time.time())
+        payload = zlib.compress(json.dumps(record, separators=(",", ":"), default=str).encode("utf-8"), 1)
+        encoded = HEADER.pack(len(payload), zlib.crc32(payload), record["ts"]) + payload
+        entry = (record["trade_id"], record["ts"], (record.get("report") or {}).get("level"), encoded)
+        with self._lock:
+            self._pending.append(entry)
+
+    def append_many(self, records):
+        for record in records:
+            self.append(record)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except (OSError, sqlite3.Error):
+                pass  # records stay queued and go out with the next flush
+
+    def flush(self):
+        # Log bytes first, index rows second: the index never points past the end of the log,
+        # and records written but not yet indexed are picked up by recover()
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, []
+            if not entries:
+                return
+            try:
+                with open(self.log_path, "ab") as f, _exclusive(f):
+                    offset = f.seek(0, os.SEEK_END)
+                    rows = []
+                    for trade_id, ts, level, encoded in entries:
+                        rows.append((trade_id, ts, level, offset, len(encoded)))
+                        offset += len(encoded)
+                    f.write(b"".join(encoded for _, _, _, encoded in entries))
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+            except OSError:
+                with self._lock:
+                    self._pending[:0] = entries
+                raise
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany("INSERT OR IGNORE INTO decisions VALUES (?, ?, ?, ?, ?)", rows)
+            finally:
+                conn.close()
+
+    def recover(self):
+        # Index records past the last indexed offset (a crash between the log write and the index
+        # commit) and cut a torn record off the end of the log; corrupt records are left in place
+        if not os.path.exists(self.log_path):
+            return 0
+        with self._connect() as conn:
+            row = conn.execute("SELECT offset + length FROM decisions ORDER BY offset DESC LIMIT 1").fetchone()
+        start = row[0] if row else 0
+        rows = []
+        with open(self.log_path, "r+b") as f, _exclusive(f):
+            end = start
+            for offset, length, record in _read_records(f, start):
+                end = offset + length
+                if record is None:
+                    self.corrupt_offsets.add(offset)
+                    continue
+                rows.append((record["trade_id"], record["ts"], (record.get("report") or {}).get("level"), offset, length))
+            if end < f.seek(0, os.SEEK_END):
+                f.truncate(end)
+        if rows:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR IGNORE INTO decisions VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def rebuild_index(self):
+        self.flush()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM decisions")
+        return self.recover()
+
+    # --- Reading ---
+    def _read_at(self, locations):
+        records = []
+        with open(self.log_path, "rb") as f:
+            for offset, length in locations:
+                f.seek(offset)
+                records.append(_decode(f.read(length)))
+        return records
+
+    def find(self, trade_id, start=None, end=None):
+        # Every decision for the trade in [start, end) (epoch seconds), oldest first
+        self.flush()
+        with self._connect() as conn:
+            locations = conn.execute(
+                "SELECT offset, length FROM decisions WHERE trade_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (trade_id, start if start is not None else float("-inf"), end if end is not None else float("inf"))
+            ).fetchall()
+        return self._read_at(locations)
+
+    def on_date(self, trade_id, day):
+        # Decisions taken on a calendar day (date, datetime or "YYYY-MM-DD"), local time
+        day = datetime.fromisoformat(str(day)[:10])
+        return self.find(trade_id, day.timestamp(), (day + timedelta(days=1)).timestamp())
+
+    def as_of(self, trade_id, when):
+        # The decision in force at `when`: the latest one taken at or before it
+        self.flush()
+        with self._connect() as conn:
+            location = conn.execute(
+                "SELECT offset, length FROM decisions WHERE trade_id = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+                (trade_id, when)
+            ).fetchone()
+        return self._read_at([location])[0] if location else None
+
+    def scan(self):
+        self.flush()
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb") as f:
+            for offset, _, record in _read_records(f, 0):
+                if record is None:
+                    self.corrupt_offsets.add(offset)
+                else:
+                    yield record
+
+    def stats(self):
+        self.flush()
+        with self._connect() as conn:
+            decisions, trades = conn.execute("SELECT COUNT(*), COUNT(DISTINCT trade_id) FROM decisions").fetchone()
+        size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        return {"decisions": decisions, "trades": trades, "log_bytes": size, "corrupt_records": len(self.corrupt_offsets)}
+
+
+@contextmanager
+def _exclusive(f):
+    # Advisory lock on the log file so the app and the nightly CLI can append to the same log
+    if fcntl is None:  # no cross-process locking on Windows; one writer per log there
+        yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _decode(data):
+    length, crc, _ = HEADER.unpack_from(data)
+    payload = data[HEADER.size:HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("corrupt audit record")
+    return json.loads(zlib.decompress(payload))
+
+
+def _read_records(f, offset):
+    # (offset, length, record) from `offset` to the last complete record; record is None for a
+    # complete record whose CRC does not match, so one bad record does not hide the ones after it
+    f.seek(offset)
+    while True:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        length, crc, _ = HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length:
+            return
+        record = json.loads(zlib.decompress(payload)) if zlib.crc32(payload) == crc else None
+        yield offset, HEADER.size + length, record
+        offset += HEADER.size + length
+
+
+_audit_log = None
+_audit_lock = threading.Lock()
+
+
+def get_audit_log():
+    # One writer per process; processes share the log through the file lock
+    global _audit_log
+    with _audit_lock:
+        if _audit_log is None:
+            _audit_log = AuditLog(
+                root=get_secret("AUDIT_LOG_DIR", ".audit"),
+                flush_seconds=get_float_setting("AUDIT_FLUSH_SECONDS", 1.0),
+                fsync=get_secret("AUDIT_FSYNC", "off").lower() in ("1", "on", "true")
+            )
+        return _audit_log
+
+
+# --- Decision records ---
+def trade_id_for(trade):
+    # Booking-system id when the trade carries one, otherwise a stable id from its features
+    if trade.get("trade_id"):
+        return str(trade["trade_id"])
+    features = json.dumps({field: trade.get(field) for field in FEATURE_FIELDS}, sort_keys=True, default=str)
+    return "F-" + hashlib.sha1(features.encode("utf-8")).hexdigest()[:16]
+
+
+def rationale_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text else None
+
+
+def decision_record(trade, greeks, trade_pv, unobservable, unobservable_pv, level, seed, grid_version,
+                    model_pred=None, rationale=None, source="app", **extra):
+    # greeks: the single-trade dict (sensitivities plus "<factor> PV" entries)
+    return {
+        "trade_id": trade_id_for(trade),
+        "source": source,
+        "trade": {field: trade.get(field) for field in FEATURE_FIELDS},
+        "seed": seed,
+        "grid_version": grid_version,
+        "greeks": {name: value for name, value in greeks.items() if name != "OIS Curve" and not name.endswith(" PV")},
+        "risk_pvs": {name: value for name, value in greeks.items() if name.endswith(" PV")},
+        "trade_pv": trade_pv,
+        "report": {"unobservable": list(unobservable), "unobservable_pv": round(float(unobservable_pv), 2), "level": level},
+        "model_pred": model_pred,
+        "rationale_hash": rationale_hash(rationale),
+        **extra
+    }
+
+
+def report_decision(trade, greeks, final_report, model_pred=None, rationale=None, seed=None, source="app"):
+    # Record for a single-trade run of the stress tests (final_report: factor -> report row)
+    from Observability_Stress_Module import GRID_VERSION
+
+    unobservable = [name for name, row in final_report.items() if not row["Observable"]]
+    unobservable_pv = sum(abs(row["Stressed PV"]) for row in final_report.values())
+    level = "Level 3" if unobservable_pv > 0.1 * trade["trade_pv"] else "Level 2"
+    return decision_record(
+        trade, greeks, trade["trade_pv"], unobservable, unobservable_pv, level, seed, GRID_VERSION,
+        model_pred=model_pred, rationale=rationale, source=source
+    )
+
+
+def _same_amount(a, b):
+    # Recorded amounts are rounded to cents; the replay sums unrounded stress PVs
+    return abs(a - b) <= 0.011
+
+
+def replay(record):
+    # Re-run the recorded decision through run_full_observability_stress_test with the recorded
+    # greek PVs; a per-trade seed (the app's single-trade runs) also regenerates the greeks themselves.
+    # Batch records carry their chunk's seed, which cannot redraw one trade on its own
+    from Observability_Stress_Module import (
+        GRID_VERSION, run_full_observability_stress_test, simulate_trade
+    )
+
+    trade = dict(record["trade"], trade_pv=record["trade_pv"])
+    if record.get("valuation_date"):
+        trade["valuation_date"] = record["valuation_date"]  # tested against the grids of that date
+    greeks = {**record["greeks"], **record["risk_pvs"]}
+    # Against the grids as known when the decision was taken, if it was pinned to a time
+    final_stressed, final_report, _ = run_full_observability_stress_test(
+        trade, greeks, known_at=record.get("grids_known_at")
+    )
+    unobservable = [name for name, row in final_report.items() if not row["Observable"]]
+    result = {
+        "level": final_stressed["Final IFRS13 Level"],
+        "unobservable": unobservable,
+        "unobservable_pv": final_stressed["Total Stress PV"],
+        "grid_version_matches": record["grid_version"] == GRID_VERSION,
+    }
+    result["matches"] = (
+        result["level"] == record["report"]["level"]
+        and sorted(unobservable) == sorted(record["report"]["unobservable"])
+        and _same_amount(result["unobservable_pv"], record["report"]["unobservable_pv"])
+    )
+    if record.get("seed") is not None and record.get("seed_scope", "trade") == "trade":
+        regenerated, trade_pv, generated_pvs = simulate_trade(dict(record["trade"]), record["seed"])
+        result["greeks_regenerated"] = (
+            _same_amount(trade_pv, record["trade_pv"]) and generated_pvs == record["risk_pvs"]
+        )
+    return result
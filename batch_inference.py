@@ -0,0 +1,45 @@
+import pandas as pd
+
+from classification_rules import classify_frame
+from grid_history import VALUATION_DATE
+from ml_client import MODEL_COLUMNS, predict_batch
+
+PREDICTION_COLUMN = "Predicted IFRS13 Level"
+INPUT_COLUMNS = ["product_type", "currency", "option_type", "notional", "strike", "expiry_tenor", "maturity_tenor"]
+
+
+# Columns for the observability stress pass: a book with valuation dates is tested against the grids of each date
+def stress_columns(df):
+    return INPUT_COLUMNS + [VALUATION_DATE] if VALUATION_DATE in df.columns else INPUT_COLUMNS
+
+
+# --- Batch predictors: return (levels, rows served by the rule-based fallback) ---
+def predict_mixed_frame(df):
+    # Vectorized rules for every product, then one multi-row ML call for the IR Swaption rows
+    levels = pd.Series(classify_frame(df), index=df.index, dtype=object)
+    swaptions = (df["product_type"] == "IR Swaption").to_numpy()
+    if swaptions.any():
+        try:
+            levels[swaptions] = predict_batch(df.loc[swaptions, MODEL_COLUMNS].to_dict(orient="records"))
+        except Exception:
+            return levels, int(swaptions.sum())
+    return levels, 0
+
+
+def predict_model_frame(df):
+    # Every row through the ML endpoint, rules only when the endpoint is unavailable
+    try:
+        return pd.Series(predict_batch(df[MODEL_COLUMNS].to_dict(orient="records")), index=df.index, dtype=object), 0
+    except Exception:
+        return pd.Series(classify_frame(df), index=df.index, dtype=object), len(df)
+
+
+BATCH_PREDICTORS = {
+    "mixed": predict_mixed_frame,
+    "model": predict_model_frame,
+}
+
+
+def needs_rationale(df):
+    # Level 3 by the model or by the observability stress; these trades get a written rationale
+    return (df[PREDICTION_COLUMN] == "Level 3") | (df["Observability Level"] == "Level 3")
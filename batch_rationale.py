@@ -0,0 +1,151 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from app_config import get_int_setting
+from gpt_client import build_rationale_messages, chat_completion, get_cached_completion
+from rationale_templates import rationale_from_summaries, route_frame, routing_stats
+from tracing import traced
+
+# Rough completion size used to budget tokens before the call is made
+EST_COMPLETION_TOKENS = 400
+
+
+def estimate_tokens(messages, completion_tokens=EST_COMPLETION_TOKENS):
+    # ~4 characters per token is close enough for budgeting
+    return sum(len(m["content"]) for m in messages) // 4 + completion_tokens
+
+
+# --- Token bucket refilled continuously at rate_per_minute ---
+class TokenBucket:
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.available = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def take(self, amount):
+        self.available -= min(amount, self.capacity)
+
+
+# --- Requests-per-minute and tokens-per-minute budget shared by all workers ---
+class RateBudget:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+            time.sleep(min(wait, 1.0))
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_rate_budget():
+    # One budget per process, so concurrent batches (service requests, Streamlit sessions) share the allowance
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = RateBudget(
+                get_int_setting("OPENAI_REQUESTS_PER_MINUTE", 60),
+                get_int_setting("OPENAI_TOKENS_PER_MINUTE", 30000)
+            )
+        return _budget
+
+
+def generate_group_rationale(messages, budget, max_retries=4, base_delay=1.0, client=None):
+    # Cached signatures cost no budget and no tokens
+    cached = get_cached_completion(messages)
+    if cached is not None:
+        return cached
+    tokens = estimate_tokens(messages)
+    for attempt in range(max_retries + 1):
+        budget.acquire(tokens)
+        try:
+            return chat_completion(messages, client=client)
+        except Exception:
+            if attempt == max_retries:
+                raise
+            # Exponential backoff with jitter (rate limits, transient 5xx, open circuit)
+            time.sleep(base_delay * 2 ** attempt + random.uniform(0, base_delay))
+
+
+# --- Batch rationale: one GPT call per distinct observability signature ---
+@traced("rationale.batch")
+def generate_batch_rationale(trades_df, prediction_column="Predicted IFRS13 Level", max_workers=None,
+                             requests_per_minute=None, tokens_per_minute=None, max_retries=4, progress=None,
+                             budget=None, client=None):
+    # Deterministic template for unambiguous trades; only the rest are grouped for GPT
+    fast_path = route_frame(trades_df, prediction_column)
+    routing_stats.record("template", int(fast_path.sum()))
+    routing_stats.record("llm", int((~fast_path).sum()))
+    llm_df = trades_df[~fast_path]
+
+    signature_columns = ["ir_summary", "vol_summary", prediction_column]
+    groups = llm_df.groupby(signature_columns, sort=False, dropna=False).groups
+    # Callers sharing the endpoint pass get_rate_budget(); otherwise the batch has an allowance of its own
+    budget = budget or RateBudget(
+        requests_per_minute or get_int_setting("OPENAI_REQUESTS_PER_MINUTE", 60),
+        tokens_per_minute or get_int_setting("OPENAI_TOKENS_PER_MINUTE", 30000)
+    )
+
+    results = {}
+    errors = {}
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers or get_int_setting("RATIONALE_BATCH_WORKERS", 8)) as pool:
+        futures = {
+            # Each task runs in a copy of the caller's context so its GPT spans join the caller's trace
+            pool.submit(contextvars.copy_context().run, generate_group_rationale,
+                        build_rationale_messages(*signature), budget, max_retries, client=client): signature
+            for signature in groups
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            signature = futures[future]
+            try:
+                results[signature] = future.result()
+            except Exception as e:
+                errors[signature] = str(e)
+            if progress:
+                progress(done, len(futures))
+
+    # Fast-path trades get their own template; each GPT result goes to every trade in its group
+    rationale = pd.Series(None, index=trades_df.index, dtype=object)
+    for index, row in trades_df[fast_path].iterrows():
+        rationale.loc[index] = rationale_from_summaries(
+            row[prediction_column], row["ir_summary"], row["vol_summary"], row["Trade PV"], row["Unobservable PV"]
+        )
+    for signature, index in groups.items():
+        rationale.loc[index] = results.get(signature, f"Rationale generation failed: {errors.get(signature)}")
+
+    stats = {
+        "trades": len(trades_df),
+        "fast_path_trades": int(fast_path.sum()),
+        "fast_path_share": round(float(fast_path.mean()), 4) if len(trades_df) else 0.0,
+        "unique_signatures": len(groups),
+        "failed_signatures": len(errors),
+        "elapsed_s": round(time.time() - start, 2)
+    }
+    return rationale, stats
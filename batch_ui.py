@@ -0,0 +1,190 @@
+import os
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app_config import get_secret
+from batch_inference import PREDICTION_COLUMN
+from job_manager import CELL_DIMENSIONS
+from shared_resources import get_job_manager
+from tracing import traced
+from trade_schema import missing_columns, parse_trades, validate_trades
+
+# --- Batch job widgets shared by the batch inference tabs ---
+
+
+def submit_upload_job(uploaded_file, required_cols, kind, state_key):
+    # One job per uploaded file; reruns triggered by other widgets reuse it. The CSV is parsed
+    # and validated only for a new file and the frame is dropped once the job has written it to disk.
+    # Returns False when the file is missing required columns; rows failing validation are listed
+    # and left out of the job.
+    if st.session_state.get(f"{state_key}_file") != uploaded_file.file_id:
+        df = parse_trades(uploaded_file)
+        valid = not missing_columns(df.columns, required_cols)
+        trades, errors = validate_trades(df) if valid else (None, None)
+        st.session_state[f"{state_key}_file"] = uploaded_file.file_id
+        st.session_state[f"{state_key}_valid"] = valid
+        st.session_state[f"{state_key}_errors"] = errors
+        st.session_state[state_key] = get_job_manager().submit(trades, kind) if valid and len(trades) else None
+    _rejected_rows(st.session_state[f"{state_key}_errors"])
+    return st.session_state[f"{state_key}_valid"]
+
+
+def _rejected_rows(errors):
+    if errors is None or errors.empty:
+        return
+    st.warning(f"⚠️ {errors['row'].nunique():,} rows failed validation and were left out of the batch.")
+    with st.expander(f"Validation errors ({len(errors):,})"):
+        st.dataframe(errors.head(1000), hide_index=True)
+        st.download_button("Download validation errors", data=errors.to_csv(index=False), file_name="rejected_rows.csv")
+
+
+@st.fragment(run_every=2)
+def _job_progress(job_id):
+    # Polls the job table without rerunning the page; one full rerun once the job finishes
+    job = get_job_manager().status(job_id)
+    if job["status"] in ("queued", "running"):
+        st.progress(
+            job["done_chunks"] / job["total_chunks"],
+            text=f"Job {job_id}: {job['done_chunks']}/{job['total_chunks']} chunks ({job['rows']:,} trades)"
+        )
+        # Live desk heatmap from the cells recorded so far
+        draw_level_heatmap(get_job_manager().job_cells(job_id, "trading_desk"), "Heatmap: IFRS13 Level by Trading Desk (so far)")
+    else:
+        st.rerun()
+
+
+def finished_job(state_key):
+    # The session's finished job, or None while it is still running
+    job_id = st.session_state.get(state_key)
+    if not job_id:
+        return None
+    job = get_job_manager().status(job_id)
+    if job is None:
+        return None
+    if job["status"] == "failed":
+        st.error(f"❌ Batch job {job_id} failed: {job['error']}")
+        return None
+    if job["status"] != "done":
+        _job_progress(job_id)
+        return None
+
+    if job["fallback_rows"]:
+        st.warning(f"⚠️ Model call failed for {job['fallback_rows']:,} trades - rule-based fallback predictions used.")
+    return job
+
+
+@st.fragment
+@traced("render.result_viewer")
+def render_result_viewer(job, file_name="predicted_results"):
+    # Pages and filters the on-disk chunks; paging and filtering rerun only this viewer
+    manager = get_job_manager()
+    job_id = job["job_id"]
+    options = manager.facet_values(job_id)
+
+    col1, col2, col3 = st.columns(3)
+    filters = {
+        PREDICTION_COLUMN: col1.multiselect("IFRS13 Level", options[PREDICTION_COLUMN], key=f"{job_id}_level"),
+        "currency": col2.multiselect("Currency", options["currency"], key=f"{job_id}_currency"),
+        "trading_desk": col3.multiselect("Trading Desk", options["trading_desk"], key=f"{job_id}_desk"),
+    }
+    col1, col2 = st.columns(2)
+    page_size = col2.selectbox("Rows per page", [25, 100, 500], key=f"{job_id}_page_size")
+    page = col1.number_input("Page", min_value=1, value=1, key=f"{job_id}_page")
+
+    page_df, matches = manager.read_page(job_id, filters, page=page - 1, page_size=page_size)
+    pages = max(1, -(-matches // page_size))
+    if page > pages:
+        # Narrower filters can leave the page number past the end; show the last page instead
+        page = pages
+        page_df, matches = manager.read_page(job_id, filters, page=page - 1, page_size=page_size)
+    st.caption(f"{matches:,} of {job['rows']:,} trades · page {page} of {pages}")
+    st.dataframe(page_df, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    _export_button(col1, job_id, filters, "csv", f"{file_name}.csv", "text/csv")
+    _export_button(col2, job_id, filters, "parquet", f"{file_name}.parquet", "application/octet-stream")
+
+
+def _export_button(col, job_id, filters, fmt, file_name, mime):
+    # The export file is built on request, chunk by chunk, and reused for the same filters.
+    # With EXPORT_BASE_URL (the classification service) set, the link streams it from disk;
+    # otherwise it is read into memory only in the run where the user asks to download it
+    manager = get_job_manager()
+    path = manager.export_path(job_id, filters, fmt)
+    if not os.path.exists(path):
+        if not col.button(f"Prepare {fmt.upper()} export", key=f"export_{job_id}_{fmt}"):
+            return
+        with st.spinner(f"Writing {fmt.upper()} export..."):
+            manager.export(job_id, filters, fmt)
+    base_url = get_secret("EXPORT_BASE_URL")
+    if base_url:
+        url = f"{base_url.rstrip('/')}/exports/{job_id}/{os.path.basename(path)}?filename={quote(file_name)}"
+        col.link_button(f"📅 Download {fmt.upper()}", url)
+    elif col.button(f"📅 Download {fmt.upper()}", key=f"download_{job_id}_{fmt}"):
+        with open(path, "rb") as f:
+            col.download_button(f"Save {file_name}", data=f.read(), file_name=file_name, mime=mime)
+
+
+# --- Level heatmaps from pre-aggregated dimension x level cells ---
+DIMENSION_LABELS = {"trading_desk": "Trading Desk", "currency": "Currency"}
+
+
+def heatmap_option(cells):
+    # ECharts option from (value, level, count) cells; the raw rows are never needed
+    rows = sorted(cells["value"].unique())
+    cols = sorted(cells["level"].unique())
+    data = np.column_stack([
+        pd.Categorical(cells["level"], categories=cols).codes,
+        pd.Categorical(cells["value"], categories=rows).codes,
+        cells["count"].astype(int)
+    ]).tolist()
+    return {
+        "tooltip": {"position": "top"},
+        "grid": {"height": "50%", "top": "10%"},
+        "xAxis": {"type": "category", "data": cols, "splitArea": {"show": True}},
+        "yAxis": {"type": "category", "data": rows, "splitArea": {"show": True}},
+        "visualMap": {
+            "min": 0,
+            "max": int(cells["count"].max()),
+            "calculable": True,
+            "orient": "horizontal",
+            "left": "center",
+            "bottom": "15%",
+        },
+        "series": [
+            {
+                "name": "Trade Count",
+                "type": "heatmap",
+                "data": data,
+                "label": {"show": True},
+                "emphasis": {
+                    "itemStyle": {"shadowBlur": 10, "shadowColor": "rgba(0, 0, 0, 0.5)"}
+                },
+            }
+        ],
+    }
+
+
+def draw_level_heatmap(cells, title):
+    cells = cells[cells["value"] != "n/a"] if len(cells) else cells
+    if cells.empty:
+        return
+    from streamlit_echarts import st_echarts  # only loaded when a heatmap is drawn
+
+    st.subheader(title)
+    st_echarts(heatmap_option(cells), height="400px")
+
+
+@st.fragment
+@traced("render.level_heatmap")
+def render_level_heatmap(job_id, level_label="IFRS13 Level"):
+    # Switching dimension or scope reruns only the chart
+    manager = get_job_manager()
+    col1, col2 = st.columns(2)
+    dimension = col1.selectbox("Heatmap by", CELL_DIMENSIONS, format_func=DIMENSION_LABELS.get, key=f"{job_id}_heatmap_by")
+    scope = col2.radio("Runs", ["This run", "All stored runs"], horizontal=True, key=f"{job_id}_heatmap_runs")
+    cells = manager.job_cells(job_id, dimension) if scope == "This run" else manager.rollup_cells(dimension)
+    draw_level_heatmap(cells, f"Heatmap: {level_label} by {DIMENSION_LABELS[dimension]}")
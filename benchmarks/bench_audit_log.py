@@ -0,0 +1,75 @@
+# Benchmark: audit log (audit_log.AuditLog) on batch-style decision records.
+#   append    records appended and flushed to disk -> sustained appends per minute, bytes per record
+#   lookup    random trade ids through the sidecar index: find() (all decisions) and as_of() -> p50 / p99
+#   replay    a sample of records through run_full_observability_stress_test -> share that reproduce
+#   recover   a torn record at the end of the log is cut off and the index caught up on reopen
+# Run from the repository root:  python -m benchmarks.bench_audit_log [records]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from audit_log import AuditLog, replay
+from batch_inference import INPUT_COLUMNS, PREDICTION_COLUMN
+from benchmarks.bench_classification_rules import make_mixed_book
+from classify_portfolio import audit_records
+from Observability_Stress_Module import run_observability_for_frame
+
+
+def make_records(rows):
+    book = make_mixed_book(rows)
+    book.insert(0, "trade_id", [f"T{n:07d}" for n in range(rows)])
+    book[PREDICTION_COLUMN] = np.where(book["maturity_tenor"] > 10, "Level 3", "Level 2")
+    return audit_records(book.join(run_observability_for_frame(book[INPUT_COLUMNS], detail=True)), seed=7)
+
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return f"p50 {np.percentile(ms, 50):6.3f} ms   p99 {np.percentile(ms, 99):6.3f} ms"
+
+
+def main(rows=200000):
+    records = make_records(rows)
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as root:
+        log = AuditLog(root, flush_seconds=3600)  # flushed explicitly below
+        start = time.perf_counter()
+        for n in range(0, rows, 5000):
+            log.append_many(dict(record) for record in records[n:n + 5000])
+            log.flush()
+        append_s = time.perf_counter() - start
+        stats = log.stats()
+        print(f"append   {rows:,} records in {append_s:6.2f} s   {rows / append_s * 60:12,.0f} appends/min   "
+              f"{stats['log_bytes'] / rows:6.0f} bytes/record")
+
+        trade_ids = [records[n]["trade_id"] for n in rng.integers(0, rows, 1000)]
+        find_s, as_of_s = [], []
+        for trade_id in trade_ids:
+            start = time.perf_counter()
+            log.find(trade_id)
+            find_s.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            log.as_of(trade_id, time.time())
+            as_of_s.append(time.perf_counter() - start)
+        print(f"find     {len(trade_ids)} random trades   {percentiles(find_s)}")
+        print(f"as_of    {len(trade_ids)} random trades   {percentiles(as_of_s)}")
+
+        sample = [log.as_of(trade_id, time.time()) for trade_id in trade_ids[:500]]
+        start = time.perf_counter()
+        matches = sum(replay(record)["matches"] for record in sample)
+        print(f"replay   {len(sample)} decisions in {time.perf_counter() - start:5.2f} s   {matches}/{len(sample)} reproduce")
+
+        log.append(dict(records[0], ts=time.time()))
+        log.flush()
+        size = os.path.getsize(log.log_path)
+        with open(log.log_path, "ab") as f:
+            f.write(b"\x10\x00\x00\x00torn")  # a crash part-way through the next record
+        reopened = AuditLog(root, flush_seconds=3600)
+        print(f"recover  torn tail cut: {os.path.getsize(reopened.log_path) == size}   "
+              f"decisions indexed: {reopened.stats()['decisions']:,}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,131 @@
+# Benchmark: server time per interaction in app.py with many concurrent sessions, fragment-scoped
+# reruns vs. full-script reruns. Starts `streamlit run app.py` and drives N browser-less sessions over
+# the Streamlit websocket protocol. Each interaction clicks "Run Risk Factor Inference Workflow" or
+# flips the rationale stream toggle, and is timed from the click until the session goes idle.
+# "full" sends the click without its fragment id, which is how every interaction ran before the
+# workflow sections became fragments.
+# The server uses the production flags from startup.sh: without the file watcher and the full
+# gc.collect() after every script run, the per-run framework cost no longer hides the sections' own cost.
+# Requires the `websockets` package (installed with recent Streamlit releases).
+# Run from the repository root:  python -m benchmarks.bench_fragments [sessions] [interactions]
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RF_BUTTON = "Run Risk Factor Inference Workflow"
+STREAM_TOGGLE = "Stream rationale as it is generated"
+RERUN_STATUSES = (ForwardMsg.FINISHED_EARLY_FOR_RERUN,)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port):
+    env = dict(os.environ, AZURE_ML_ENDPOINT="http://127.0.0.1:9/score")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false",
+         "--server.fileWatcherType", "none", "--runner.postScriptGC", "false"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("streamlit server did not start")
+
+
+async def run_script(ws, widget_states=(), fragment_id=""):
+    # Send one rerun request and wait until the session is idle; returns the widgets it drew
+    # and the number of deltas (elements sent to the browser)
+    msg = BackMsg()
+    msg.rerun_script.query_string = ""
+    msg.rerun_script.fragment_id = fragment_id
+    msg.rerun_script.widget_states.widgets.extend(widget_states)
+    await ws.send(msg.SerializeToString())
+    widgets = {}
+    deltas = 0
+    while True:
+        fwd = ForwardMsg()
+        fwd.ParseFromString(await ws.recv())
+        kind = fwd.WhichOneof("type")
+        deltas += kind == "delta"
+        if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+            element = fwd.delta.new_element
+            widget = element.WhichOneof("type")
+            if widget in ("button", "checkbox"):
+                proto = getattr(element, widget)
+                widgets[proto.label] = (proto.id, fwd.delta.fragment_id)
+        elif kind == "script_finished" and fwd.script_finished not in RERUN_STATUSES:
+            return widgets, deltas
+
+
+def find_widget(widgets, label):
+    return next(value for key, value in widgets.items() if label in key)
+
+
+async def session(port, interactions, fragments, latencies, deltas):
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as ws:
+        widgets, _ = await run_script(ws)
+        stream_on = True
+        for i in range(interactions):
+            if i % 2 == 0:
+                label, state = RF_BUTTON, {"trigger_value": True}
+            else:
+                stream_on = not stream_on
+                label, state = STREAM_TOGGLE, {"bool_value": stream_on}
+            widget_id, fragment_id = find_widget(widgets, label)
+            click = BackMsg().rerun_script.widget_states.widgets.add(id=widget_id, **state)
+            # Keep the toggle's value on button clicks so the rerun matches a real browser
+            toggle = BackMsg().rerun_script.widget_states.widgets.add(id=find_widget(widgets, STREAM_TOGGLE)[0], bool_value=stream_on)
+            states = [click] if label == STREAM_TOGGLE else [click, toggle]
+            start = time.perf_counter()
+            _, sent = await run_script(ws, states, fragment_id if fragments else "")
+            latencies.append(time.perf_counter() - start)
+            deltas.append(sent)
+
+
+async def run(port, sessions, interactions, fragments):
+    latencies, deltas = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(session(port, interactions, fragments, latencies, deltas) for _ in range(sessions)))
+    return latencies, deltas, time.perf_counter() - start
+
+
+def main(sessions=50, interactions=10):
+    port = free_port()
+    server = start_server(port)
+    try:
+        asyncio.run(run(port, 2, 2, True))  # warm imports and resource caches
+        print(f"{sessions} concurrent sessions x {interactions} interactions")
+        for fragments in (False, True):
+            latencies, deltas, wall = asyncio.run(run(port, sessions, interactions, fragments))
+            ms = np.array(latencies) * 1000
+            label = "fragment reruns" if fragments else "full reruns    "
+            print(
+                f"{label}: p50 {np.percentile(ms, 50):7.1f} ms  p95 {np.percentile(ms, 95):7.1f} ms  "
+                f"mean {ms.mean():7.1f} ms  throughput {len(ms) / wall:6.1f} interactions/s  "
+                f"{np.mean(deltas):5.1f} deltas/interaction"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
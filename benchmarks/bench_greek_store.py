@@ -0,0 +1,74 @@
+# Benchmark: out-of-core stress from the memory-mapped greek / PV store (greek_store.py) vs. the
+# in-memory batch pass (run_observability_for_frame) on the same book.
+#   build      greeks and PVs simulated into the store -> trades/s, bytes on disk per trade
+#   stream     stress_store() windows through the store -> trades/s; peak RSS of a worker streaming
+#              four windows (stays flat as the book grows)
+#   in-memory  the whole book in one run_observability_for_frame call -> trades/s, peak RSS
+# Peak RSS is the process's own high-water mark (VmHWM), each measured in a fresh worker process.
+# The store is built from the same draws as the in-memory pass, so every trade's level must match.
+# Run from the repository root:  python -m benchmarks.bench_greek_store [rows] [window] [workers]
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_inference import INPUT_COLUMNS
+from benchmarks.bench_classification_rules import make_mixed_book
+from greek_store import GreekStore, _stress_range, stress_store
+from Observability_Stress_Module import run_observability_for_frame
+
+
+def peak_rss_mib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def build(path, rows):
+    np.random.seed(11)
+    GreekStore(path).append_simulated(make_mixed_book(rows)[INPUT_COLUMNS])
+
+
+def streamed_peak(path, start, end, window):
+    _stress_range(path, start, end, window, None)
+    return peak_rss_mib()
+
+
+def in_memory(rows):
+    np.random.seed(11)
+    result = run_observability_for_frame(make_mixed_book(rows)[INPUT_COLUMNS])
+    return result["Observability Level"].to_numpy(), peak_rss_mib()
+
+
+def main(rows=1_000_000, window=250_000, workers=2):
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            pool.submit(build, root, rows).result()
+        build_s = time.perf_counter() - start
+        disk = sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+        print(f"build      {rows:,} trades in {build_s:7.2f} s   {rows / build_s:10,.0f} trades/s   "
+              f"{disk / rows:6.0f} bytes/trade on disk")
+
+        report = stress_store(root, window=window, workers=workers, log=lambda msg: None)
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            peak = pool.submit(streamed_peak, root, 0, min(4 * window, rows), window).result()
+        print(f"stream     window {window:,} x {workers} workers   {report['trades_per_s']:10,.0f} trades/s   "
+              f"peak RSS {peak:7.0f} MiB per worker")
+        levels = GreekStore(root).results()["Observability Level"].to_numpy()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        memory_levels, memory_peak = pool.submit(in_memory, rows).result()
+    memory_s = time.perf_counter() - start
+    print(f"in-memory  one pass                      {rows / memory_s:10,.0f} trades/s   peak RSS {memory_peak:7.0f} MiB")
+    print(f"identical levels: {(levels == memory_levels).all()}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
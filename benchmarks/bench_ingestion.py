@@ -0,0 +1,71 @@
+# Benchmark: trade file ingestion with explicit dtypes and vectorized validation (trade_schema.py) vs.
+# the previous plain read (pd.read_csv, then a column-presence check).
+#   parse      wall time to a frame ready for inference (schema: parse + every domain check)
+#   frame      deep memory of the resulting frame, and bytes per trade
+#   peak RSS   process high-water mark while reading, each approach in a fresh worker process
+#   rules      classify_frame over the result, to show the lean dtypes cost nothing downstream
+# The file is a mixed book plus trading_desk / trade_id columns, with 0.1% of rows made invalid.
+# Run from the repository root:  python -m benchmarks.bench_ingestion [rows]
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch_inference import INPUT_COLUMNS
+from benchmarks.bench_classification_rules import make_mixed_book
+from benchmarks.bench_greek_store import peak_rss_mib
+from classification_rules import classify_frame
+from trade_schema import load_trades
+
+
+def write_book(path, rows):
+    rng = np.random.default_rng(5)
+    book = make_mixed_book(rows)
+    book["trading_desk"] = rng.choice(["Rates NY", "Rates LDN", "Credit", "Structured", "XVA"], rows)
+    book["trade_id"] = [f"T{n:08d}" for n in range(rows)]
+    bad = rng.choice(rows, rows // 1000, replace=False)
+    book["currency"] = book["currency"].astype(object)
+    book.loc[bad[::2], "currency"] = "XXX"
+    book.loc[bad[1::2], "maturity_tenor"] = 99
+    book.to_csv(path, index=False)
+
+
+def plain(path):
+    start = time.perf_counter()
+    df = pd.read_csv(path)
+    assert all(col in df.columns for col in INPUT_COLUMNS)
+    return time.perf_counter() - start, df
+
+
+def schema(path):
+    start = time.perf_counter()
+    df, errors = load_trades(path)
+    return time.perf_counter() - start, df
+
+
+def measure(reader, path):
+    seconds, df = reader(path)
+    memory = df.memory_usage(deep=True).sum()
+    start = time.perf_counter()
+    classify_frame(df)
+    return seconds, memory, len(df), time.perf_counter() - start, peak_rss_mib()
+
+
+def main(rows=1_000_000):
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "trades.csv")
+        write_book(path, rows)
+        print(f"{rows:,} trades, {os.path.getsize(path) / 1e6:.0f} MB CSV")
+        for label, reader in [("plain", plain), ("schema", schema)]:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                seconds, memory, kept, rules_s, peak = pool.submit(measure, reader, path).result()
+            print(f"{label:7s} parse {seconds:6.2f} s   frame {memory / 2**20:7.1f} MiB ({memory / kept:5.0f} bytes/trade)   "
+                  f"peak RSS {peak:6.0f} MiB   rules {rules_s:5.2f} s   {kept:,} rows kept")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
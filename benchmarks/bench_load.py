@@ -0,0 +1,353 @@
+# Load test: how many concurrent users app.py sustains before latency collapses.
+# Starts the stub model and OpenAI endpoints from benchmarks.stubs (latency distribution and error rate
+# configurable) and `streamlit run app.py` with the production flags, then drives N browser-less sessions
+# over the Streamlit websocket protocol at each concurrency level:
+#   workflows  every round picks a new trade (strike and maturity), then clicks Run Model Inference ->
+#              Run Risk Factor Inference -> Run Rationale. Trades where the model and the risk factors agree
+#              take the template route and the rest call the OpenAI stub, so the rationale step sees a mix
+#   batch      opens the Machine Learning page, uploads a generated CSV to the Batch Inference tab and polls
+#              the job fragment the way the browser does until the results render
+# Reports per scenario and level: throughput, p50 / p95 / p99 per step, errors (exceptions and failure
+# messages) and warnings (fallbacks) shown to the sessions, and the server's resident memory (start, peak
+# and end of the level, read from /proc).
+# A fresh server per scenario; levels within a scenario share it, as real sessions would.
+# Requires the `websockets` package (installed with recent Streamlit releases); Linux only (/proc).
+# Run from the repository root:
+#   python -m benchmarks.bench_load [--scenario workflows|batch|all] [--sessions 1,5,10,25] [--rounds 3]
+#       [--batch-rows 2000] [--ml-latency-ms 20] [--ml-jitter 0.5] [--ml-error-rate 0.02]
+#       [--openai-latency-ms 400] [--openai-jitter 0.5] [--openai-error-rate 0.01]
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from benchmarks.bench_fragments import ROOT, free_port
+from benchmarks.bench_result_viewer import make_book
+from benchmarks.bench_service import wait_for_port
+
+BATCH_PAGE = "Machine_Learning_Model_Prediction"
+RERUN_STATUSES = (ForwardMsg.FINISHED_EARLY_FOR_RERUN,)
+
+
+# --- Servers ---
+def start_stubs(port, args):
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stubs", "--port", str(port),
+         "--ml-latency-ms", str(args.ml_latency_ms), "--ml-jitter", str(args.ml_jitter),
+         "--ml-error-rate", str(args.ml_error_rate), "--openai-latency-ms", str(args.openai_latency_ms),
+         "--openai-jitter", str(args.openai_jitter), "--openai-error-rate", str(args.openai_error_rate),
+         "--seed", "7"],
+        cwd=ROOT
+    )
+
+
+def start_app(port, stub_port, workdir):
+    env = dict(
+        os.environ,
+        AZURE_ML_ENDPOINT=f"http://127.0.0.1:{stub_port}/score",
+        AZURE_OPENAI_ENDPOINT=f"http://127.0.0.1:{stub_port}",
+        AZURE_OPENAI_API_KEY="stub",
+        AZURE_OPENAI_MODEL="stub",
+        # Fresh caches, job store and traces per run, so no scenario starts warm from an earlier one
+        RATIONALE_CACHE_PATH=os.path.join(workdir, "rationale_cache.sqlite3"),
+        JOB_ROOT=os.path.join(workdir, "jobs"),
+        TRACE_DB_PATH=os.path.join(workdir, "traces.sqlite3"),
+    )
+    # Uploads come from the harness, not a browser page, so there is no XSRF cookie to echo back
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false",
+         "--server.fileWatcherType", "none", "--runner.postScriptGC", "false",
+         "--server.enableXsrfProtection", "false"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+# --- Server memory: the app process and its children, sampled in the background ---
+def rss_bytes(pid):
+    total = 0
+    pids = [pid]
+    while pids:
+        pid = pids.pop()
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                total += next(int(line.split()[1]) * 1024 for line in status if line.startswith("VmRSS:"))
+            for tid in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{tid}/children") as children:
+                    pids.extend(int(child) for child in children.read().split())
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+class MemorySampler:
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.start = self.peak = rss_bytes(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes(self.pid))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        end = rss_bytes(self.pid)
+        return self.start, max(self.peak, end), end
+
+
+# --- One browser-less session over the websocket protocol ---
+class Session:
+    def __init__(self, ws, port, page_name=""):
+        self.ws = ws
+        self.port = port
+        self.page_name = page_name
+        self.page_script_hash = ""
+        self.session_id = None
+        self.widgets = {}        # label -> (widget id, fragment id)
+        self.states = {}         # widget id -> WidgetState the browser would keep sending
+        self.auto_reruns = {}    # fragment id -> interval (st.fragment(run_every=...))
+        self.errors = self.warnings = 0
+        self.first_error = ""
+
+    async def run(self, triggers=(), fragment_id="", auto=False):
+        # One rerun request, until the session is idle; returns the texts of the success alerts it drew
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_name = self.page_name
+        # Once the server has resolved the page, send its hash like the browser does; reruns the
+        # server starts itself (st.rerun) otherwise fall back to the main script
+        msg.rerun_script.page_script_hash = self.page_script_hash
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.is_auto_rerun = auto
+        msg.rerun_script.widget_states.widgets.extend(list(self.states.values()) + list(triggers))
+        await self.ws.send(msg.SerializeToString())
+        successes = []
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await self.ws.recv())
+            kind = fwd.WhichOneof("type")
+            if kind == "new_session":
+                self.session_id = fwd.new_session.initialize.session_id
+                if not fwd.new_session.fragment_ids_this_run:
+                    self.auto_reruns = {}  # a full run redraws (or drops) every run_every fragment
+            elif kind == "navigation":
+                self.page_script_hash = fwd.navigation.page_script_hash
+            elif kind == "auto_rerun":
+                self.auto_reruns[fwd.auto_rerun.fragment_id] = fwd.auto_rerun.interval
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                widget = element.WhichOneof("type")
+                if widget in ("button", "checkbox", "file_uploader", "slider", "selectbox"):
+                    proto = getattr(element, widget)
+                    self.widgets[proto.label] = (proto.id, fwd.delta.fragment_id)
+                elif widget == "exception":
+                    self.errors += 1
+                    self.first_error = self.first_error or f"{element.exception.type}: {element.exception.message}"
+                elif widget == "alert":
+                    # st.error also shows Level 3 results; the app's failure messages all say "failed"
+                    if element.alert.format == element.alert.ERROR and "failed" in element.alert.body:
+                        self.errors += 1
+                        self.first_error = self.first_error or element.alert.body
+                    self.warnings += element.alert.format == element.alert.WARNING
+                    if element.alert.format == element.alert.SUCCESS:
+                        successes.append(element.alert.body)
+            elif kind == "script_finished" and fwd.script_finished not in RERUN_STATUSES:
+                return successes
+
+    def widget(self, label):
+        return next(value for key, value in self.widgets.items() if label in key)
+
+    async def click(self, label):
+        widget_id, fragment_id = self.widget(label)
+        trigger = BackMsg().rerun_script.widget_states.widgets.add(id=widget_id, trigger_value=True)
+        return await self.run([trigger], fragment_id)
+
+    def set_slider(self, label, value):
+        # Widget values are sent with the next rerun, as the browser does
+        state = BackMsg().rerun_script.widget_states.widgets.add(id=self.widget(label)[0])
+        state.double_array_value.data.append(value)
+        self.states[state.id] = state
+
+    def set_selectbox(self, label, option):
+        state = BackMsg().rerun_script.widget_states.widgets.add(id=self.widget(label)[0], string_value=str(option))
+        self.states[state.id] = state
+
+    async def upload(self, label, name, data):
+        # What the browser does: PUT the file for this session, then rerun with the uploader's new state
+        import requests  # plain multipart PUT; off the event loop below
+
+        widget_id, _ = self.widget(label)
+        file_id = uuid.uuid4().hex
+        url = f"/_stcore/upload_file/{self.session_id}/{file_id}"
+        response = await asyncio.to_thread(
+            requests.put, f"http://127.0.0.1:{self.port}{url}", files={"file": (name, data, "text/csv")}, timeout=60
+        )
+        response.raise_for_status()
+        state = BackMsg().rerun_script.widget_states.widgets.add(id=widget_id)
+        info = state.file_uploader_state_value.uploaded_file_info.add(file_id=file_id, name=name, size=len(data))
+        info.file_urls.file_id = file_id
+        info.file_urls.upload_url = url
+        info.file_urls.delete_url = url
+        self.states[widget_id] = state
+        return await self.run()
+
+    async def wait_for(self, text, successes, timeout=600):
+        # Poll the session's run_every fragments, as the browser's timers would, until `text` is drawn
+        deadline = time.perf_counter() + timeout
+        while not any(text in body for body in successes):
+            if not self.auto_reruns or time.perf_counter() > deadline:
+                raise RuntimeError(f"session never showed {text!r}")
+            fragment_id, interval = next(iter(self.auto_reruns.items()))
+            await asyncio.sleep(interval)
+            successes = await self.run(fragment_id=fragment_id, auto=True)
+
+
+def connect(port):
+    return websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None)
+
+
+# --- Scenarios: each returns {step: [seconds, ...]} plus the units of work done ---
+async def workflows_session(port, rounds, timings, totals, rng):
+    async with connect(port) as ws:
+        session = Session(ws, port)
+        await session.run()
+        for n in range(rounds):
+            start = time.perf_counter()
+            session.set_slider("Strike", round(rng.uniform(0.0, 10.0), 1))
+            session.set_selectbox("Maturity Tenor", rng.choice([5, 10, 15, 20, 30]))
+            await session.run()
+            timings.setdefault("new_trade", []).append(time.perf_counter() - start)
+            for step, label in (
+                ("model", "Run Model Inference"),
+                ("risk_factor", "Run Risk Factor Inference Workflow"),
+                ("rationale", "Run Rationale Generation Workflow"),
+            ):
+                step_start = time.perf_counter()
+                await session.click(label)
+                timings.setdefault(step, []).append(time.perf_counter() - step_start)
+            timings.setdefault("round", []).append(time.perf_counter() - start)
+            totals["work"] += 1
+        totals["errors"] += session.errors
+        totals["warnings"] += session.warnings
+        totals["first_error"] = totals["first_error"] or session.first_error
+
+
+async def batch_session(port, rounds, csv_bytes, rows, timings, totals):
+    async with connect(port) as ws:
+        session = Session(ws, port, page_name=BATCH_PAGE)
+        await session.run()
+        for n in range(rounds):
+            start = time.perf_counter()
+            # A new file name per round; the page starts one job per uploaded file
+            successes = await session.upload("Upload CSV", f"trades_{n}.csv", csv_bytes)
+            timings.setdefault("first_render", []).append(time.perf_counter() - start)
+            await session.wait_for("Inference completed", successes)
+            timings.setdefault("batch_job", []).append(time.perf_counter() - start)
+            totals["work"] += rows
+        totals["errors"] += session.errors
+        totals["warnings"] += session.warnings
+        totals["first_error"] = totals["first_error"] or session.first_error
+
+
+async def run_level(scenario, port, sessions, rounds, csv_bytes, rows):
+    timings, totals = {}, {"work": 0, "errors": 0, "warnings": 0, "first_error": ""}
+    start = time.perf_counter()
+    if scenario == "workflows":
+        rng = np.random.default_rng(sessions)
+        jobs = [workflows_session(port, rounds, timings, totals, rng) for _ in range(sessions)]
+    else:
+        jobs = [batch_session(port, rounds, csv_bytes, rows, timings, totals) for _ in range(sessions)]
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    totals["failed_sessions"] = len(failures)
+    totals["failure"] = f"{type(failures[0]).__name__}: {failures[0]}" if failures else ""
+    return timings, totals, time.perf_counter() - start
+
+
+# --- Report ---
+def report(scenario, sessions, timings, totals, wall, memory, rows):
+    unit = "rounds/s" if scenario == "workflows" else "trades/s"
+    start, peak, end = (value / 2 ** 20 for value in memory)
+    print(
+        f"  {sessions:3d} sessions  {totals['work'] / wall:9.1f} {unit}   errors {totals['errors']}  "
+        f"warnings {totals['warnings']}  failed sessions {totals['failed_sessions']}   "
+        f"server RSS {start:6.0f} -> peak {peak:6.0f} -> {end:6.0f} MB"
+    )
+    if totals["failure"]:
+        print(f"      first failed session: {totals['failure']}")
+    if totals["first_error"]:
+        print(f"      first error shown: {totals['first_error'][:160]}")
+    for step, seconds in timings.items():
+        ms = np.array(seconds) * 1000
+        print(
+            f"      {step:13s} p50 {np.percentile(ms, 50):8.1f} ms   p95 {np.percentile(ms, 95):8.1f} ms   "
+            f"p99 {np.percentile(ms, 99):8.1f} ms   n={len(ms)}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=["workflows", "batch", "all"], default="all")
+    parser.add_argument("--sessions", default="1,5,10,25", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=3, help="workflow rounds / uploads per session")
+    parser.add_argument("--batch-rows", type=int, default=2000)
+    parser.add_argument("--ml-latency-ms", type=float, default=20.0)
+    parser.add_argument("--ml-jitter", type=float, default=0.5)
+    parser.add_argument("--ml-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-latency-ms", type=float, default=400.0)
+    parser.add_argument("--openai-jitter", type=float, default=0.5)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.sessions.split(",")]
+    scenarios = ["workflows", "batch"] if args.scenario == "all" else [args.scenario]
+    csv_bytes = make_book(args.batch_rows).to_csv(index=False).encode("utf-8")
+    print(
+        f"stubs: model {args.ml_latency_ms:.0f} ms (jitter {args.ml_jitter}, errors {args.ml_error_rate:.0%}), "
+        f"OpenAI {args.openai_latency_ms:.0f} ms (jitter {args.openai_jitter}, errors {args.openai_error_rate:.0%})"
+    )
+
+    stub_port = free_port()
+    stubs = start_stubs(stub_port, args)
+    try:
+        wait_for_port(stub_port, stubs)
+        for scenario in scenarios:
+            with tempfile.TemporaryDirectory() as workdir:
+                port = free_port()
+                app = start_app(port, stub_port, workdir)
+                try:
+                    wait_for_port(port, app)
+                    asyncio.run(run_level(scenario, port, 1, 1, csv_bytes, args.batch_rows))  # warm imports and caches
+                    label = f"{args.rounds} rounds" if scenario == "workflows" else f"{args.rounds} uploads of {args.batch_rows} trades"
+                    print(f"{scenario}: {label} per session")
+                    for sessions in levels:
+                        sampler = MemorySampler(app.pid)
+                        timings, totals, wall = asyncio.run(
+                            run_level(scenario, port, sessions, args.rounds, csv_bytes, args.batch_rows)
+                        )
+                        report(scenario, sessions, timings, totals, wall, sampler.stop(), args.batch_rows)
+                finally:
+                    app.terminate()
+                    app.wait()
+    finally:
+        stubs.terminate()
+        stubs.wait()
+
+
+if __name__ == "__main__":
+    main()
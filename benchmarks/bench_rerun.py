@@ -0,0 +1,82 @@
+# Benchmark: app.py script rerun time, baseline tree vs. the current one.
+# The baseline commit (before the shared resource layer) is exported with `git archive` into a temp
+# directory; the current tree is the working directory. Each app runs under AppTest in a fresh spawned
+# worker process, so neither tree's modules or resource caches leak into the other. The first run
+# (imports, process-wide resources) is excluded; the figures are per rerun of an idle session.
+# Also prints what the baseline paid on every rerun: reading the grid CSVs and building an AzureOpenAI client.
+# Run from the repository root:  python -m benchmarks.bench_rerun [reruns] [baseline_commit]
+import io
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BASELINE_COMMIT = "0c1860d"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_build(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def export_tree(commit, target):
+    archive = subprocess.run(["git", "archive", commit], cwd=ROOT, check=True, capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target)
+
+
+def time_reruns(root, reruns, scratch):
+    # Runs in a fresh worker: the tree's own modules, grid files and relative paths
+    os.chdir(root)
+    sys.path.insert(0, root)
+    for key, value in {"AZURE_ML_ENDPOINT": "http://127.0.0.1:9/score", "AZURE_OPENAI_ENDPOINT": "http://127.0.0.1:9",
+                       "AZURE_OPENAI_API_KEY": "benchmark", "TRACE_DB_PATH": os.path.join(scratch, "traces.sqlite3"),
+                       "RATIONALE_CACHE_PATH": os.path.join(scratch, "rationale_cache.sqlite3"),
+                       "AUDIT_LOG_DIR": os.path.join(scratch, "audit"), "JOB_ROOT": os.path.join(scratch, "jobs")}.items():
+        os.environ.setdefault(key, value)
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(root, "app.py"), default_timeout=60)
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"{root}/app.py failed: {app.exception[0].message}")
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), statistics.mean(times)
+
+
+def run_isolated(root, reruns, scratch):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(time_reruns, root, reruns, scratch).result()
+
+
+def main(reruns=30, baseline_commit=BASELINE_COMMIT):
+    from openai import AzureOpenAI
+
+    import gpt_client
+    from Observability_Stress_Module import load_observability_grids
+
+    print(f"grid CSV load:        {time_build(load_observability_grids):.2f} ms")
+    new_client = lambda: AzureOpenAI(api_key="k", api_version=gpt_client.OPENAI_API_VERSION, azure_endpoint="http://127.0.0.1:9")
+    print(f"AzureOpenAI client:   {time_build(new_client):.2f} ms")
+
+    with tempfile.TemporaryDirectory() as baseline, tempfile.TemporaryDirectory() as scratch:
+        export_tree(baseline_commit, baseline)
+        for label, root in [(f"baseline {baseline_commit}", baseline), ("current", ROOT)]:
+            median, mean = run_isolated(root, reruns, os.path.join(scratch, label.split()[0]))
+            print(f"app.py rerun, {label:17s} median {median:7.1f} ms   mean {mean:7.1f} ms   ({reruns} reruns)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30, *sys.argv[2:3])
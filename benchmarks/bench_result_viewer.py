@@ -0,0 +1,72 @@
+# Benchmark: browsing and exporting a large batch result from the on-disk job chunks vs. the
+# in-memory path (load every row, then df.to_csv() into one string per session).
+# Each operation runs in a forked child; reports its wall time and how far it grew the process's peak RSS.
+# Run from the repository root:  python -m benchmarks.bench_result_viewer [rows]
+import os
+import sys
+import tempfile
+import time
+import resource
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("AZURE_ML_ENDPOINT", "http://127.0.0.1:9/score")  # unreachable: rule-based fallback
+
+from job_manager import PREDICTION_COLUMN, JobManager
+
+
+def make_book(rows, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "product_type": rng.choice(["IR Swaption", "Bond", "CapFloor", "IRSwap"], rows),
+        "currency": rng.choice(["USD", "EUR", "GBP", "JPY"], rows),
+        "option_type": rng.choice(["Receiver", "Payer"], rows),
+        "notional": rng.choice([1_000_000, 10_000_000, 50_000_000], rows),
+        "strike": rng.uniform(0.0, 10.0, rows).round(2),
+        "expiry_tenor": rng.choice([2, 3, 5, 10], rows),
+        "maturity_tenor": rng.choice([5, 10, 15, 20, 30], rows),
+        "trading_desk": rng.choice([f"Desk {i}" for i in range(12)], rows),
+    })
+
+
+def measure(label, fn):
+    read_end, write_end = os.pipe()
+    if os.fork() == 0:
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+        os.write(write_end, f"{elapsed} {growth}".encode())
+        os._exit(0)
+    os.close(write_end)
+    os.wait()
+    elapsed, growth = os.read(read_end, 64).decode().split()
+    print(f"{label:<42} {float(elapsed) * 1000:9.1f} ms   peak RSS +{int(growth) / 1024:7.1f} MiB")
+
+
+def main(rows=1_000_000):
+    with tempfile.TemporaryDirectory() as root:
+        manager = JobManager(root=root, max_workers=1)
+        start = time.perf_counter()
+        job_id = manager.submit(make_book(rows), "mixed")
+        while manager.status(job_id)["status"] in ("queued", "running"):
+            time.sleep(0.2)
+        print(f"{rows:,} rows, {manager.status(job_id)['total_chunks']} chunks, job ran in {time.perf_counter() - start:.1f}s\n")
+
+        level3 = {PREDICTION_COLUMN: ["Level 3"], "currency": ["EUR"], "trading_desk": ["Desk 3"]}
+        measure("viewer: first open (reads facet files)", lambda: manager.facet_values(job_id))
+        manager.facet_values(job_id)  # later reruns find the facet table in memory
+        measure("viewer: filter options", lambda: manager.facet_values(job_id))
+        measure("viewer: first page", lambda: manager.read_page(job_id, page=0))
+        measure("viewer: last page", lambda: manager.read_page(job_id, page=rows // 100 - 1))
+        measure("viewer: filtered page 5", lambda: manager.read_page(job_id, level3, page=5))
+        measure("export: CSV, chunk by chunk", lambda: manager.export(job_id, fmt="csv"))
+        measure("export: Parquet, chunk by chunk", lambda: manager.export(job_id, fmt="parquet"))
+        measure("in-memory: load all + head(11)", lambda: manager.load_results(job_id).head(11))
+        measure("in-memory: load all + to_csv()", lambda: manager.load_results(job_id).to_csv(index=False))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
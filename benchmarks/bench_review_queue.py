@@ -0,0 +1,73 @@
+# Benchmark: model vs. observability reconciliation and the persisted review queue (reconciliation.py).
+#   reconcile   Reconciler.add() over the run chunk by chunk -> trades/s, vs. comparing the two levels
+#               trade by trade in Python (the single-trade check page 2 does, looped over the book)
+#   save        writing the ranked queue and per-dimension statistics to SQLite
+#   page        latency of reading one 50-item page at the front, middle and end of the queue,
+#               unfiltered and filtered by status + currency
+# Observability levels come from run_observability_for_frame; predictions from the mixed batch predictor
+# with the model endpoint unreachable (rules fallback), so the run needs no network.
+# Run from the repository root:  python -m benchmarks.bench_review_queue [rows] [chunk_size]
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("ML_ENDPOINT_URL", "http://127.0.0.1:9/score")
+
+from batch_inference import BATCH_PREDICTORS, INPUT_COLUMNS, PREDICTION_COLUMN
+from benchmarks.bench_classification_rules import make_mixed_book
+from Observability_Stress_Module import run_observability_for_frame
+from reconciliation import Reconciler, ReviewQueue
+
+
+def per_trade(results):
+    # One comparison per trade, as the single-trade page does it
+    queue = []
+    for trade in results.to_dict(orient="records"):
+        if trade[PREDICTION_COLUMN] != trade["Observability Level"]:
+            queue.append((trade["Unobservable PV"], trade))
+    return sorted(queue, key=lambda item: -item[0])
+
+
+def page_ms(queue, run_id, filters, after_rank, repeat=50):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        queue.page(run_id, filters, after_rank=after_rank, page_size=50)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(rows=200_000, chunk_size=5000):
+    book = make_mixed_book(rows)[INPUT_COLUMNS]
+    book[PREDICTION_COLUMN] = BATCH_PREDICTORS["mixed"](book)[0]
+    results = book.join(run_observability_for_frame(book))
+
+    start = time.perf_counter()
+    reconciler = Reconciler()
+    for n in range(0, rows, chunk_size):
+        reconciler.add(results.iloc[n:n + chunk_size])
+    summary = reconciler.summary()
+    vector_s = time.perf_counter() - start
+    start = time.perf_counter()
+    looped = per_trade(results)
+    loop_s = time.perf_counter() - start
+    print(f"{rows:,} trades, {summary['disagreements']:,} disagreements ({summary['disagreement_rate']:.1%})")
+    print(f"reconcile   vectorized {rows / vector_s:12,.0f} trades/s   per trade {rows / loop_s:10,.0f} trades/s   "
+          f"{loop_s / vector_s:5.1f}x faster   same queue: {len(looped) == summary['disagreements']}")
+
+    with tempfile.TemporaryDirectory() as root:
+        queue = ReviewQueue(os.path.join(root, "review_queue.sqlite3"))
+        start = time.perf_counter()
+        run_id = queue.save(reconciler, source="benchmark")
+        print(f"save        {time.perf_counter() - start:8.2f} s   "
+              f"{os.path.getsize(queue.path) / summary['disagreements']:6.0f} bytes/item")
+        total = summary["disagreements"]
+        for label, filters in [("all", None), ("open EUR", {"status": ["open"], "currency": ["EUR"]})]:
+            front, middle, end = (page_ms(queue, run_id, filters, rank) for rank in (0, total // 2, max(total - 200, 0)))
+            print(f"page {label:9s} front {front:6.2f} ms   middle {middle:6.2f} ms   end {end:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,148 @@
+# Load test: classification_service under sustained load on one machine, with the stub ML and OpenAI
+# endpoints from benchmarks.stubs (20 ms model latency, 400 ms GPT latency by default).
+#   single   N concurrent keep-alive clients POST /classify for a fixed duration -> sustained requests/s,
+#            p50 / p99 latency (IR Swaptions go through the model, other products through the rules)
+#   batch    one POST /classify/batch of a whole book -> time to first NDJSON line, total time, trades/s
+# Starts `uvicorn classification_service:app` (one event loop, SERVICE_WORKERS stress processes).
+# Run from the repository root:  python -m benchmarks.bench_service [concurrency] [seconds] [batch_trades]
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_fragments import ROOT, free_port
+from benchmarks.bench_result_viewer import make_book
+
+
+def wait_for_port(port, proc, timeout=60):
+    import socket
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("process exited before listening")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+def start_services(stub_port, service_port, workers):
+    stubs = subprocess.Popen([sys.executable, "-m", "benchmarks.stubs", "--port", str(stub_port)], cwd=ROOT)
+    env = dict(
+        os.environ,
+        AZURE_ML_ENDPOINT=f"http://127.0.0.1:{stub_port}/score",
+        AZURE_OPENAI_ENDPOINT=f"http://127.0.0.1:{stub_port}",
+        AZURE_OPENAI_API_KEY="stub",
+        AZURE_OPENAI_MODEL="stub",
+        RATIONALE_CACHE_PATH=os.path.join(ROOT, ".cache", "bench_service_rationale.sqlite3"),
+        SERVICE_WORKERS=str(workers),
+    )
+    service = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "classification_service:app", "--port", str(service_port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env
+    )
+    wait_for_port(stub_port, stubs)
+    wait_for_port(service_port, service)
+    return stubs, service
+
+
+# --- Minimal keep-alive HTTP/1.1 client (Content-Length and chunked bodies) ---
+class Connection:
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def post(self, path, body, on_chunk=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        data = json.dumps(body).encode("utf-8")
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode("ascii") + data
+        )
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            parts = []
+            while size := int((await self.reader.readline()).strip(), 16):
+                parts.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+                if on_chunk:
+                    on_chunk(parts[-1])
+            await self.reader.readline()
+            return status, b"".join(parts)
+        return status, await self.reader.readexactly(int(headers["content-length"]))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def single_load(port, trades, concurrency, seconds):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(offset):
+        nonlocal errors
+        conn = Connection(port)
+        n = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await conn.post("/classify", trades[n % len(trades)])
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+            n += concurrency
+        conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def batch_load(port, trades):
+    conn = Connection(port)
+    first = []
+    start = time.perf_counter()
+    status, body = await conn.post("/classify/batch", {"trades": trades}, on_chunk=lambda _: first or first.append(time.perf_counter()))
+    total = time.perf_counter() - start
+    conn.close()
+    lines = body.decode("utf-8").splitlines()
+    return status, len(lines), first[0] - start, total
+
+
+def main(concurrency=32, seconds=15, batch_trades=2000):
+    workers = os.cpu_count()
+    stub_port, service_port = free_port(), free_port()
+    book = make_book(max(batch_trades, 1000), seed=7)
+    trades = book.drop(columns=["trading_desk"]).to_dict(orient="records")
+    stubs, service = start_services(stub_port, service_port, workers)
+    try:
+        asyncio.run(single_load(service_port, trades, 4, 2))  # warm the dispatcher, HTTP pools and workers
+        latencies, errors, wall = asyncio.run(single_load(service_port, trades, concurrency, seconds))
+        ms = np.array(latencies) * 1000
+        print(f"POST /classify: {concurrency} concurrent clients for {seconds}s, {workers} stress workers")
+        print(
+            f"  sustained {len(ms) / wall:7.1f} req/s   p50 {np.percentile(ms, 50):6.1f} ms   "
+            f"p99 {np.percentile(ms, 99):6.1f} ms   max {ms.max():6.1f} ms   errors {errors}"
+        )
+        status, lines, first_line, total = asyncio.run(batch_load(service_port, trades[:batch_trades]))
+        print(f"POST /classify/batch: {batch_trades} trades (HTTP {status}, {lines} NDJSON lines)")
+        print(f"  first line {first_line * 1000:7.1f} ms   total {total:6.2f} s   {lines / total:7.1f} trades/s")
+    finally:
+        for proc in (service, stubs):
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
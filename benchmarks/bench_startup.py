@@ -0,0 +1,86 @@
+# Benchmark: container cold start - dependency step, module imports and time to first render of app.py.
+#   dependency step   startup.sh's stamp check vs. the `pip install -r requirements.txt` it used to run
+#                     on every start (measured as a no-op --dry-run against the current environment)
+#   imports           a fresh interpreter importing the app's module graph; lists which heavy client
+#                     libraries were pulled in (openai, requests, streamlit_echarts load on first use)
+#   first render      `streamlit run app.py` spawned until the first script run finishes for one session
+# Run from the repository root:  python -m benchmarks.bench_startup [repeats]
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import websockets
+
+from benchmarks.bench_fragments import ROOT, free_port, run_script, start_server
+
+APP_MODULES = [
+    "streamlit", "Observability_Stress_Module", "shared_resources", "ml_client", "gpt_client",
+    "classification_rules", "rationale_templates", "workflow_styles"
+]
+HEAVY_MODULES = ["openai", "requests", "streamlit_echarts"]
+
+
+def timed(cmd, **kwargs):
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+    return time.perf_counter() - start
+
+
+def time_dependency_step():
+    stamp_check = (
+        "SITE_PACKAGES=$(python -c \"import sysconfig; print(sysconfig.get_paths()['purelib'])\"); "
+        "cat requirements.txt wheelhouse/requirements.lock 2>/dev/null | sha256sum | cut -d' ' -f1 > /dev/null; "
+        "cat \"$SITE_PACKAGES/.swaption_ui_requirements.sha256\" 2>/dev/null; true"
+    )
+    env = dict(os.environ, PATH=os.path.dirname(sys.executable) + os.pathsep + os.environ.get("PATH", ""))
+    skip = timed(["bash", "-c", stamp_check], env=env)
+    pip = timed([sys.executable, "-m", "pip", "install", "--dry-run", "-q", "-r", "requirements.txt"])
+    return skip, pip
+
+
+def time_imports():
+    script = (
+        "import sys, time; start = time.perf_counter()\n"
+        f"for name in {APP_MODULES!r}: __import__(name)\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True).stdout.split("\n")
+    return float(out[0]), out[1] or "none"
+
+
+async def first_render(port, server_start):
+    while True:
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as ws:
+                await run_script(ws)
+                return time.perf_counter() - server_start
+        except OSError:
+            await asyncio.sleep(0.05)
+
+
+def time_first_render():
+    port = free_port()
+    start = time.perf_counter()
+    server = start_server(port)
+    try:
+        return asyncio.run(first_render(port, start))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(repeats=3):
+    skip, pip = time_dependency_step()
+    print(f"dependency step: stamp check {skip * 1000:7.1f} ms   pip install (no-op) {pip * 1000:7.1f} ms")
+    imports = [time_imports() for _ in range(repeats)]
+    print(f"app module imports: {np.median([t for t, _ in imports]) * 1000:7.1f} ms   heavy modules loaded: {imports[0][1]}")
+    renders = [time_first_render() for _ in range(repeats)]
+    print(f"time to first render (app.py): median {np.median(renders) * 1000:7.1f} ms   max {max(renders) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,121 @@
+# Stub Azure ML scoring and Azure OpenAI endpoints for load tests; no credentials or network needed.
+#   POST /score                                          one level per input row, after --ml-latency-ms
+#   POST /openai/deployments/<name>/chat/completions     a fixed rationale after --openai-latency-ms
+#                                                        (stream=true answers as server-sent events)
+# Latencies are lognormal around the given median: --*-jitter is the log-space sigma (0 = fixed,
+# 0.5 puts p99 at about 3x the median). --*-error-rate is the share of calls that fail after their
+# latency (HTTP 503 for the model, 500 for OpenAI), to exercise retries, hedging and the breakers.
+# Point the app at it with AZURE_ML_ENDPOINT=http://127.0.0.1:<port>/score and
+# AZURE_OPENAI_ENDPOINT=http://127.0.0.1:<port> (any AZURE_OPENAI_API_KEY).
+# Run from the repository root:  python -m benchmarks.stubs [--port 8900] [--ml-latency-ms 20] [--ml-jitter 0.5]
+#     [--ml-error-rate 0.02] [--openai-latency-ms 400] [--openai-jitter 0.5] [--openai-error-rate 0.01]
+import argparse
+import json
+import math
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RATIONALE = (
+    "**Level 3**\n\nUnobservable IR delta and volatility risk exceed 10% of trade PV.\n\n"
+    "Confidence: Medium - stub response from the load-test endpoint."
+)
+
+
+def stub_level(row):
+    # Deterministic per trade so repeated runs classify the same way
+    return "Level 3" if row[6] > 10 else "Level 2"
+
+
+def sample_latency(median, jitter):
+    return median * math.exp(random.gauss(0.0, jitter)) if jitter else median
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ml_latency = 0.02
+    openai_latency = 0.4
+    ml_jitter = openai_jitter = 0.0
+    ml_error_rate = openai_error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.startswith("/score"):
+            time.sleep(sample_latency(self.ml_latency, self.ml_jitter))
+            if random.random() < self.ml_error_rate:
+                self._send_json({"error": "stub model failure"}, status=503)
+            else:
+                self._send_json([stub_level(row) for row in body["input_data"]["data"]])
+        elif "/chat/completions" in self.path:
+            time.sleep(sample_latency(self.openai_latency, self.openai_jitter))
+            if random.random() < self.openai_error_rate:
+                self._send_json({"error": {"message": "stub OpenAI failure", "type": "server_error"}}, status=500)
+            elif body.get("stream"):
+                self._stream_completion(body)
+            else:
+                self._send_json(completion(body, RATIONALE))
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _stream_completion(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in RATIONALE.split(" "):
+            chunk = completion(body, word + " ", stream=True)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def completion(body, text, stream=False):
+    choice = {"index": 0, "finish_reason": None if stream else "stop"}
+    choice["delta" if stream else "message"] = {"role": "assistant", "content": text}
+    return {
+        "id": "stub", "object": "chat.completion.chunk" if stream else "chat.completion", "created": int(time.time()),
+        "model": body.get("model") or "stub", "choices": [choice],
+        **({} if stream else {"usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}})
+    }
+
+
+def serve(port=8900, ml_latency_ms=20.0, openai_latency_ms=400.0, ml_jitter=0.0, openai_jitter=0.0,
+          ml_error_rate=0.0, openai_error_rate=0.0, seed=None):
+    random.seed(seed)
+    StubHandler.ml_latency = ml_latency_ms / 1000.0
+    StubHandler.openai_latency = openai_latency_ms / 1000.0
+    StubHandler.ml_jitter = ml_jitter
+    StubHandler.openai_jitter = openai_jitter
+    StubHandler.ml_error_rate = ml_error_rate
+    StubHandler.openai_error_rate = openai_error_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ml-latency-ms", type=float, default=20.0)
+    parser.add_argument("--openai-latency-ms", type=float, default=400.0)
+    parser.add_argument("--ml-jitter", type=float, default=0.0)
+    parser.add_argument("--openai-jitter", type=float, default=0.0)
+    parser.add_argument("--ml-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    serve(
+        args.port, args.ml_latency_ms, args.openai_latency_ms, args.ml_jitter, args.openai_jitter,
+        args.ml_error_rate, args.openai_error_rate, args.seed
+    )
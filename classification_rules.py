@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+UNKNOWN_LEVEL = "Unknown"
+
+# --- Declarative rule-based classifier (offline fallback for the ML endpoint) ---
+# Per product: the first matching rule wins, otherwise the product default applies.
+# A rule matches when all of its (column, operator, value) conditions hold.
+# Defaults are the constants the per-product mock predictors returned; the IR Swaption rule is
+# the app's original offline fallback (mock_model_prediction).
+PRODUCT_RULES = {
+    "IR Swaption": {
+        "default": "Level 3",
+        "rules": [
+            {"level": "Level 2", "when": [("expiry_tenor", "<", 5), ("maturity_tenor", "<", 15), ("strike", "<", 3.0)]},
+        ],
+    },
+    "Bond": {
+        "default": "Level 1",
+        "rules": [
+            {"level": "Level 2", "when": [("rating", "in", ["BB", "B", "CCC"])]},
+        ],
+    },
+    "CapFloor": {
+        "default": "Level 3",
+        "rules": [
+            {"level": "Level 2", "when": [("expiry_tenor", "<", 5), ("maturity_tenor", "<=", 10), ("strike", "<", 5.0)]},
+        ],
+    },
+    "IRSwap": {
+        "default": "Level 2",
+        "rules": [],
+    },
+}
+
+
+def _isin(values, allowed):
+    return np.isin(values, list(allowed))
+
+
+_OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+    "in": _isin,
+}
+
+
+def compile_rules(product_rules=PRODUCT_RULES):
+    # Flatten to an ordered (product, conditions, level) list; defaults go last per product
+    compiled = []
+    for product_type, spec in product_rules.items():
+        for rule in spec["rules"]:
+            conditions = [(col, _OPERATORS[op], value) for col, op, value in rule["when"]]
+            compiled.append((product_type, conditions, rule["level"]))
+        compiled.append((product_type, [], spec["default"]))
+    return compiled
+
+
+COMPILED_RULES = compile_rules()
+
+
+def _column(df, cache, col, numeric):
+    # Each column is converted to a NumPy array at most once per evaluation
+    key = (col, numeric)
+    if key not in cache:
+        if numeric:
+            cache[key] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        else:
+            cache[key] = df[col].astype(object).to_numpy()
+    return cache[key]
+
+
+def _condition_mask(df, cache, col, op, value):
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    if op is _isin:
+        return op(_column(df, cache, col, numeric=False), value)
+    numeric = not isinstance(value, str)
+    with np.errstate(invalid="ignore"):
+        return op(_column(df, cache, col, numeric), value)
+
+
+def classify_frame(df, compiled_rules=COMPILED_RULES):
+    # Evaluate every rule as a boolean mask over the whole frame, then pick the first hit per row
+    cache = {}
+    product = _column(df, cache, "product_type", numeric=False)
+    product_masks = {}
+    condlist = []
+    choicelist = []
+    for product_type, conditions, level in compiled_rules:
+        if product_type not in product_masks:
+            product_masks[product_type] = product == product_type
+        mask = product_masks[product_type].copy()
+        for col, op, value in conditions:
+            mask &= _condition_mask(df, cache, col, op, value)
+        condlist.append(mask)
+        choicelist.append(level)
+    if not condlist:
+        return np.full(len(df), UNKNOWN_LEVEL, dtype=object)
+    return np.select(condlist, np.array(choicelist, dtype=object), default=UNKNOWN_LEVEL)
+
+
+def classify_trade(trade, compiled_rules=COMPILED_RULES):
+    return classify_frame(pd.DataFrame([trade]), compiled_rules)[0]
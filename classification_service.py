@@ -0,0 +1,230 @@
+# HTTP classification service for upstream booking systems, independent of the Streamlit UI.
+#   GET  /health            liveness plus worker and model-batching stats
+#   POST /classify          one trade (JSON object) -> model level, observability stress, optional rationale
+#   POST /classify/batch    {"trades": [...]} or a JSON list -> NDJSON stream, one line per trade in input order
+#   GET  /exports/{job_id}/{name}   a prepared batch-job export file, streamed from disk (?filename= names the download)
+# Query parameters: rationale=true adds the written rationale; chunk_size (batch) sets trades per worker task.
+# Trades get the upload checks of trade_schema: a request with any failing trade is a 422 listing every error.
+# The event loop only does I/O: model calls go through the shared micro-batching dispatcher, the stress math
+# runs in a process pool, and GPT calls run in threads within one RPM/TPM budget shared by all requests.
+# Run:  uvicorn classification_service:app --host 0.0.0.0 --port 8000
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app_config import get_int_setting, get_secret
+from batch_inference import INPUT_COLUMNS, PREDICTION_COLUMN, needs_rationale, predict_mixed_frame, stress_columns
+from classification_rules import classify_trade
+from job_manager import JobManager
+from ml_client import get_dispatcher
+from Observability_Stress_Module import reseed_worker, run_observability_for_frame
+from trade_schema import missing_columns, validate_trades
+from tracing import span
+
+# Response field -> pipeline column
+RESULT_FIELDS = {
+    "predicted_level": PREDICTION_COLUMN,
+    "observability_level": "Observability Level",
+    "trade_pv": "Trade PV",
+    "unobservable_pv": "Unobservable PV",
+    "ir_summary": "ir_summary",
+    "vol_summary": "vol_summary",
+}
+
+
+class TradeError(ValueError):
+    # errors: one {"row", "column", "value", "error"} per failed check, row 1 being the first trade
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+def _trade_frame(trades):
+    # The upload checks and dtypes of trade_schema; any failing row rejects the request
+    if not isinstance(trades, list) or not all(isinstance(trade, dict) for trade in trades):
+        raise TradeError("Expected a JSON object per trade")
+    df = pd.DataFrame(trades)
+    missing = missing_columns(df.columns)
+    if missing:
+        raise TradeError(f"Trades are missing fields: {', '.join(missing)}")
+    df, errors = validate_trades(df)
+    if len(errors):
+        raise TradeError(f"{errors['row'].nunique()} of {len(trades)} trades failed validation",
+                         _json_safe(errors).to_dict(orient="records"))
+    return df
+
+
+def _json_safe(df):
+    # Dates as ISO text, NaN / NaT as null: json.dumps would write a bare NaN, which is not JSON
+    df = df.copy()
+    for col in df.select_dtypes(include=["datetime", "datetimetz"]).columns:
+        df[col] = df[col].dt.strftime("%Y-%m-%d")
+    df = df.astype(object)
+    return df.where(df.notna(), None)
+
+
+def _records(df, fallback):
+    # Caller fields (trade ids etc.) pass through; results use the API field names
+    out = df.drop(columns=list(RESULT_FIELDS.values()) + ["Rationale"], errors="ignore")
+    for field, column in RESULT_FIELDS.items():
+        out[field] = df[column]
+    if "Rationale" in df.columns:
+        out["rationale"] = df["Rationale"]
+    out["fallback"] = fallback
+    return _json_safe(out).to_dict(orient="records")
+
+
+# --- Pipeline stages; each one keeps the event loop free ---
+async def _predict_single(trade):
+    # Concurrent single-trade requests share multi-row model calls through the dispatcher
+    if trade["product_type"] != "IR Swaption":
+        return classify_trade(trade), False
+    try:
+        return await asyncio.wrap_future(get_dispatcher().submit(trade)), False
+    except Exception:
+        return classify_trade(trade), True
+
+
+async def _observe(df):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.pool, run_observability_for_frame, df[stress_columns(df)])
+
+
+async def _add_rationale(df):
+    from batch_rationale import generate_batch_rationale, get_rate_budget  # pulls in the OpenAI client
+
+    df = df.copy()
+    df["Rationale"] = None
+    level3 = needs_rationale(df)
+    if level3.any():
+        df.loc[level3, "Rationale"], _ = await asyncio.to_thread(
+            generate_batch_rationale, df[level3], budget=get_rate_budget()
+        )
+    return df
+
+
+async def _classify_chunk(df, rationale):
+    with span("service.chunk", rows=len(df)):
+        levels, fallback_rows = await asyncio.to_thread(predict_mixed_frame, df)
+        df = df.assign(**{PREDICTION_COLUMN: levels})
+        df = df.join(await _observe(df))
+        if rationale:
+            df = await _add_rationale(df)
+    # predict_mixed_frame falls back for every IR Swaption row of the chunk at once
+    return _records(df, (df["product_type"] == "IR Swaption").to_numpy() & (fallback_rows > 0))
+
+
+# --- Endpoints ---
+def _flag(request, name):
+    return request.query_params.get(name, "false").lower() in ("1", "true", "yes")
+
+
+def _int_param(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValueError(f"Query parameter {name} must be a whole number")
+
+
+def _unprocessable(e):
+    return JSONResponse({"error": str(e), **({"errors": e.errors} if getattr(e, "errors", None) else {})},
+                        status_code=422)
+
+
+async def health(request):
+    return JSONResponse({
+        "status": "ok",
+        "workers": app.state.workers,
+        "model_batching": get_dispatcher().stats,
+    })
+
+
+async def classify(request):
+    try:
+        trade = await request.json()
+        df = _trade_frame([trade])
+    except ValueError as e:
+        return _unprocessable(e)
+
+    with span("service.classify", product=trade["product_type"]) as attrs:
+        level, attrs["fallback"] = await _predict_single(df.iloc[0][INPUT_COLUMNS].to_dict())
+        df[PREDICTION_COLUMN] = level
+        df = df.join(await _observe(df))
+        if _flag(request, "rationale"):
+            df = await _add_rationale(df)
+    fallback = attrs["fallback"]
+    return JSONResponse(_records(df, fallback)[0])
+
+
+async def classify_batch(request):
+    try:
+        chunk_size = max(1, _int_param(request, "chunk_size", app.state.chunk_size))
+        body = await request.json()
+        df = _trade_frame(body.get("trades") if isinstance(body, dict) else body)
+    except ValueError as e:
+        return _unprocessable(e)
+    rationale = _flag(request, "rationale")
+
+    async def lines():
+        # A bounded window of chunks in flight; lines go out in input order as soon as their chunk is done
+        chunks = [df.iloc[n:n + chunk_size] for n in range(0, len(df), chunk_size)]
+        window = app.state.workers * 2
+        pending = [asyncio.ensure_future(_classify_chunk(chunk, rationale)) for chunk in chunks[:window]]
+        next_chunk = len(pending)
+        try:
+            while pending:
+                records = await pending.pop(0)
+                if next_chunk < len(chunks):
+                    pending.append(asyncio.ensure_future(_classify_chunk(chunks[next_chunk], rationale)))
+                    next_chunk += 1
+                yield "".join(json.dumps(record) + "\n" for record in records)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def job_export(request):
+    # Files the Prediction page prepared under JOB_ROOT; sent in chunks, never read whole into memory
+    path = app.state.jobs.find_export(request.path_params["job_id"], request.path_params["name"])
+    if path is None:
+        return JSONResponse({"error": "Export not found"}, status_code=404)
+    return FileResponse(path, filename=request.query_params.get("filename") or request.path_params["name"])
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Spawned (not forked) workers: the parent already runs the event loop and the dispatcher thread
+    app.state.workers = get_int_setting("SERVICE_WORKERS", multiprocessing.cpu_count())
+    app.state.chunk_size = get_int_setting("SERVICE_CHUNK_SIZE", 64)
+    # Only reads the job directories; the Streamlit app's manager runs and resumes the jobs
+    app.state.jobs = JobManager(root=get_secret("JOB_ROOT", ".jobs"), max_workers=1)
+    app.state.pool = ProcessPoolExecutor(
+        max_workers=app.state.workers, mp_context=multiprocessing.get_context("spawn"), initializer=reseed_worker
+    )
+    # Start every worker up front so the first requests do not pay for interpreter start and imports
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(app.state.pool, reseed_worker) for _ in range(app.state.workers)))
+    try:
+        yield
+    finally:
+        app.state.pool.shutdown(cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/classify", classify, methods=["POST"]),
+        Route("/classify/batch", classify_batch, methods=["POST"]),
+        Route("/exports/{job_id}/{name}", job_export),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,211 @@
+# Headless batch classification for nightly runs: the same pipeline as the batch tabs, no browser.
+#   1. ML prediction per chunk (batch_inference predictors, rules fallback when the endpoint is down)
+#   2. Risk factor observability stress per trade (run_observability_for_frame)
+#   3. Rationale for Level 3 trades (generate_batch_rationale: templates + one GPT call per signature)
+#   4. Reconciliation of model vs. observability levels (reconciliation.py), summarised in the report
+# Rows failing schema validation (trade_schema.py) are left out and listed in rejected_rows.csv.
+# Chunks run in worker processes; results are written as they finish, in input order.
+# --audit appends every decision to the audit log (audit_log.py), replayable by trade id and date.
+# A valuation_date column re-classifies each trade with the grids valid on its date (grid_history.py);
+# --grids-known-at uses the grids as they were recorded at that time, ignoring later corrections;
+# audited decisions record it, so replay tests them against the same grids.
+# --review-queue persists the disagreeing trades as a review queue (REVIEW_DB_PATH), ranked by unobservable PV.
+# Usage:  python classify_portfolio.py trades.csv --output out/ [--workers 4] [--chunk-size 5000] [--audit]
+#                                      [--grids-known-at 2024-06-30] [--review-queue]
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app_config import get_int_setting
+from audit_log import decision_record, get_audit_log, rationale_hash
+from batch_inference import BATCH_PREDICTORS, PREDICTION_COLUMN, needs_rationale, stress_columns
+from grid_history import VALUATION_DATE
+from Observability_Stress_Module import GRID_VERSION, new_seed, reseed_worker, run_observability_for_frame
+from reconciliation import Reconciler, get_review_queue
+from trade_schema import load_trades
+
+
+AUDIT_COLUMNS = ["greeks", "risk_pvs", "unobservable"]
+
+
+def audit_records(chunk, seed, known_at=None):
+    # One decision record per trade. The seed is the chunk's: the greeks depend on every trade drawn
+    # before this one, so replay re-tests the recorded greeks and PVs but does not draw them again
+    ts = time.time()
+    return [
+        decision_record(
+            trade, {**trade["greeks"], **trade["risk_pvs"]}, trade["Trade PV"], trade["unobservable"],
+            trade["Unobservable PV"], trade["Observability Level"], seed, GRID_VERSION,
+            model_pred=trade[PREDICTION_COLUMN], source="batch", seed_scope="chunk", ts=ts, grids_known_at=known_at,
+            **({VALUATION_DATE: None if pd.isna(trade[VALUATION_DATE]) else str(trade[VALUATION_DATE])}
+               if VALUATION_DATE in trade else {})
+        )
+        for trade in chunk.to_dict(orient="records")
+    ]
+
+
+def classify_chunk(chunk, kind, audit=False, known_at=None):
+    timings = {}
+    start = time.perf_counter()
+    levels, fallback_rows = BATCH_PREDICTORS[kind](chunk)
+    chunk = chunk.copy()
+    chunk[PREDICTION_COLUMN] = levels
+    timings["predict_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    records = None
+    if audit:
+        seed = new_seed()
+        np.random.seed(seed)
+        chunk = chunk.join(run_observability_for_frame(chunk[stress_columns(chunk)], detail=True, known_at=known_at))
+        records = audit_records(chunk, seed, known_at)
+        chunk = chunk.drop(columns=AUDIT_COLUMNS)
+    else:
+        chunk = chunk.join(run_observability_for_frame(chunk[stress_columns(chunk)], known_at=known_at))
+    timings["observability_s"] = time.perf_counter() - start
+    return chunk, fallback_rows, timings, records
+
+
+def _write_chunk(chunk, path, fmt, writer, first):
+    # CSV appends chunk by chunk; Parquet goes through one ParquetWriter (row group per chunk)
+    if fmt == "csv":
+        chunk.to_csv(path, mode="w" if first else "a", header=first, index=False)
+        return writer
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema)
+    writer.write_table(table)
+    return writer
+
+
+def classify_portfolio(trades_path, output_dir, kind="mixed", workers=None, chunk_size=None,
+                       rationale=True, fmt="csv", audit=False, grids_known_at=None, review_queue=False,
+                       log=print):
+    workers = workers or get_int_setting("BATCH_JOB_WORKERS", 2)
+    chunk_size = chunk_size or get_int_setting("BATCH_CHUNK_SIZE", 5000)
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, f"classified_trades.{fmt}")
+    started = time.perf_counter()
+    report = {"input": trades_path, "kind": kind, "workers": workers, "chunk_size": chunk_size}
+    if grids_known_at:
+        report["grids_known_at"] = grids_known_at
+
+    start = time.perf_counter()
+    df, rejected = load_trades(trades_path, fmt="parquet" if trades_path.endswith(".parquet") else "csv")
+    report["read_s"] = round(time.perf_counter() - start, 3)
+    report["rejected_rows"] = int(rejected["row"].nunique())
+    if len(rejected):
+        rejected.to_csv(os.path.join(output_dir, "rejected_rows.csv"), index=False)
+        log(f"{report['rejected_rows']:,} rows failed validation; see rejected_rows.csv")
+
+    chunks = [df.iloc[n:n + chunk_size] for n in range(0, len(df), chunk_size)]
+    totals = {"predict_s": 0.0, "observability_s": 0.0}
+    fallback_rows = 0
+    levels = pd.Series(dtype=int)
+    level3 = []
+    level3_records = {}
+    reconciler = Reconciler()
+    writer = None
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=reseed_worker) as pool:
+        # map() yields in input order, so chunk n is written as soon as chunks 0..n are done
+        results = pool.map(classify_chunk, chunks, [kind] * len(chunks), [audit] * len(chunks),
+                           [grids_known_at] * len(chunks))
+        for chunk_no, (chunk, chunk_fallback, timings, records) in enumerate(results):
+            writer = _write_chunk(chunk, results_path, fmt, writer, first=chunk_no == 0)
+            if records:
+                get_audit_log().append_many(records)
+                # Level 3 decisions are appended again once their rationale is written
+                for index, record, flagged in zip(chunk.index, records, needs_rationale(chunk)):
+                    if flagged:
+                        level3_records[index] = record
+            reconciler.add(chunk)
+            fallback_rows += chunk_fallback
+            levels = levels.add(chunk[PREDICTION_COLUMN].value_counts(), fill_value=0)
+            for name, seconds in timings.items():
+                totals[name] += seconds
+            level3.append(chunk[needs_rationale(chunk)])
+            log(f"chunk {chunk_no + 1}/{len(chunks)}: {len(chunk):,} trades")
+    if writer is not None:
+        writer.close()
+    report["classify_wall_s"] = round(time.perf_counter() - start, 3)
+    # Summed across workers; compare with classify_wall_s for the parallel speedup
+    report["predict_cpu_s"] = round(totals["predict_s"], 3)
+    report["observability_cpu_s"] = round(totals["observability_s"], 3)
+    report["trades"] = len(df)
+    report["fallback_rows"] = fallback_rows
+    report["levels"] = {level: int(count) for level, count in levels.items()}
+    report["reconciliation"] = reconciler.summary()
+    if review_queue:
+        report["reconciliation"]["review_run_id"] = get_review_queue().save(reconciler, source=f"batch {trades_path}")
+    reconciler.stats().to_csv(os.path.join(output_dir, "disagreement_stats.csv"), index=False)
+
+    level3_df = pd.concat(level3) if level3 else pd.DataFrame()
+    report["level3_trades"] = len(level3_df)
+    if rationale and len(level3_df):
+        from batch_rationale import generate_batch_rationale  # pulls in the OpenAI client
+
+        start = time.perf_counter()
+        level3_df = level3_df.copy()
+        level3_df["Rationale"], report["rationale"] = generate_batch_rationale(level3_df)
+        report["rationale_s"] = round(time.perf_counter() - start, 3)
+        level3_df.drop(columns=["ir_summary", "vol_summary"]).to_csv(
+            os.path.join(output_dir, "level3_rationale.csv"), index=False
+        )
+        if level3_records:
+            get_audit_log().append_many(
+                {**level3_records[index], "ts": time.time(), "rationale_hash": rationale_hash(text)}
+                for index, text in level3_df["Rationale"].items()
+            )
+
+    if audit:
+        report["audit"] = get_audit_log().stats()
+    report["total_s"] = round(time.perf_counter() - started, 3)
+    report["trades_per_s"] = round(len(df) / report["total_s"], 1) if report["total_s"] else None
+    with open(os.path.join(output_dir, "timing_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a trade file into IFRS13 levels without the Streamlit UI.")
+    parser.add_argument("trades", help="CSV or Parquet trade file with the batch upload columns")
+    parser.add_argument("--output", "-o", required=True, help="Output directory for results and timing report")
+    parser.add_argument("--kind", choices=sorted(BATCH_PREDICTORS), default="mixed",
+                        help="mixed: rules + model for IR Swaptions (Prediction page); model: every row through the model (Archive page)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default BATCH_JOB_WORKERS or 2)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Trades per chunk (default BATCH_CHUNK_SIZE or 5000)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Results file format")
+    parser.add_argument("--no-rationale", action="store_true", help="Skip rationale generation for Level 3 trades")
+    parser.add_argument("--audit", action="store_true", help="Append every decision to the audit log (AUDIT_LOG_DIR)")
+    parser.add_argument("--grids-known-at", default=None,
+                        help="Use the observability grids as recorded at this date/time (default: latest corrections)")
+    parser.add_argument("--review-queue", action="store_true",
+                        help="Persist trades where model and observability disagree as a review queue (REVIEW_DB_PATH)")
+    args = parser.parse_args(argv)
+
+    try:
+        report = classify_portfolio(
+            args.trades, args.output, kind=args.kind, workers=args.workers, chunk_size=args.chunk_size,
+            rationale=not args.no_rationale, fmt=args.format, audit=args.audit, grids_known_at=args.grids_known_at,
+            review_queue=args.review_queue,
+            log=lambda msg: print(msg, file=sys.stderr)
+        )
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import time
+from functools import lru_cache
+
+from app_config import get_secret, get_int_setting, get_float_setting
+from rationale_cache import get_rationale_cache, make_cache_key
+from resilience import LatencyTracker, get_endpoint
+from tracing import record_span, span
+
+OPENAI_API_VERSION = "2024-02-01"
+
+# Time-to-first-token of streamed completions, process-wide (seconds)
+ttft_tracker = LatencyTracker()
+
+
+def build_openai_client(api_key, azure_endpoint, timeout):
+    # Imported on first use: openai takes longer to import than the rest of the app together.
+    # Retries are handled by the hedging / circuit breaker layer, not inside the SDK
+    from openai import AzureOpenAI
+
+    return AzureOpenAI(
+        api_key=api_key,
+        api_version=OPENAI_API_VERSION,
+        azure_endpoint=azure_endpoint,
+        timeout=timeout,
+        max_retries=0
+    )
+
+
+def openai_settings():
+    # (api key, endpoint, timeout): a client is built per distinct set, so rotated secrets get a new one
+    return (
+        get_secret("AZURE_OPENAI_API_KEY"),
+        get_secret("AZURE_OPENAI_ENDPOINT"),
+        get_float_setting("OPENAI_TIMEOUT_SECONDS", 60.0)
+    )
+
+
+_cached_openai_client = lru_cache(maxsize=4)(build_openai_client)
+
+
+def get_openai_client():
+    # Headless callers (CLI, service, batch jobs): one client and connection pool per process and
+    # credential set. The Streamlit app passes its own from shared_resources
+    return _cached_openai_client(*openai_settings())
+
+
+def get_openai_endpoint():
+    return get_endpoint(
+        "azure_openai",
+        hedge_percentile=get_float_setting("OPENAI_HEDGE_PERCENTILE", 99.0),
+        failure_threshold=get_int_setting("OPENAI_BREAKER_FAILURES", 3),
+        reset_timeout=get_float_setting("OPENAI_BREAKER_RESET_SECONDS", 60.0)
+    )
+
+
+# --- IFRS13 rationale prompt (shared by the app, batch rationale and the CLI) ---
+def build_rationale_messages(ir_summary, vol_summary, model_pred):
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a financial analyst who explains IFRS 13 classification decisions "
+                "clearly and concisely based on input data. Do not include background information "
+                "about IFRS 13. Focus strictly on justifying the classification result."
+            )
+        },
+        {
+            "role": "user",
+            "content": (
+                f"IR Delta Observability Summary: {ir_summary}\n\n"
+                f"Volatility Observability Summary: {vol_summary}\n\n"
+                f"Model Predicted Level: {model_pred}\n\n"
+                "Analyze Model predicted IFRS 13 level and risk factor observability results (using 10% threshold on trade PV) and decide on the IFRS 13 level for the trade. "
+                "Display the chosen level in bold and provide a brief, direct justification for the predicted IFRS 13 level. "
+                "Conclude with a single line that summarizes confidence level High, Medium or Low and the reasoning or notes confidence in the classification."
+            )
+        }
+    ]
+
+
+def get_cached_completion(messages, temperature=0.5):
+    return get_rationale_cache().get(make_cache_key(messages, get_secret("AZURE_OPENAI_MODEL"), temperature))
+
+
+# --- Chat completion through the rationale cache and the shared resilience layer ---
+def chat_completion(messages, temperature=0.5, use_cache=True, refresh=False, client=None):
+    model = get_secret("AZURE_OPENAI_MODEL")
+    cache = get_rationale_cache()
+    key = make_cache_key(messages, model, temperature)
+    if use_cache and not refresh:
+        with span("openai.cache_lookup") as attrs:
+            cached = cache.get(key)
+            attrs["hit"] = cached is not None
+        if cached is not None:
+            return cached
+
+    client = client or get_openai_client()
+
+    def _create():
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature
+        )
+        return response.choices[0].message.content
+
+    with span("openai.chat", model=model):
+        text = get_openai_endpoint().call(_create)
+    if use_cache:
+        cache.put(key, text, model=model)
+    return text
+
+
+# --- Streamed chat completion: yields text deltas as they arrive ---
+def stream_chat_completion(messages, temperature=0.5, use_cache=True, refresh=False, client=None):
+    model = get_secret("AZURE_OPENAI_MODEL")
+    cache = get_rationale_cache()
+    key = make_cache_key(messages, model, temperature)
+    if use_cache and not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    endpoint = get_openai_endpoint()
+    endpoint.ensure_available()
+    start = time.perf_counter()
+    started_at = time.time()
+    ttft = None
+    parts = []
+    ok = None  # None until the stream completes (True) or fails (False); still None if abandoned
+    try:
+        stream = (client or get_openai_client()).chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True
+        )
+        for chunk in stream:
+            # Azure sends a content-filter chunk with no choices ahead of the first token
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if not parts:
+                ttft = time.perf_counter() - start
+                ttft_tracker.record(ttft)
+            parts.append(delta)
+            yield delta
+        ok = True
+    except Exception:
+        ok = False
+        raise
+    finally:
+        # A consumer that stops iterating (rerun, page switch) closes the generator with GeneratorExit:
+        # neutral for the breaker, but a half-open probe must be released or the circuit never closes
+        elapsed = time.perf_counter() - start
+        if ok is None:
+            endpoint.record_abandoned()
+        else:
+            endpoint.record_outcome(elapsed, ok=ok)
+        record_span("openai.stream", started_at, elapsed * 1000, ok=ok is not False, model=model,
+                    ttft_ms=round(ttft * 1000, 1) if ttft is not None else None, abandoned=ok is None)
+    if use_cache:
+        cache.put(key, "".join(parts), model=model)
@@ -0,0 +1,254 @@
+# On-disk columnar greek / PV store for out-of-core stress runs.
+# One raw little-endian file per column under the store directory, read through numpy.memmap:
+#   greek_NN.f8, pv_NN.f8     sensitivity and PV per risk factor (NN: index into meta "factors")
+#   product.i1, currency.i1   codes into meta "products" / "currencies"
+#   expiry_tenor.f4, maturity_tenor.f4, valuation_date.i8 (ns, NaT: today; only for dated books)
+#   result_*                  written by stress_store(): trade PV, unobservable PV, level, unobservable factors
+# The stress pass streams the store in fixed-size windows, so memory stays at one window per
+# worker whatever the book size; workers map the same files read-only and share the page cache.
+# Usage:  python greek_store.py build trades.csv store/ [--chunk-size 500000]
+#         python greek_store.py stress store/ [--workers 4] [--window 250000] [--grids-known-at 2024-06-30]
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app_config import get_int_setting
+from grid_history import VALUATION_DATE, valuation_dates
+from Observability_Stress_Module import (
+    DEFAULT_PRODUCT,
+    PRODUCT_RISK,
+    generate_pv_frame,
+    product_risk,
+    stress_arrays
+)
+
+# Every risk factor any product carries, in registry order; a product's greeks fill its own columns
+FACTOR_NAMES = list(dict.fromkeys(name for spec in PRODUCT_RISK.values() for name, _, _ in spec["factors"]))
+LEVELS = ["Level 2", "Level 3"]
+RESULT_COLUMNS = {"result_trade_pv": "f8", "result_unobservable_pv": "f8", "result_level": "i1", "result_unobservable": "u8"}
+
+
+class GreekStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"rows": 0, "factors": FACTOR_NAMES, "products": list(PRODUCT_RISK), "currencies": [],
+                         "dated": None}
+        self.factors = self.meta["factors"]
+        self.factor_index = {name: i for i, name in enumerate(self.factors)}
+
+    @property
+    def rows(self):
+        return self.meta["rows"]
+
+    def _file(self, name, dtype):
+        return os.path.join(self.path, f"{name}.{dtype}")
+
+    def _save_meta(self):
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    # --- Writing: columns are appended chunk by chunk, the row count is committed last ---
+    def _codes(self, values, vocabulary):
+        for value in pd.unique(values):
+            if value not in vocabulary:
+                vocabulary.append(value)
+        return pd.Categorical(values, categories=vocabulary).codes.astype("i1")
+
+    def append(self, trades, greeks, pvs):
+        # greeks, pvs: (rows, len(self.factors)) arrays, zero where a product has no such factor
+        dated = VALUATION_DATE in trades.columns
+        if self.meta["dated"] is None:
+            self.meta["dated"] = dated
+        elif self.meta["dated"] != dated:
+            raise ValueError("Every chunk of a store must either have valuation dates or not")
+        products = trades["product_type"].astype(object)
+        products = products.where(products.isin(self.meta["products"]), DEFAULT_PRODUCT)
+        columns = {
+            self._file("product", "i1"): self._codes(products.to_numpy(), self.meta["products"]),
+            self._file("currency", "i1"): self._codes(trades["currency"].to_numpy(), self.meta["currencies"]),
+            self._file("expiry_tenor", "f4"): trades["expiry_tenor"].to_numpy(dtype="f4"),
+            self._file("maturity_tenor", "f4"): trades["maturity_tenor"].to_numpy(dtype="f4"),
+        }
+        if dated:
+            dates = pd.to_datetime(trades[VALUATION_DATE], errors="coerce")
+            columns[self._file(VALUATION_DATE, "i8")] = dates.to_numpy(dtype="datetime64[ns]").view("i8")
+        for i in range(len(self.factors)):
+            columns[self._file(f"greek_{i:02d}", "f8")] = np.ascontiguousarray(greeks[:, i], dtype="f8")
+            columns[self._file(f"pv_{i:02d}", "f8")] = np.ascontiguousarray(pvs[:, i], dtype="f8")
+        for path, values in columns.items():
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                # Overwrite anything past the committed rows (an append interrupted earlier)
+                f.seek(self.rows * values.dtype.itemsize)
+                f.write(values.tobytes())
+                f.truncate()
+        self.meta["rows"] += len(trades)
+        self._save_meta()
+
+    def append_simulated(self, trades):
+        # Simulate greeks and PVs per product group (as run_observability_for_frame does) and append
+        greeks = np.zeros((len(trades), len(self.factors)))
+        pvs = np.zeros_like(greeks)
+        products = trades["product_type"].astype(object)
+        products = products.where(products.isin(list(PRODUCT_RISK)), DEFAULT_PRODUCT)
+        for product_type, positions in pd.Series(range(len(trades))).groupby(products.to_numpy()).groups.items():
+            spec = product_risk(product_type)
+            group_greeks = spec["greeks"](trades.iloc[positions])
+            columns = [self.factor_index[name] for name in group_greeks.columns]
+            rows = np.asarray(positions)[:, None]
+            greeks[rows, columns] = group_greeks.to_numpy()
+            pvs[rows, columns] = generate_pv_frame(group_greeks).to_numpy()
+        self.append(trades, greeks, pvs)
+
+    # --- Reading ---
+    def column(self, name, dtype, mode="r"):
+        return np.memmap(self._file(name, dtype), dtype=dtype, mode=mode, shape=(self.rows,))
+
+    def window(self, start, end):
+        # One window in memory: a trades frame for the observability rules plus greek and PV arrays
+        trades = pd.DataFrame({
+            "product_type": np.array(self.meta["products"], dtype=object)[self.column("product", "i1")[start:end]],
+            "currency": np.array(self.meta["currencies"], dtype=object)[self.column("currency", "i1")[start:end]],
+            "expiry_tenor": self.column("expiry_tenor", "f4")[start:end].astype(float),
+            "maturity_tenor": self.column("maturity_tenor", "f4")[start:end].astype(float),
+        })
+        if self.meta["dated"]:
+            trades[VALUATION_DATE] = np.asarray(self.column(VALUATION_DATE, "i8")[start:end]).view("datetime64[ns]")
+        greeks = np.column_stack([self.column(f"greek_{i:02d}", "f8")[start:end] for i in range(len(self.factors))])
+        pvs = np.column_stack([self.column(f"pv_{i:02d}", "f8")[start:end] for i in range(len(self.factors))])
+        return trades, greeks, pvs
+
+    def results(self, start=0, end=None):
+        end = self.rows if end is None else end
+        names = np.array(self.factors, dtype=object)
+        masks = self.column("result_unobservable", "u8")[start:end]
+        bits = (masks[:, None] >> np.arange(len(self.factors), dtype="u8")) & 1
+        return pd.DataFrame({
+            "Trade PV": self.column("result_trade_pv", "f8")[start:end].round(2),
+            "Unobservable PV": self.column("result_unobservable_pv", "f8")[start:end].round(2),
+            "Observability Level": np.array(LEVELS, dtype=object)[self.column("result_level", "i1")[start:end]],
+            "unobservable": [list(names[row.astype(bool)]) for row in bits],
+        }, index=pd.RangeIndex(start, end))
+
+
+# --- Streaming stress pass ---
+def stress_window(store, start, end, known_at=None):
+    trades, greeks, pvs = store.window(start, end)
+    if VALUATION_DATE in trades.columns:
+        trades[VALUATION_DATE] = valuation_dates(trades)
+    trade_pv = np.zeros(len(trades))
+    stress_pv = np.zeros(len(trades))
+    masks = np.zeros(len(trades), dtype="u8")
+    for product_type, positions in pd.Series(range(len(trades))).groupby(trades["product_type"].to_numpy()).groups.items():
+        spec = product_risk(product_type)
+        columns = [store.factor_index[name] for name, _, _ in spec["factors"]]
+        rows = np.asarray(positions)
+        group_pv, group_stress, unobservable = stress_arrays(
+            trades.iloc[rows], spec, greeks[rows][:, columns], pvs[rows][:, columns], known_at
+        )
+        trade_pv[rows], stress_pv[rows] = group_pv, group_stress
+        masks[rows] = (unobservable.astype("u8") << np.array(columns, dtype="u8")).sum(axis=1)
+    return trade_pv, stress_pv, masks
+
+
+def _stress_range(path, start, end, window, known_at):
+    # Worker task: stream rows [start, end) window by window into the shared result columns
+    store = GreekStore(path)
+    results = {name: store.column(name, dtype, mode="r+") for name, dtype in RESULT_COLUMNS.items()}
+    level3 = 0
+    for lo in range(start, end, window):
+        hi = min(lo + window, end)
+        trade_pv, stress_pv, masks = stress_window(store, lo, hi, known_at)
+        level = (stress_pv > 0.1 * trade_pv).astype("i1")
+        results["result_trade_pv"][lo:hi] = trade_pv
+        results["result_unobservable_pv"][lo:hi] = stress_pv
+        results["result_level"][lo:hi] = level
+        results["result_unobservable"][lo:hi] = masks
+        level3 += int(level.sum())
+    for column in results.values():
+        column.flush()
+    return end - start, level3
+
+
+def stress_store(path, window=None, workers=None, known_at=None, log=print):
+    window = window or get_int_setting("GREEK_STORE_WINDOW_ROWS", 250_000)
+    workers = workers or get_int_setting("BATCH_JOB_WORKERS", 2)
+    store = GreekStore(path)
+    if len(store.factors) > 64:
+        raise ValueError("The unobservable factor mask holds at most 64 risk factors")
+    for name, dtype in RESULT_COLUMNS.items():
+        np.memmap(store._file(name, dtype), dtype=dtype, mode="w+", shape=(max(store.rows, 1),)).flush()
+    # Several windows per task, a few tasks per worker so a slow range does not hold up the run
+    per_task = -(-store.rows // (workers * 4))
+    task_rows = max(window, -(-per_task // window) * window)
+    ranges = [(lo, min(lo + task_rows, store.rows)) for lo in range(0, store.rows, task_rows)]
+    start = time.perf_counter()
+    level3 = done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_stress_range, path, lo, hi, window, known_at) for lo, hi in ranges]
+        for future in futures:
+            rows, range_level3 = future.result()
+            done += rows
+            level3 += range_level3
+            log(f"{done:,}/{store.rows:,} trades stressed")
+    seconds = time.perf_counter() - start
+    return {"trades": store.rows, "level3_trades": level3, "stress_s": round(seconds, 3),
+            "trades_per_s": round(store.rows / seconds, 1) if seconds else None, "window": window, "workers": workers}
+
+
+def read_trade_chunks(path, chunk_size):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and stress an on-disk greek / PV store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Simulate greeks and PVs for a trade file into a store")
+    build.add_argument("trades", help="CSV or Parquet trade file with the batch upload columns")
+    build.add_argument("store", help="Store directory (appended to if it exists)")
+    build.add_argument("--chunk-size", type=int, default=500_000, help="Trades read and simulated per chunk")
+    stress = commands.add_parser("stress", help="Stream the store through the observability stress tests")
+    stress.add_argument("store", help="Store directory")
+    stress.add_argument("--workers", type=int, default=None, help="Worker processes (default BATCH_JOB_WORKERS or 2)")
+    stress.add_argument("--window", type=int, default=None, help="Rows per window (default GREEK_STORE_WINDOW_ROWS or 250000)")
+    stress.add_argument("--grids-known-at", default=None, help="Use the observability grids as recorded at this time")
+    args = parser.parse_args(argv)
+
+    log = lambda msg: print(msg, file=sys.stderr)
+    try:
+        if args.command == "build":
+            store = GreekStore(args.store)
+            for chunk in read_trade_chunks(args.trades, args.chunk_size):
+                store.append_simulated(chunk)
+                log(f"{store.rows:,} trades stored")
+            report = {"trades": store.rows, "factors": len(store.factors)}
+        else:
+            report = stress_store(args.store, args.window, args.workers, args.grids_known_at, log=log)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
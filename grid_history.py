@@ -0,0 +1,150 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from app_config import get_secret
+
+# --- Dated observability grid versions, for re-classifying past valuation dates ---
+# A grid's history file lives under GRID_HISTORY_DIR with the same name and columns as the live
+# grid CSV, plus three columns:
+#   Valid From    first valuation date the row applies to (blank: since the beginning)
+#   Valid To      first valuation date it no longer applies to (blank: open-ended)
+#   Recorded At   when the row was entered (blank: always known)
+# Rows are never edited: a correction is a new row for the same key and dates with a later Recorded
+# At, so classifying "as known at" an earlier time still sees the grid as it was then.
+# For each key, the live CSV applies from the end of that key's last dated row onward; a date no row
+# covers is treated like a key missing from the grid (unobservable, stress factor 1.0).
+VALUATION_DATE = "valuation_date"
+VALID_FROM, VALID_TO, RECORDED_AT = "Valid From", "Valid To", "Recorded At"
+START_OF_TIME = pd.Timestamp.min.ceil("D")
+END_OF_TIME = pd.Timestamp.max.floor("D")
+AS_OF_CACHE_SIZE = 32
+
+
+def history_path(grid_file, root=None):
+    return os.path.join(root or get_secret("GRID_HISTORY_DIR", "grid_history"), os.path.basename(grid_file))
+
+
+def read_history(path, clean=None):
+    if not os.path.exists(path):
+        return None
+    history = pd.read_csv(path)
+    history.columns = history.columns.str.strip()
+    return clean(history) if clean else history
+
+
+def _dates(values, default):
+    if values is None:
+        return default
+    return pd.to_datetime(values, errors="coerce").fillna(default)
+
+
+def dated_rows(current, history, key_columns):
+    # Live rows plus dated rows, each with its validity interval and recording time
+    current = current.assign(**{VALID_FROM: START_OF_TIME, VALID_TO: END_OF_TIME, RECORDED_AT: START_OF_TIME})
+    if history is None or history.empty:
+        return _ns(current)
+    history = _ns(history.assign(**{
+        VALID_FROM: _dates(history.get(VALID_FROM), START_OF_TIME),
+        VALID_TO: _dates(history.get(VALID_TO), END_OF_TIME),
+        RECORDED_AT: _dates(history.get(RECORDED_AT), START_OF_TIME),
+    }))
+    ends = history.groupby(key_columns)[VALID_TO].max().rename("dated_until").reset_index()
+    starts = current[key_columns].merge(ends, on=key_columns, how="left")["dated_until"]
+    current[VALID_FROM] = starts.fillna(START_OF_TIME).to_numpy()
+    current = current[current[VALID_FROM] < current[VALID_TO]]
+    return pd.concat([history, _ns(current)], ignore_index=True)
+
+
+def _ns(rows):
+    # One datetime unit throughout, so interval lookups accept any valuation date column
+    return rows.astype({VALID_FROM: "datetime64[ns]", VALID_TO: "datetime64[ns]", RECORDED_AT: "datetime64[ns]"})
+
+
+def valuation_dates(trades):
+    # Trades without a valuation date are classified as of today
+    today = pd.Timestamp.today().normalize()
+    if VALUATION_DATE not in trades.columns:
+        return pd.DatetimeIndex([today] * len(trades), dtype="datetime64[ns]")
+    dates = trades[VALUATION_DATE]
+    if not pd.api.types.is_datetime64_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    return pd.DatetimeIndex(dates.fillna(today).dt.normalize()).astype("datetime64[ns]")
+
+
+class GridHistory:
+    def __init__(self, rows, key_column):
+        self.rows = rows
+        self.key_column = key_column
+        self._subsets = {}
+        self._as_of = {}
+
+    def subset(self, column, value):
+        # e.g. the volatility grid for one risk type, keyed by currency
+        if value not in self._subsets:
+            self._subsets[value] = GridHistory(self.rows[self.rows[column] == value], self.key_column)
+        return self._subsets[value]
+
+    def as_of(self, known_at=None):
+        # The grid as known at `known_at` (default: everything recorded), resolved once and cached
+        known_at = pd.Timestamp(known_at) if known_at is not None else None
+        if known_at not in self._as_of:
+            if len(self._as_of) >= AS_OF_CACHE_SIZE:
+                self._as_of.clear()
+            rows = self.rows if known_at is None else self.rows[self.rows[RECORDED_AT] <= known_at]
+            self._as_of[known_at] = AsOfGrid(rows, self.key_column)
+        return self._as_of[known_at]
+
+
+# --- One resolved grid: non-overlapping valuation-date intervals per key, each with its grid rows ---
+class AsOfGrid:
+    def __init__(self, rows, key_column):
+        valid_from = rows[VALID_FROM].to_numpy(dtype="datetime64[ns]")
+        valid_to = rows[VALID_TO].to_numpy(dtype="datetime64[ns]")
+        recorded_at = rows[RECORDED_AT].to_numpy(dtype="datetime64[ns]")
+        pieces = []  # (key, start, end, row positions in force)
+        for key, positions in rows.groupby(key_column, sort=False).indices.items():
+            breaks = np.unique(np.concatenate([valid_from[positions], valid_to[positions]]))
+            for start, end in zip(breaks[:-1], breaks[1:]):
+                covering = positions[(valid_from[positions] <= start) & (valid_to[positions] >= end)]
+                if not len(covering):
+                    continue
+                # The latest recording wins; within it, the version that starts latest
+                covering = covering[recorded_at[covering] == recorded_at[covering].max()]
+                covering = covering[valid_from[covering] == valid_from[covering].max()]
+                last = pieces[-1] if pieces else None
+                if last and last[0] == key and last[2] == start and np.array_equal(last[3], covering):
+                    pieces[-1] = (key, last[1], end, covering)
+                else:
+                    pieces.append((key, start, end, covering))
+
+        counts = np.array([len(covering) for _, _, _, covering in pieces], dtype=int)
+        self.rows = rows.iloc[np.concatenate([covering for _, _, _, covering in pieces])] if pieces else rows.iloc[:0]
+        self.rows = self.rows.reset_index(drop=True)
+        self.first = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(int) if len(counts) else counts
+        self.count = counts
+        self.depth = int(counts.max()) if len(counts) else 0
+        # Stress factor per interval: the first row in force for the key; trailing 1.0 for trades no row covers
+        factors = rows["Stress Factor"].to_numpy(dtype=float)
+        self.factors = np.append([factors[covering[0]] for _, _, _, covering in pieces], 1.0)
+        # Interval index per key: sorted, non-overlapping [start, end) bounds and the interval ids
+        by_key = {}
+        for interval, (key, start, end, _) in enumerate(pieces):
+            by_key.setdefault(key, []).append((start, end, interval))
+        self.index = {
+            key: tuple(np.array(column) for column in zip(*spans)) for key, spans in by_key.items()
+        }
+
+    def lookup(self, keys, dates):
+        # Interval id per trade (-1: no grid row for the key on that date)
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        ids = np.full(len(keys), -1, dtype=int)
+        for key, (starts, ends, interval_ids) in self.index.items():
+            mask = keys == key
+            if mask.any():
+                key_dates = dates[mask]
+                position = np.searchsorted(starts, key_dates, side="right") - 1
+                inside = (position >= 0) & (key_dates < ends[np.maximum(position, 0)])
+                ids[mask] = np.where(inside, interval_ids[np.maximum(position, 0)], -1)
+        return ids
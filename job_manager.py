@@ -0,0 +1,354 @@
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from app_config import get_secret, get_int_setting
+from batch_inference import BATCH_PREDICTORS, PREDICTION_COLUMN
+from tracing import span
+
+# Columns the result viewer filters on; a chunk without trading_desk counts as "n/a"
+FACET_COLUMNS = [PREDICTION_COLUMN, "currency", "trading_desk"]
+# Dimensions kept as running dimension x level counts for the heatmaps
+CELL_DIMENSIONS = ["trading_desk", "currency"]
+# Job ids and export file names as this module writes them; anything else is not served
+_JOB_ID = re.compile(r"[0-9a-f]{12}")
+_EXPORT_NAME = re.compile(r"[0-9a-f]{12}\.(csv|parquet)")
+
+
+def facet_counts(chunk):
+    # Row counts per (level, currency, desk) cell - a few hundred rows summarising a whole chunk
+    facets = pd.DataFrame({col: chunk[col] if col in chunk.columns else "n/a" for col in FACET_COLUMNS}, index=chunk.index)
+    return facets.astype(str).groupby(FACET_COLUMNS).size().reset_index(name="count")
+
+
+def _filter_mask(df, filters):
+    mask = pd.Series(True, index=df.index)
+    for col, values in (filters or {}).items():
+        if values:
+            column = df[col] if col in df.columns else pd.Series("n/a", index=df.index)
+            mask &= column.astype(str).isin(values)
+    return mask
+
+
+# --- Background batch jobs with on-disk chunk checkpoints ---
+# Each job lives in <root>/<job_id>/: the submitted input plus one result file per
+# finished chunk. A chunk file is written atomically, so a restarted job only runs
+# the chunks that have no result yet. Job metadata is kept in <root>/jobs.sqlite3.
+class JobManager:
+    def __init__(self, root=".jobs", max_workers=2, chunk_size=5000, facet_cache_jobs=8):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.facet_cache_jobs = facet_cache_jobs
+        self.db_path = os.path.join(root, "jobs.sqlite3")
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, "
+                "status TEXT NOT NULL, rows INTEGER NOT NULL, chunk_size INTEGER NOT NULL, "
+                "total_chunks INTEGER NOT NULL, done_chunks INTEGER NOT NULL DEFAULT 0, "
+                "fallback_rows INTEGER NOT NULL DEFAULT 0, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_cells (job_id TEXT NOT NULL, dimension TEXT NOT NULL, "
+                "value TEXT NOT NULL, level TEXT NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (job_id, dimension, value, level))"
+            )
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-job")
+        self._active = set()
+        self._lock = threading.Lock()
+        # Facet counts per job, least recently used first: {"chunks": {chunk_no: counts}, "table": (done, table)}
+        self._facets = OrderedDict()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def _chunk_path(self, job_id, chunk_no):
+        return os.path.join(self._job_dir(job_id), f"chunk_{chunk_no:05d}.pkl")
+
+    def _counts_path(self, job_id, chunk_no):
+        return os.path.join(self._job_dir(job_id), f"chunk_{chunk_no:05d}.counts.pkl")
+
+    def _record_cells(self, conn, job_id, facets):
+        # Adds one chunk's counts to the job's dimension x level cells
+        for dimension in CELL_DIMENSIONS:
+            cells = facets.groupby([dimension, PREDICTION_COLUMN])["count"].sum()
+            conn.executemany(
+                "INSERT INTO job_cells (job_id, dimension, value, level, count) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (job_id, dimension, value, level) DO UPDATE SET count = count + excluded.count",
+                [(job_id, dimension, value, level, int(count)) for (value, level), count in cells.items()]
+            )
+
+    def _rebuild_cells(self, job_id):
+        # Cells recomputed from the facet files of the chunks already on disk
+        with self._connect() as conn:
+            conn.execute("DELETE FROM job_cells WHERE job_id = ?", (job_id,))
+            for chunk_no in self._done_chunks(job_id):
+                self._record_cells(conn, job_id, self.chunk_facets(job_id, chunk_no))
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def submit(self, df, kind, chunk_size=None):
+        if kind not in BATCH_PREDICTORS:
+            raise ValueError(f"Unknown batch job kind: {kind}")
+        chunk_size = chunk_size or self.chunk_size
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(self._job_dir(job_id))
+        df.to_pickle(os.path.join(self._job_dir(job_id), "input.pkl"))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, rows, chunk_size, total_chunks, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, kind, len(df), chunk_size, max(1, math.ceil(len(df) / chunk_size)), now, now)
+            )
+        self._schedule(job_id)
+        return job_id
+
+    def resume_incomplete(self):
+        # Jobs interrupted by a restart pick up from their last checkpointed chunk
+        with self._connect() as conn:
+            job_ids = [row["job_id"] for row in conn.execute("SELECT job_id FROM jobs WHERE status IN ('queued', 'running')")]
+        for job_id in job_ids:
+            self._schedule(job_id)
+        return job_ids
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self._pool.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        try:
+            job = self.status(job_id)
+            predictor = BATCH_PREDICTORS[job["kind"]]
+            df = pd.read_pickle(os.path.join(self._job_dir(job_id), "input.pkl"))
+            chunk_size = job["chunk_size"]
+            done_chunks = sum(os.path.exists(self._chunk_path(job_id, n)) for n in range(job["total_chunks"]))
+            self._update(job_id, status="running", done_chunks=done_chunks)
+            self._rebuild_cells(job_id)
+
+            for chunk_no in range(job["total_chunks"]):
+                path = self._chunk_path(job_id, chunk_no)
+                if os.path.exists(path):
+                    continue
+                chunk = df.iloc[chunk_no * chunk_size:(chunk_no + 1) * chunk_size].copy()
+                with span("job.chunk", kind=job["kind"], chunk=chunk_no, rows=len(chunk)):
+                    levels, fallback_rows = predictor(chunk)
+                chunk[PREDICTION_COLUMN] = levels
+                facets = facet_counts(chunk)
+                facets.to_pickle(self._counts_path(job_id, chunk_no))
+                chunk.to_pickle(path + ".tmp")
+                os.replace(path + ".tmp", path)
+                self._job_facets(job_id)["chunks"][chunk_no] = facets
+                done_chunks += 1
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET done_chunks = ?, fallback_rows = fallback_rows + ?, updated_at = ? WHERE job_id = ?",
+                        (done_chunks, fallback_rows, time.time(), job_id)
+                    )
+                    self._record_cells(conn, job_id, facets)
+            self._update(job_id, status="done")
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def status(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_results(self, job_id):
+        # Completed chunks in order; a running job returns its partial results
+        frames = list(self.iter_results(job_id))
+        return pd.concat(frames) if frames else pd.DataFrame()
+
+    def iter_results(self, job_id):
+        # The same chunks one at a time, for passes over a job that should not hold all of it
+        for chunk_no in self._done_chunks(job_id):
+            yield pd.read_pickle(self._chunk_path(job_id, chunk_no))
+
+    # --- Result viewer: paging, filtering and export straight from the chunk files ---
+    def _done_chunks(self, job_id):
+        job = self.status(job_id)
+        return [n for n in range(job["total_chunks"]) if os.path.exists(self._chunk_path(job_id, n))]
+
+    def _job_facets(self, job_id):
+        # The job's facet cache entry; only the facet_cache_jobs most recently used jobs are kept
+        with self._lock:
+            entry = self._facets.pop(job_id, None) or {"chunks": {}, "table": None}
+            self._facets[job_id] = entry
+            while len(self._facets) > self.facet_cache_jobs:
+                self._facets.popitem(last=False)
+        return entry
+
+    def chunk_facets(self, job_id, chunk_no):
+        # A finished chunk never changes, so its facet counts are kept in memory after the first read
+        chunks = self._job_facets(job_id)["chunks"]
+        if chunk_no not in chunks:
+            path = self._counts_path(job_id, chunk_no)
+            if not os.path.exists(path):
+                facet_counts(pd.read_pickle(self._chunk_path(job_id, chunk_no))).to_pickle(path)
+            chunks[chunk_no] = pd.read_pickle(path)
+        return chunks[chunk_no]
+
+    def _facet_table(self, job_id):
+        # Facet counts of every finished chunk in one frame, tagged with the chunk number;
+        # rebuilt only when more chunks have finished
+        done = tuple(self._done_chunks(job_id))
+        entry = self._job_facets(job_id)
+        cached = entry["table"]
+        if cached is None or cached[0] != done:
+            if done:
+                table = pd.concat([self.chunk_facets(job_id, n).assign(chunk=n) for n in done], ignore_index=True)
+            else:
+                # Nothing finished yet: no facets, so pages, counts and exports are empty
+                table = pd.DataFrame(columns=[*FACET_COLUMNS, "count", "chunk"])
+            cached = entry["table"] = (done, table)
+        return cached[1]
+
+    def result_facets(self, job_id):
+        # Facet counts of the whole result, summed over chunks
+        return self._facet_table(job_id).groupby(FACET_COLUMNS)["count"].sum().reset_index()
+
+    def facet_values(self, job_id):
+        facets = self.result_facets(job_id)
+        return {col: sorted(facets[col].unique()) for col in FACET_COLUMNS}
+
+    # --- Dimension x level cells: updated as chunks finish, summed across stored runs ---
+    def job_cells(self, job_id, dimension, rebuild=True):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT value, level, count FROM job_cells WHERE job_id = ? AND dimension = ?", (job_id, dimension)
+            ).fetchall()
+        if not rows and rebuild and self.status(job_id)["status"] in ("done", "failed"):
+            # Jobs that finished before cells were recorded; running jobs record their own
+            self._rebuild_cells(job_id)
+            return self.job_cells(job_id, dimension, rebuild=False)
+        return pd.DataFrame([tuple(row) for row in rows], columns=["value", "level", "count"])
+
+    def rollup_cells(self, dimension, since=None):
+        # Cells of every stored run (optionally created after `since`, epoch seconds)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT value, level, SUM(count) FROM job_cells JOIN jobs USING (job_id) "
+                "WHERE dimension = ? AND created_at >= ? GROUP BY value, level",
+                (dimension, since or 0)
+            ).fetchall()
+        return pd.DataFrame([tuple(row) for row in rows], columns=["value", "level", "count"])
+
+    def _matches_per_chunk(self, job_id, filters):
+        # Matching rows per chunk from the facet counts alone; no result rows are read
+        table = self._facet_table(job_id)
+        counts = table[_filter_mask(table, filters)].groupby("chunk")["count"].sum()
+        return [(n, int(counts.get(n, 0))) for n in table["chunk"].unique()]
+
+    def read_page(self, job_id, filters=None, page=0, page_size=100):
+        # One page of the filtered result; only the chunks holding that page are loaded
+        matches = self._matches_per_chunk(job_id, filters)
+        skip, remaining, frames = page * page_size, page_size, []
+        for chunk_no, count in matches:
+            if remaining <= 0:
+                break
+            if skip >= count:
+                skip -= count
+                continue
+            chunk = pd.read_pickle(self._chunk_path(job_id, chunk_no))
+            rows = chunk[_filter_mask(chunk, filters)].iloc[skip:skip + remaining]
+            frames.append(rows)
+            remaining -= len(rows)
+            skip = 0
+        page_df = pd.concat(frames) if frames else pd.DataFrame()
+        return page_df, sum(count for _, count in matches)
+
+    def export_path(self, job_id, filters=None, fmt="csv"):
+        # Where the export for these filters is (or will be) written; one file per filter set and format
+        key = hashlib.sha1(json.dumps([filters or {}, fmt], sort_keys=True).encode()).hexdigest()[:12]
+        return os.path.join(self._job_dir(job_id), "exports", f"{key}.{fmt}")
+
+    def find_export(self, job_id, name):
+        # A prepared export by job id and file name (the last part of export_path), or None
+        if not _JOB_ID.fullmatch(job_id) or not _EXPORT_NAME.fullmatch(name):
+            return None
+        path = os.path.join(self._job_dir(job_id), "exports", name)
+        return path if os.path.exists(path) else None
+
+    def export(self, job_id, filters=None, fmt="csv"):
+        # Writes the filtered result chunk by chunk (memory stays at one chunk) and reuses the file afterwards
+        path = self.export_path(job_id, filters, fmt)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with span("job.export", fmt=fmt):
+            self._write_export(job_id, filters, fmt, path)
+        return path
+
+    def _write_export(self, job_id, filters, fmt, path):
+        chunks = (
+            chunk[_filter_mask(chunk, filters)]
+            for chunk in (pd.read_pickle(self._chunk_path(job_id, n)) for n in self._done_chunks(job_id))
+        )
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            writer = None
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path + ".tmp", table.schema)
+                writer.write_table(table)
+            if writer is not None:
+                writer.close()
+            else:
+                # No finished chunks to take a schema from: an empty file rather than none
+                pq.write_table(pa.table({}), path + ".tmp")
+        else:
+            with open(path + ".tmp", "w", newline="") as f:
+                for i, chunk in enumerate(chunks):
+                    chunk.to_csv(f, header=i == 0, index=False)
+        os.replace(path + ".tmp", path)
+
+
+def create_job_manager():
+    manager = JobManager(
+        root=get_secret("JOB_ROOT", ".jobs"),
+        max_workers=get_int_setting("BATCH_JOB_WORKERS", 2),
+        chunk_size=get_int_setting("BATCH_CHUNK_SIZE", 5000),
+        facet_cache_jobs=get_int_setting("JOB_FACET_CACHE_JOBS", 8)
+    )
+    manager.resume_incomplete()
+    return manager
@@ -0,0 +1,172 @@
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+from app_config import get_secret, get_int_setting, get_float_setting
+from resilience import get_endpoint
+from tracing import span
+
+# --- Azure ML tabular input layout ---
+MODEL_COLUMNS = [
+    "product_type",
+    "currency",
+    "option_type",
+    "notional",
+    "strike",
+    "expiry_tenor",
+    "maturity_tenor"
+]
+
+
+def build_payload(trades):
+    # Format the input in Azure expected tabular format, one row per trade
+    return {
+        "input_data": {
+            "columns": MODEL_COLUMNS,
+            "index": list(range(len(trades))),
+            "data": [[trade[col] for col in MODEL_COLUMNS] for trade in trades]
+        }
+    }
+
+
+def build_http_session():
+    # Keep-alive connection pool to the scoring endpoint; requests is only imported once one is built
+    import requests
+    import requests.adapters
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    # Headless callers (CLI, service, batch jobs) share one session per process;
+    # the Streamlit app passes its own from shared_resources
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_http_session()
+        return _session
+
+
+def post_payload(payload, timeout=None, session=None):
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {get_secret('AZURE_ML_API_KEY')}"
+    }
+    with span("ml.http", rows=len(payload["input_data"]["data"])) as attrs:
+        session = session or get_http_session()
+        response = session.post(get_secret("AZURE_ML_ENDPOINT"), headers=headers, json=payload, timeout=timeout)
+        attrs["status"] = response.status_code
+        response.raise_for_status()
+        return response.json()
+
+
+def get_ml_endpoint():
+    # Shared hedging / circuit breaker / latency state for AZURE_ML_ENDPOINT
+    return get_endpoint(
+        "azure_ml",
+        hedge_percentile=get_float_setting("ML_HEDGE_PERCENTILE", 95.0),
+        failure_threshold=get_int_setting("ML_BREAKER_FAILURES", 5),
+        reset_timeout=get_float_setting("ML_BREAKER_RESET_SECONDS", 30.0)
+    )
+
+
+def predict_batch(trades, session=None):
+    # One multi-row call; the endpoint answers with one level per row, e.g. ["Level 2", "Level 3"]
+    timeout = get_float_setting("ML_TIMEOUT_SECONDS", 10.0)
+    result = get_ml_endpoint().call(post_payload, build_payload(trades), timeout=timeout, session=session)
+    if not isinstance(result, list) or len(result) != len(trades):
+        raise ValueError(f"Expected {len(trades)} predictions from model endpoint, got: {result!r}")
+    return result
+
+
+# --- Cross-session micro-batching ---
+# A background thread takes the first queued request, keeps collecting for up to
+# max_wait_ms or until max_batch_size requests are queued, then sends them as one
+# multi-row payload and resolves each caller's future with its own row. The call is made in the
+# context of the request that opened the batch, so its spans join that caller's trace.
+class MicroBatchDispatcher:
+    def __init__(self, send_batch=predict_batch, max_wait_ms=5.0, max_batch_size=32, max_in_flight=4):
+        self.send_batch = send_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self._queue = queue.Queue()
+        self._senders = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="ml-batch-send")
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0}
+        self._thread = threading.Thread(target=self._collect_loop, name="ml-micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, trade):
+        future = Future()
+        self._queue.put((trade, future, contextvars.copy_context()))
+        return future
+
+    def predict(self, trade, timeout=None):
+        return self.submit(trade).result(timeout=timeout)
+
+    def _collect_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._senders.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        batch = [(trade, future, ctx) for trade, future, ctx in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        trades = [trade for trade, _, _ in batch]
+        futures = [future for _, future, _ in batch]
+        opener_context = batch[0][2]
+        with self._stats_lock:
+            self.stats["requests"] += len(futures)
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(futures))
+        try:
+            results = opener_context.run(self.send_batch, trades)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+
+def create_dispatcher(session=None):
+    return MicroBatchDispatcher(
+        send_batch=partial(predict_batch, session=session),
+        max_wait_ms=get_float_setting("ML_BATCH_MAX_WAIT_MS", 5.0),
+        max_batch_size=get_int_setting("ML_BATCH_MAX_SIZE", 32)
+    )
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    # One dispatcher per headless process (the classification service); the Streamlit app
+    # builds its own through shared_resources.get_ml_dispatcher
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = create_dispatcher()
+        return _dispatcher
@@ -1,67 +1,36 @@
 import streamlit as st
 import pandas as pd
-import os
-import requests
 import time
-from openai import AzureOpenAI
-from streamlit_echarts import st_echarts
+from gpt_client import chat_completion
+from shared_resources import get_job_manager, get_ml_dispatcher, get_openai_client
+from classification_rules import classify_frame, classify_trade
+from batch_inference import INPUT_COLUMNS, needs_rationale, stress_columns
+from batch_rationale import generate_batch_rationale, get_rate_budget
+from Observability_Stress_Module import run_observability_for_frame
+from batch_ui import finished_job, render_level_heatmap, render_result_viewer, submit_upload_job
+from reconciliation import Reconciler, get_review_queue
+from resilience import CircuitOpenError
+from tracing import span
 
 def predict_ir_swaption(input_df):
+    import requests  # deferred until the first model call, like ml_client
+
     with st.spinner("Calling ML Model..."):
         try:
-            payload = {
-                "input_data": {
-                    "columns": input_df.columns.tolist(),
-                    "index": [0],
-                    "data": input_df.values.tolist()
-                }
-            }
-
-            start_time = time.time()
-            response = requests.post(
-                url=get_secret("AZURE_ML_ENDPOINT"),
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {get_secret('AZURE_ML_API_KEY')}"
-                },
-                json=payload
-            )
-            end_time = time.time()
-            elapsed_time = round(end_time - start_time, 2)
-
-            response.raise_for_status()
-            result = response.json()
-            return result[0] if isinstance(result, list) else result
-
-        except requests.exceptions.RequestException as e:
-            st.error(f"❌ Model call failed: {e}")
-            return {"error": str(e)}
-
+            # Single-row calls are coalesced with other sessions' requests by the shared dispatcher
+            trade = input_df.to_dict(orient="records")[0]
+            return get_ml_dispatcher().predict(trade)
 
-# --- Mock model predictors per product ---
-def predict_bond(input_data):
-    return "Level 1"
+        except (requests.exceptions.RequestException, CircuitOpenError) as e:
+            st.warning(f"⚠️ Model call failed ({e}) - using rule-based fallback prediction.")
+            return classify_trade(trade)
 
-def predict_capfloor(input_data):
-    return "Level 3"
-
-def predict_irswap(input_data):
-    return "Level 2"
 
+# --- Rule-based predictors for products without an ML model ---
 def predict_by_product(product_type, input_data):
     if product_type == "IR Swaption":
         return predict_ir_swaption(input_data)
-    elif product_type == "Bond":
-        return predict_bond(input_data)
-    elif product_type == "CapFloor":
-        return predict_capfloor(input_data)
-    elif product_type == "IRSwap":
-        return predict_irswap(input_data)
-    else:
-        return "Unknown"
-
-def get_secret(key, default=""):
-    return os.getenv(key, st.secrets.get(key, default))
+    return classify_frame(input_data)[0]
 
 # --- Streamlit App Layout ---
 st.set_page_config(page_title="Augur - Fair Value Classification Model",layout="centered")
@@ -119,7 +88,8 @@ with single_tab:
     if st.button("Run Single Trade Inference"):
         try:
             start_time = time.time()
-            result = predict_by_product(product_type, input_data)
+            with span("page.single_inference", product=product_type):
+                result = predict_by_product(product_type, input_data)
             end_time = time.time()
             st.session_state["model_pred"] = result
             st.session_state["ML_Model_elapsed_time"] = round(end_time - start_time, 2)
@@ -157,65 +127,56 @@ with batch_tab:
     st.markdown("Upload a CSV file with trade deatils - Supported Products - IR Swaption, Bond, CapFloor, IRSwap")
 
     uploaded_file = st.file_uploader("Upload CSV", type="csv", key="batch")
+    required_cols = INPUT_COLUMNS
+    # Inference runs as a background job so large files survive reruns and restarts
     if uploaded_file:
-        df_infer = pd.read_csv(uploaded_file)
-        required_cols = ["product_type", "currency", "option_type", "notional", "strike", "expiry_tenor", "maturity_tenor"]
-        if all(col in df_infer.columns for col in required_cols):
-            with st.spinner("Running batch inference..."):
-                try:
-                    df_infer["Predicted IFRS13 Level"] = df_infer.apply(
-                        lambda row: predict_by_product(row["product_type"], row.to_frame().T), axis=1
-                    )
-                    st.success("✅ Inference completed!")
-                    st.dataframe(df_infer.head(11))
-
-                    st.download_button("📅 Download Results", data=df_infer.to_csv(index=False), file_name="predicted_results.csv")
-                except Exception as e:
-                    st.error(f"❌ Batch mock model failed: {e}")
-        else:
+        if not submit_upload_job(uploaded_file, required_cols, kind="mixed", state_key="batch_job"):
             st.warning(f"CSV must include columns: {', '.join(required_cols)}")
 
-                    # --- Development-only Visualization ---
-        if "trading_desk" in df_infer.columns:
-                        heatmap_data = df_infer.groupby(["trading_desk", "Predicted IFRS13 Level"]).size().reset_index(name="count")
-                        rows = heatmap_data["trading_desk"].unique().tolist()
-                        cols = heatmap_data["Predicted IFRS13 Level"].unique().tolist()
-
-                        row_map = {v: i for i, v in enumerate(rows)}
-                        col_map = {v: i for i, v in enumerate(cols)}
-
-                        data = [[col_map[c], row_map[r], int(v)] for r, c, v in heatmap_data.values]
-
-                        option = {
-                            "tooltip": {"position": "top"},
-                            "grid": {"height": "50%", "top": "10%"},
-                            "xAxis": {"type": "category", "data": cols, "splitArea": {"show": True}},
-                            "yAxis": {"type": "category", "data": rows, "splitArea": {"show": True}},
-                            "visualMap": {
-                                "min": 0,
-                                "max": max(heatmap_data["count"]),
-                                "calculable": True,
-                                "orient": "horizontal",
-                                "left": "center",
-                                "bottom": "15%",
-                            },
-                            "series": [
-                                {
-                                    "name": "Trade Count",
-                                    "type": "heatmap",
-                                    "data": data,
-                                    "label": {"show": True},
-                                    "emphasis": {
-                                        "itemStyle": {"shadowBlur": 10, "shadowColor": "rgba(0, 0, 0, 0.5)"}
-                                    },
-                                }
-                            ],
-                        }
-
-                        st.subheader("Heatmap: Predicted Fair value Level by Trading Desk")
-                        st_echarts(option, height="400px")
-        else:
-                    st.warning(f"CSV must include columns: {', '.join(required_cols)}")
+    batch_job = finished_job("batch_job")
+    if batch_job is not None:
+        st.success("✅ Inference completed!")
+        render_result_viewer(batch_job)
+
+        # --- Batch rationale for Level 3 trades (one GPT call per observability signature) ---
+        if st.button("Generate Rationale for Level 3 Trades"):
+            with st.spinner("Running risk factor observability tests..."):
+                df_infer = get_job_manager().load_results(batch_job["job_id"])
+                review_df = df_infer.join(run_observability_for_frame(df_infer[stress_columns(df_infer)]))
+            level3_df = review_df[needs_rationale(review_df)].copy()
+            if level3_df.empty:
+                st.info("No Level 3 trades in this batch.")
+            else:
+                progress_bar = st.progress(0.0, text="Generating rationale...")
+                rationale, stats = generate_batch_rationale(
+                    level3_df, budget=get_rate_budget(), client=get_openai_client(),
+                    progress=lambda done, total: progress_bar.progress(done / total, text=f"Rationale {done}/{total} signatures")
+                )
+                level3_df["Rationale"] = rationale
+                st.success(
+                    f"✅ Rationale for {stats['trades']} Level 3 trades: {stats['fast_path_share']:.0%} via deterministic template, "
+                    f"the rest from {stats['unique_signatures']} GPT signatures in {stats['elapsed_s']}s ({stats['failed_signatures']} failed)"
+                )
+                st.dataframe(level3_df.drop(columns=["ir_summary", "vol_summary"]).head(11))
+                st.download_button("📅 Download Level 3 Rationale", data=level3_df.to_csv(index=False), file_name="level3_rationale.csv")
+
+        # --- Model vs. observability reconciliation; disagreeing trades go to the review queue ---
+        if st.button("Reconcile Model vs. Risk Factor Observability"):
+            with st.spinner("Running risk factor observability tests..."), span("page.reconcile", rows=batch_job["rows"]):
+                # Chunk by chunk, as the job wrote them: one chunk's results in memory at a time
+                reconciler = Reconciler()
+                for chunk in get_job_manager().iter_results(batch_job["job_id"]):
+                    reconciler.add(chunk.join(run_observability_for_frame(chunk[stress_columns(chunk)])))
+                run_id = get_review_queue().save(reconciler, source=f"job {batch_job['job_id']}")
+            summary = reconciler.summary()
+            st.success(
+                f"✅ {summary['disagreements']:,} of {summary['trades']:,} trades disagree ({summary['disagreement_rate']:.1%}), "
+                f"{summary['pv_at_stake']:,.0f} unobservable PV at stake. Queued for review as run {run_id} - see the Review Queue page."
+            )
+            st.dataframe(reconciler.stats("product_type").drop(columns="dimension"), hide_index=True)
+
+        # --- Development-only Visualization ---
+        render_level_heatmap(batch_job["job_id"], level_label="Predicted Fair value Level")
 
 
 with rationale_tab:
@@ -223,11 +184,6 @@ with rationale_tab:
     if st.button("Run GPT-4o Rationale"):
         if all(k in st.session_state for k in ["ir_summary", "vol_summary", "model_pred"]):
             st.session_state["rat_done"] = True
-            client = AzureOpenAI(
-                api_key=get_secret("AZURE_OPENAI_API_KEY"),
-                api_version="2024-02-01",
-                azure_endpoint=get_secret("AZURE_OPENAI_ENDPOINT")
-            )
             messages = [
                 {"role": "system", "content": "You're a financial analyst..."},
                 {"role": "user", "content": (
@@ -237,12 +193,7 @@ with rationale_tab:
                     "Explain and confirm IFRS13 classification with confidence score."
                 )}
             ]
-            response = client.chat.completions.create(
-                model=get_secret("AZURE_OPENAI_MODEL"),
-                messages=messages,
-                temperature=0.5
-            )
-            st.session_state["rationale_text"] = response.choices[0].message.content
+            st.session_state["rationale_text"] = chat_completion(messages, temperature=0.5, client=get_openai_client())
             st.rerun()
         else:
             st.warning("⚠️ Ensure both model inference and risk summaries are completed.")
@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
-import os
-from Observability_Stress_Module import simulate_greeks, generate_trade_pv_and_risk_pvs, ir_delta_stress_test, vol_risk_stress_test
+from Observability_Stress_Module import simulate_trade, new_seed, ir_delta_stress_test, vol_risk_stress_test, ois_curve_map
+from audit_log import get_audit_log, report_decision
+from session_store import get_artifact, has_artifacts, put_artifact
+from shared_resources import get_observability_grids
+from tracing import span
+from what_if import mark_fresh, what_if_sidebar
 
 st.set_page_config(page_title="Risk Factor Testing", layout="wide")
 st.title("Grounding Model Predictions with Risk Factor Observability")
@@ -15,10 +19,6 @@ In accordance with **IFRS 13** Level determination criteria, if the unobservable
 the model classification is re-leveled to reflect reduced market observability, ensuring alignment with valuation governance and disclosure standards.
 """)
 
-# --- Load secrets from environment variables as fallback ---
-def get_secret(key, default=""):
-    return os.getenv(key, st.secrets.get(key, default))
-
 # --- Trade Input ---
 st.sidebar.header("Trade Details")
 product_type = st.sidebar.selectbox("Product Type", ["IR Swaption", "Bond", "CapFloor", "IRSwap"], index=0)
@@ -39,6 +39,16 @@ trade = {
     "notional": notional
 }
 st.session_state["trade"] = trade
+what_if_sidebar(trade, ["greeks", "stress"])
+
+# --- Grid rows the stress tests check this trade against ---
+# Volatility risk is tested on the swaption vol grid, the caplet vol grid (CapFloor) or credit spreads (Bond)
+grids = get_observability_grids()
+vol_grid = {"Bond": "credit", "CapFloor": "caplet"}.get(product_type, "vol")
+with st.expander("Observability grids for this trade", expanded=False):
+    st.caption(f"Grid version {grids['version']}")
+    st.dataframe(grids["ir"][grids["ir"]["Curve ID"] == ois_curve_map[currency]], hide_index=True)
+    st.dataframe(grids[vol_grid][grids[vol_grid]["Currency"] == currency], hide_index=True)
 
 # --- Show Model Predicted Level if available ---
 model_level = st.session_state.get("model_pred")
@@ -46,61 +56,74 @@ if model_level:
     st.info(f" Fair value Level Predicted by Model: **{model_level}**")
 
 if st.button("Ground with Risk Factor Observability"):
-    greeks = simulate_greeks(trade)
-    trade["trade_pv"], generated_pvs = generate_trade_pv_and_risk_pvs(greeks)
-    greeks.update(generated_pvs)
-
-    ir_stressed, ir_report, ir_stress_pv, ir_msgs = ir_delta_stress_test(trade, greeks)
-    vol_stressed, vol_report, vol_stress_pv, vol_msgs = vol_risk_stress_test(trade, greeks)
-    total_stress_pv = ir_stress_pv + vol_stress_pv
-    rf_level = "Level 3" if total_stress_pv > 0.1 * trade["trade_pv"] else "Level 2"
-
-    final_level = rf_level  # You can later extend this logic if you apply further adjustments
-
-    st.session_state.update({
-        "greeks": greeks,
-        "generated_pvs": generated_pvs,
-        "ir_summary": ir_msgs,
-        "vol_summary": vol_msgs,
-        "ir_report_df": pd.DataFrame(ir_report).T,
-        "vol_report_df": pd.DataFrame(vol_report).T,
-        "trade_pv": trade["trade_pv"],
-        "ir_stress_pv": ir_stress_pv,
-        "vol_stress_pv": vol_stress_pv,
-        "rf_level": rf_level,
-        "final_level": final_level,
-        "rf_done": True
-    })
-    st.rerun()
+    with span("page.risk_factor_test", product=trade["product_type"]):
+        seed = new_seed()
+        greeks, trade["trade_pv"], generated_pvs = simulate_trade(trade, seed)
+        greeks.update(generated_pvs)
+
+        ir_stressed, ir_report, ir_stress_pv, ir_msgs = ir_delta_stress_test(trade, greeks)
+        vol_stressed, vol_report, vol_stress_pv, vol_msgs = vol_risk_stress_test(trade, greeks)
+        total_stress_pv = ir_stress_pv + vol_stress_pv
+        rf_level = "Level 3" if total_stress_pv > 0.1 * trade["trade_pv"] else "Level 2"
+
+        final_level = rf_level  # You can later extend this logic if you apply further adjustments
+
+        get_audit_log().append(report_decision(
+            trade, greeks, {**ir_report, **vol_report}, model_pred=st.session_state.get("model_pred"),
+            seed=seed, source="risk_factor_page"
+        ))
+        mark_fresh(trade, ["greeks", "stress"], seed=seed, greeks=greeks, trade_pv=trade["trade_pv"],
+                   generated_pvs=generated_pvs)
+
+        # Large artifacts go to the shared store; session state keeps the scalars and summaries
+        put_artifact("greeks", greeks)
+        put_artifact("generated_pvs", generated_pvs)
+        put_artifact("ir_report_df", pd.DataFrame(ir_report).T)
+        put_artifact("vol_report_df", pd.DataFrame(vol_report).T)
+        st.session_state.update({
+            "ir_summary": ir_msgs,
+            "vol_summary": vol_msgs,
+            "trade_pv": trade["trade_pv"],
+            "ir_stress_pv": ir_stress_pv,
+            "vol_stress_pv": vol_stress_pv,
+            "rf_level": rf_level,
+            "final_level": final_level,
+            "rf_done": True
+        })
+        st.rerun()
 
 # --- Display Results ---
 if st.session_state.get("rf_done"):
-    st.subheader("Classification Summary")
-
-    model_level = st.session_state.get("model_pred", "N/A")
-    rf_level = st.session_state.get("rf_level", "N/A")
-    final_level = st.session_state.get("final_level", "N/A")
-    observability_override = "Yes" if model_level != final_level else "No"
-
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Model Predicted Level", model_level)
-    col2.metric("Risk Factor Observability Level", rf_level)
-    col3.metric("Final Adjusted Level", final_level)
-
-    st.markdown("---")
-    st.subheader("Risk Factors and PV Contributions")
-    st.dataframe(pd.DataFrame.from_dict(st.session_state["greeks"], orient="index", columns=["Value"]))
-    st.dataframe(pd.DataFrame.from_dict(st.session_state["generated_pvs"], orient="index", columns=["PV"]))
-
-    st.subheader("📈 IR Delta Observability")
-    st.dataframe(st.session_state["ir_report_df"])
-
-    st.subheader("📉 Volatility Observability")
-    st.dataframe(st.session_state["vol_report_df"])
-
-    total_pv = round(st.session_state["trade_pv"], 2)
-    stress_pv = round(st.session_state["ir_stress_pv"] + st.session_state["vol_stress_pv"], 2)
-    st.metric("Total PV", total_pv)
-    st.metric("Stressed PV", stress_pv)
-
-    st.success(f"🔍 Final Observability Level: {final_level}")
\ No newline at end of file
+    with span("render.risk_factor_results"):
+        st.subheader("Classification Summary")
+
+        model_level = st.session_state.get("model_pred", "N/A")
+        rf_level = st.session_state.get("rf_level", "N/A")
+        final_level = st.session_state.get("final_level", "N/A")
+        observability_override = "Yes" if model_level != final_level else "No"
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Model Predicted Level", model_level)
+        col2.metric("Risk Factor Observability Level", rf_level)
+        col3.metric("Final Adjusted Level", final_level)
+
+        st.markdown("---")
+        st.subheader("Risk Factors and PV Contributions")
+        if has_artifacts("greeks", "generated_pvs", "ir_report_df", "vol_report_df"):
+            st.dataframe(pd.DataFrame.from_dict(get_artifact("greeks"), orient="index", columns=["Value"]))
+            st.dataframe(pd.DataFrame.from_dict(get_artifact("generated_pvs"), orient="index", columns=["PV"]))
+
+            st.subheader("📈 IR Delta Observability")
+            st.dataframe(get_artifact("ir_report_df"))
+
+            st.subheader("📉 Volatility Observability")
+            st.dataframe(get_artifact("vol_report_df"))
+        else:
+            st.info("Detailed results were released under the session memory budget - rerun the test to view them.")
+
+        total_pv = round(st.session_state["trade_pv"], 2)
+        stress_pv = round(st.session_state["ir_stress_pv"] + st.session_state["vol_stress_pv"], 2)
+        st.metric("Total PV", total_pv)
+        st.metric("Stressed PV", stress_pv)
+
+        st.success(f"🔍 Final Observability Level: {final_level}")
\ No newline at end of file
@@ -1,26 +1,20 @@
 import streamlit as st
-import os
-from openai import AzureOpenAI
+from gpt_client import chat_completion, stream_chat_completion
+from shared_resources import get_openai_client
+from tracing import span
 from workflow_styles import get_workflow_css, get_workflow_html_rat
 
 st.set_page_config(page_title="Rationale Generation", layout="wide")
 st.markdown(get_workflow_css(), unsafe_allow_html=True)
 st.title("3️⃣ Rationale Explanation via GPT")
 
-# --- Secret loader ---
-def get_secret(key, default=""):
-    return os.getenv(key, st.secrets.get(key, default))
-
 st.markdown(get_workflow_html_rat(3 if st.session_state.get("rat_done") else 0), unsafe_allow_html=True)
 
+st.toggle("Stream rationale as it is generated", value=True, key="stream_rationale")
+
 if st.button("▶ Run GPT-4o Rationale"):
     if all(k in st.session_state for k in ["ir_summary", "vol_summary", "model_pred"]):
         st.session_state["rat_done"] = True
-        client = AzureOpenAI(
-            api_key=get_secret("AZURE_OPENAI_API_KEY"),
-            api_version="2024-02-01",
-            azure_endpoint=get_secret("AZURE_OPENAI_ENDPOINT")
-        )
         messages = [
             {"role": "system", "content": "You're a financial analyst..."},
             {"role": "user", "content": (
@@ -30,12 +24,12 @@ if st.button("▶ Run GPT-4o Rationale"):
                 "Explain and confirm IFRS13 classification with confidence score."
             )}
         ]
-        response = client.chat.completions.create(
-            model=get_secret("AZURE_OPENAI_MODEL"),
-            messages=messages,
-            temperature=0.5
-        )
-        st.session_state["rationale_text"] = response.choices[0].message.content
+        with span("page.rationale", stream=st.session_state.get("stream_rationale", True)):
+            if st.session_state.get("stream_rationale", True):
+                # Tokens are rendered as they arrive; the assembled text is kept for later reruns
+                st.session_state["rationale_text"] = st.write_stream(stream_chat_completion(messages, temperature=0.5, client=get_openai_client()))
+            else:
+                st.session_state["rationale_text"] = chat_completion(messages, temperature=0.5, client=get_openai_client())
         st.rerun()
     else:
         st.warning("⚠️ Run both prior steps first!")
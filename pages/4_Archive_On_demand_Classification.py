@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import os
-import requests
 import time
-from openai import AzureOpenAI
-from streamlit_echarts import st_echarts
+from gpt_client import chat_completion
+from ml_client import build_payload
+from shared_resources import get_ml_dispatcher, get_openai_client
+from classification_rules import classify_frame
+from batch_inference import INPUT_COLUMNS
+from tracing import span
+from batch_ui import finished_job, render_level_heatmap, render_result_viewer, submit_upload_job
 
 st.set_page_config(page_title="On-Demand IFRS13 Classification", layout="wide")
 
@@ -38,9 +41,6 @@ st.markdown("""
 
 st.title("🔎 On-Demand IFRS13 Fair Value Classification")
 
-def get_secret(key, default=""):
-    return os.getenv(key, st.secrets.get(key, default))
-
 single_tab, batch_tab, rationale_tab = st.tabs(["  Single Trade Inference", "  Batch Inference", "  Analytical Review"])
 
 with single_tab:
@@ -67,26 +67,17 @@ with single_tab:
     }])
 
     if st.button("▶ Run Single Trade Inference"):
-        payload = {
-            "input_data": {
-                "columns": input_data.columns.tolist(),
-                "index": [0],
-                "data": input_data.values.tolist()
-            }
-        }
+        payload = build_payload(input_data.to_dict(orient="records"))
         with st.spinner("Calling ML Model..."):
             try:
                 start_time = time.time()
-                response = requests.post(
-                    url=get_secret("AZURE_ML_ENDPOINT"),
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {get_secret('AZURE_ML_API_KEY')}"
-                    },
-                    json=payload
-                )
+                with span("page.single_inference", product=product_type):
+                    try:
+                        result = [get_ml_dispatcher().predict(input_data.to_dict(orient="records")[0])]
+                    except Exception as e:
+                        st.warning(f"⚠️ Model call failed ({e}) - using rule-based fallback prediction.")
+                        result = [classify_frame(input_data)[0]]
                 end_time = time.time()
-                result = response.json()
                 st.session_state["model_pred"] = result[0]
                 st.session_state["ML_Model_elapsed_time"] = round(end_time - start_time, 2)
                 st.success(f"✅ Predicted IFRS13 Level: {result[0]}")
@@ -115,87 +106,23 @@ with batch_tab:
 
     uploaded_file = st.file_uploader("Upload CSV", type="csv", key="batch")
     if uploaded_file:
-        df_infer = pd.read_csv(uploaded_file)
-        required_cols = ["product_type", "currency", "option_type", "notional", "strike", "expiry_tenor", "maturity_tenor"]
-        if all(col in df_infer.columns for col in required_cols):
-            payload = {
-                "input_data": {
-                    "columns": required_cols,
-                    "index": list(range(len(df_infer))),
-                    "data": df_infer[required_cols].values.tolist()
-                }
-            }
-            with st.spinner("Running batch inference..."):
-                try:
-                    response = requests.post(
-                        url=get_secret("AZURE_ML_ENDPOINT"),
-                        headers={
-                            "Content-Type": "application/json",
-                            "Authorization": f"Bearer {get_secret('AZURE_ML_API_KEY')}"
-                        },
-                        json=payload
-                    )
-                    result = response.json()
-                    df_infer["Predicted IFRS13 Level"] = result
-                    st.success("✅ Inference completed!")
-                    st.dataframe(df_infer.head(11))
-
-                    # --- Development-only Visualization ---
-                    if "trading_desk" in df_infer.columns:
-                        heatmap_data = df_infer.groupby(["trading_desk", "Predicted IFRS13 Level"]).size().reset_index(name="count")
-                        rows = heatmap_data["trading_desk"].unique().tolist()
-                        cols = heatmap_data["Predicted IFRS13 Level"].unique().tolist()
-
-                        row_map = {v: i for i, v in enumerate(rows)}
-                        col_map = {v: i for i, v in enumerate(cols)}
-
-                        data = [[col_map[c], row_map[r], int(v)] for r, c, v in heatmap_data.values]
-
-                        option = {
-                            "tooltip": {"position": "top"},
-                            "grid": {"height": "50%", "top": "10%"},
-                            "xAxis": {"type": "category", "data": cols, "splitArea": {"show": True}},
-                            "yAxis": {"type": "category", "data": rows, "splitArea": {"show": True}},
-                            "visualMap": {
-                                "min": 0,
-                                "max": max(heatmap_data["count"]),
-                                "calculable": True,
-                                "orient": "horizontal",
-                                "left": "center",
-                                "bottom": "15%",
-                            },
-                            "series": [
-                                {
-                                    "name": "Trade Count",
-                                    "type": "heatmap",
-                                    "data": data,
-                                    "label": {"show": True},
-                                    "emphasis": {
-                                        "itemStyle": {"shadowBlur": 10, "shadowColor": "rgba(0, 0, 0, 0.5)"}
-                                    },
-                                }
-                            ],
-                        }
-
-                        st.subheader("Heatmap: IFRS13 Level by Trading Desk")
-                        st_echarts(option, height="400px")
-
-                    st.download_button("📅 Download Results", data=df_infer.to_csv(index=False), file_name="predicted_results.csv")
-                except Exception as e:
-                    st.error(f"❌ Model call failed: {e}")
-        else:
+        required_cols = INPUT_COLUMNS
+        if not submit_upload_job(uploaded_file, required_cols, kind="model", state_key="archive_batch_job"):
             st.warning(f"CSV must include columns: {', '.join(required_cols)}")
 
+    batch_job = finished_job("archive_batch_job")
+    if batch_job is not None:
+        st.success("✅ Inference completed!")
+        render_result_viewer(batch_job)
+
+        # --- Development-only Visualization ---
+        render_level_heatmap(batch_job["job_id"], level_label="IFRS13 Level")
+
 with rationale_tab:
     st.subheader("🧫 Rationale Explanation")
     if st.button("▶ Run GPT-4o Rationale"):
         if all(k in st.session_state for k in ["ir_summary", "vol_summary", "model_pred"]):
             st.session_state["rat_done"] = True
-            client = AzureOpenAI(
-                api_key=get_secret("AZURE_OPENAI_API_KEY"),
-                api_version="2024-02-01",
-                azure_endpoint=get_secret("AZURE_OPENAI_ENDPOINT")
-            )
             messages = [
                 {"role": "system", "content": "You're a financial analyst..."},
                 {"role": "user", "content": (
@@ -205,12 +132,7 @@ with rationale_tab:
                     "Explain and confirm IFRS13 classification with confidence score."
                 )}
             ]
-            response = client.chat.completions.create(
-                model=get_secret("AZURE_OPENAI_MODEL"),
-                messages=messages,
-                temperature=0.5
-            )
-            st.session_state["rationale_text"] = response.choices[0].message.content
+            st.session_state["rationale_text"] = chat_completion(messages, temperature=0.5, client=get_openai_client())
             st.rerun()
         else:
             st.warning("⚠️ Ensure both model inference and risk summaries are completed.")
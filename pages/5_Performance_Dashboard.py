@@ -0,0 +1,113 @@
+import json
+import time
+
+import pandas as pd
+import streamlit as st
+
+from tracing import get_span_recorder, tracing_enabled
+
+st.set_page_config(page_title="Performance Dashboard", layout="wide")
+st.title("⏱️ Performance Dashboard")
+st.markdown("""
+End-to-end latency per workflow stage, from the spans recorded by the app, the pages, the batch jobs and
+the classification service. **Self time** excludes the time spent in child stages (HTTP calls, stress math,
+rendering), so it shows where a slow workflow actually spends its time.
+""")
+
+WINDOWS = {"Last 15 minutes": 15 * 60, "Last hour": 3600, "Last 24 hours": 24 * 3600, "Last 72 hours": 72 * 3600}
+SPAN_COLUMNS = ["trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "ok", "attrs"]
+
+if not tracing_enabled():
+    st.info("Tracing is switched off (TRACING=off); no new spans are being recorded.")
+
+
+def load_spans(seconds):
+    df = pd.DataFrame(get_span_recorder().query(time.time() - seconds), columns=SPAN_COLUMNS)
+    df["time"] = pd.to_datetime(df["start"], unit="s")
+    # Self time: own duration minus the duration of direct children
+    child_ms = df.groupby("parent_id")["duration_ms"].sum()
+    df["self_ms"] = (df["duration_ms"] - df["span_id"].map(child_ms).fillna(0)).clip(lower=0)
+    return df
+
+
+def stage_table(df, seconds):
+    stages = df.groupby("name").agg(
+        count=("duration_ms", "size"),
+        p50_ms=("duration_ms", lambda s: s.quantile(0.50)),
+        p95_ms=("duration_ms", lambda s: s.quantile(0.95)),
+        p99_ms=("duration_ms", lambda s: s.quantile(0.99)),
+        mean_self_ms=("self_ms", "mean"),
+        total_self_s=("self_ms", lambda s: s.sum() / 1000),
+        error_rate=("ok", lambda s: 1 - s.mean()),
+    )
+    stages.insert(1, "per_minute", stages["count"] / (seconds / 60))
+    return stages.sort_values("total_self_s", ascending=False).round(2)
+
+
+window = st.selectbox("Time window", list(WINDOWS), index=1)
+seconds = WINDOWS[window]
+if st.button("🔄 Refresh"):
+    st.rerun()
+
+spans = load_spans(seconds)
+if spans.empty:
+    st.info("No spans recorded in this window yet. Run a workflow on one of the other pages.")
+    st.stop()
+
+roots = spans[spans["parent_id"].isna()]
+col1, col2, col3 = st.columns(3)
+col1.metric("Traces", f"{len(roots):,}")
+col2.metric("Spans", f"{len(spans):,}")
+col3.metric("Failed spans", f"{int((spans['ok'] == 0).sum()):,}")
+
+# --- Per-stage latency and throughput ---
+st.subheader("📊 Stages")
+st.dataframe(stage_table(spans, seconds))
+
+# --- p95 over time ---
+st.subheader("📈 p95 latency over time")
+stages = sorted(spans["name"].unique())
+default = [name for name in stages if name in roots["name"].unique()][:5] or stages[:5]
+selected = st.multiselect("Stages", stages, default=default)
+if selected:
+    bucket = "1min" if seconds <= 3600 else "15min"
+    p95 = (
+        spans[spans["name"].isin(selected)]
+        .groupby([pd.Grouper(key="time", freq=bucket), "name"])["duration_ms"]
+        .quantile(0.95)
+        .unstack("name")
+    )
+    st.line_chart(p95)
+
+# --- Slowest traces ---
+st.subheader("🐢 Slowest traces")
+slowest = roots.nlargest(20, "duration_ms")[["trace_id", "name", "time", "duration_ms", "ok"]]
+slowest = slowest.assign(spans=slowest["trace_id"].map(spans["trace_id"].value_counts()))
+st.dataframe(slowest.round({"duration_ms": 1}), hide_index=True)
+
+trace_id = st.selectbox(
+    "Trace breakdown",
+    slowest["trace_id"],
+    format_func=lambda tid: f"{tid} · {slowest.set_index('trace_id').at[tid, 'name']} · "
+                            f"{slowest.set_index('trace_id').at[tid, 'duration_ms']:.0f} ms"
+)
+if trace_id:
+    trace = pd.DataFrame(get_span_recorder().trace(trace_id), columns=SPAN_COLUMNS)
+    # Indent each span under its parent, waterfall style
+    depth = {}
+    parents = dict(zip(trace["span_id"], trace["parent_id"]))
+    for span_id in trace["span_id"]:
+        parent, level = parents.get(span_id), 0
+        while parent in parents:
+            parent, level = parents[parent], level + 1
+        depth[span_id] = level
+    trace["stage"] = [("  " * depth[sid]) + ("└ " if depth[sid] else "") + name for sid, name in zip(trace["span_id"], trace["name"])]
+    trace["offset_ms"] = (trace["start"] - trace["start"].min()) * 1000
+    trace["attrs"] = trace["attrs"].map(lambda raw: ", ".join(f"{k}={v}" for k, v in json.loads(raw).items()) if raw else "")
+    st.dataframe(
+        trace[["stage", "offset_ms", "duration_ms", "ok", "attrs"]].round(1),
+        hide_index=True,
+        column_config={"duration_ms": st.column_config.ProgressColumn(
+            "duration_ms", format="%.1f ms", min_value=0, max_value=float(trace["duration_ms"].max())
+        )}
+    )
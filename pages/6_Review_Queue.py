@@ -0,0 +1,93 @@
+import pandas as pd
+import streamlit as st
+
+from reconciliation import DIMENSIONS, REVIEW_STATUSES, get_review_queue
+
+st.set_page_config(page_title="Review Queue", layout="wide")
+st.title("🔎 Model vs. Observability Review Queue")
+st.markdown("""
+Trades where the model's predicted level and the risk factor observability level disagree, from batch
+reconciliation runs (Prediction page or `classify_portfolio.py --review-queue`). The queue is ranked by
+**unobservable PV at stake**, so the trades that move the Level 3 disclosure most come first.
+""")
+
+PAGE_SIZE = 50
+queue = get_review_queue()
+
+runs = queue.runs()
+if not runs:
+    st.info("No reconciliation runs yet. Reconcile a batch on the Prediction page first.")
+    st.stop()
+
+run = st.selectbox(
+    "Reconciliation run", runs,
+    format_func=lambda r: f"{pd.Timestamp(r['created_at'], unit='s'):%Y-%m-%d %H:%M} - {r['source']} ({r['run_id']})"
+)
+run_id, summary = run["run_id"], run["summary"]
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Trades", f"{summary['trades']:,}")
+col2.metric("Disagreements", f"{summary['disagreements']:,}", f"{summary['disagreement_rate']:.1%}", delta_color="off")
+col3.metric("Model below observability", f"{summary['model_below']:,}")
+col4.metric("Unobservable PV at stake", f"{summary['pv_at_stake']:,.0f}")
+
+# --- Disagreement statistics per dimension ---
+for tab, dimension in zip(st.tabs([d.replace("_", " ").title() for d in DIMENSIONS]), DIMENSIONS):
+    with tab:
+        st.dataframe(queue.stats(run_id, dimension).drop(columns="dimension"), hide_index=True,
+                     column_config={"rate": st.column_config.ProgressColumn("rate", min_value=0.0, max_value=1.0),
+                                    "pv_at_stake": st.column_config.NumberColumn(format="%.0f")})
+
+# --- Review queue: filters, keyset paging and status updates ---
+st.subheader("Review queue")
+done = queue.status_counts(run_id)
+st.caption(" · ".join(f"{status}: {done.get(status, 0):,}" for status in REVIEW_STATUSES))
+
+stats = queue.stats(run_id)
+filter_cols = st.columns(1 + len(DIMENSIONS))
+filters = {"status": filter_cols[0].multiselect("Status", REVIEW_STATUSES, default=["open"])}
+for col, dimension in zip(filter_cols[1:], DIMENSIONS):
+    filters[dimension] = col.multiselect(dimension.replace("_", " ").title(),
+                                         sorted(stats.loc[stats["dimension"] == dimension, "value"]))
+
+# Page starts as ranks, so each page is read straight from the index; reset when the filters change
+cursor_key = (run_id, tuple((col, tuple(values)) for col, values in filters.items()))
+if st.session_state.get("review_cursor_key") != cursor_key:
+    st.session_state["review_cursor_key"] = cursor_key
+    st.session_state["review_cursor"] = [0]
+cursor = st.session_state["review_cursor"]
+
+total = queue.count(run_id, filters)
+page = queue.page(run_id, filters, after_rank=cursor[-1], page_size=PAGE_SIZE)
+first = (len(cursor) - 1) * PAGE_SIZE
+st.caption(f"Items {first + 1 if len(page) else 0:,}-{first + len(page):,} of {total:,}")
+
+edited = st.data_editor(
+    page, hide_index=True, key=f"review_page_{run_id}_{cursor[-1]}",
+    disabled=[col for col in page.columns if col not in ("status", "note")],
+    column_config={
+        "status": st.column_config.SelectboxColumn("status", options=REVIEW_STATUSES, required=True),
+        "note": st.column_config.TextColumn("note"),
+        "unobservable_pv": st.column_config.NumberColumn(format="%.0f"),
+        "trade_pv": st.column_config.NumberColumn(format="%.0f"),
+    }
+)
+
+prev_col, next_col, save_col = st.columns(3)
+if prev_col.button("⬅ Previous", disabled=len(cursor) == 1):
+    cursor.pop()
+    st.rerun()
+if next_col.button("Next ➡", disabled=first + len(page) >= total):
+    cursor.append(int(page["rank"].iloc[-1]))
+    st.rerun()
+if save_col.button("💾 Save review decisions"):
+    note_changed = edited["note"].fillna("") != page["note"].fillna("")
+    changed = edited[(edited["status"] != page["status"]) | note_changed]
+    for (rank, status, note), new_note in zip(changed[["rank", "status", "note"]].itertuples(index=False),
+                                              note_changed[changed.index]):
+        if new_note:
+            # A cleared cell comes back as "" or None; either one clears the stored note
+            queue.set_status(run_id, [rank], status, None if pd.isna(note) else note)
+        else:
+            queue.set_status(run_id, [rank], status)
+    st.rerun()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app_config import get_secret, get_int_setting, get_float_setting
+
+
+# --- Cache key: hash of normalized prompt + model deployment + temperature ---
+def _normalize(text):
+    return " ".join(str(text).split())
+
+
+def make_cache_key(messages, model, temperature):
+    normalized = [{"role": m["role"], "content": _normalize(m["content"])} for m in messages]
+    blob = json.dumps({"messages": normalized, "model": model, "temperature": round(float(temperature), 4)}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# --- Two-tier rationale cache: in-memory LRU in front of a SQLite store on disk ---
+class RationaleCache:
+    def __init__(self, path, max_entries=256, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rationale (key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                "model TEXT, created_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _expired(self, created_at):
+        return self.ttl_seconds and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1]):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT text, created_at FROM rationale WHERE key = ?", (key,)).fetchone()
+        if row is None or self._expired(row[1]):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, text, model=None):
+        created_at = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO rationale (key, text, model, created_at) VALUES (?, ?, ?, ?)",
+                (key, text, model, created_at)
+            )
+        with self._lock:
+            self._remember(key, text, created_at)
+
+    def _remember(self, key, text, created_at):
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, key=None):
+        # Drop one entry, or everything when no key is given
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+            else:
+                self._memory.pop(key, None)
+        with self._connect() as conn:
+            if key is None:
+                conn.execute("DELETE FROM rationale")
+            else:
+                conn.execute("DELETE FROM rationale WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        if not self.ttl_seconds:
+            return 0
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM rationale WHERE created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_rationale_cache():
+    # One cache per server process; the SQLite file is shared across processes and restarts
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RationaleCache(
+                path=get_secret("RATIONALE_CACHE_PATH", ".cache/rationale_cache.sqlite3"),
+                max_entries=get_int_setting("RATIONALE_CACHE_SIZE", 256),
+                ttl_seconds=get_float_setting("RATIONALE_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+            )
+        return _cache
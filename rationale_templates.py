@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app_config import get_float_setting
+
+# IFRS13 materiality threshold: unobservable PV above 10% of trade PV -> Level 3
+OBSERVABILITY_THRESHOLD = 0.10
+
+
+def get_fast_path_margin():
+    # Distance (in % of trade PV) the unobservable share must keep from the threshold to skip GPT
+    return get_float_setting("RATIONALE_FAST_PATH_MARGIN", 5.0) / 100.0
+
+
+# --- Routing: template when model and risk factors agree and the case is far from the threshold ---
+def route_rationale(model_pred, trade_pv, unobservable_pv, margin=None, threshold=OBSERVABILITY_THRESHOLD):
+    margin = get_fast_path_margin() if margin is None else margin
+    share = unobservable_pv / trade_pv if trade_pv else 0.0
+    observability_level = "Level 3" if share > threshold else "Level 2"
+    if model_pred == observability_level and abs(share - threshold) >= margin:
+        return "template"
+    return "llm"
+
+
+def route_frame(df, prediction_column="Predicted IFRS13 Level", margin=None, threshold=OBSERVABILITY_THRESHOLD):
+    # Vectorized route_rationale over a batch; True where the template fast path applies
+    margin = get_fast_path_margin() if margin is None else margin
+    trade_pv = df["Trade PV"].to_numpy(dtype=float)
+    share = np.divide(df["Unobservable PV"].to_numpy(dtype=float), trade_pv,
+                      out=np.zeros(len(df)), where=trade_pv != 0)
+    observability_level = np.where(share > threshold, "Level 3", "Level 2")
+    agree = df[prediction_column].astype(object).to_numpy() == observability_level
+    return pd.Series(agree & (np.abs(share - threshold) >= margin), index=df.index)
+
+
+# --- Deterministic rationale, same layout as the GPT answer: bold level, justification, confidence line ---
+def template_rationale(model_pred, share, findings, threshold=OBSERVABILITY_THRESHOLD):
+    level = "Level 3" if share > threshold else "Level 2"
+    lines = [f"**{level}**", ""]
+    if findings:
+        lines.append("Unobservable risk factors identified by the observability tests:")
+        lines.extend(f"- {finding}" for finding in findings)
+    else:
+        lines.append("All IR delta and volatility risk factors are observable under the current grids.")
+    comparison = "above" if share > threshold else "within"
+    lines += [
+        "",
+        f"Unobservable PV is {share:.2%} of trade PV, {comparison} the {threshold:.0%} materiality threshold, "
+        f"and the model independently predicted {model_pred}.",
+        "",
+        f"Confidence: High - model prediction and risk factor observability agree and the unobservable share "
+        f"is {abs(share - threshold):.2%} away from the threshold."
+    ]
+    return "\n".join(lines)
+
+
+def rationale_from_reports(model_pred, ir_report, vol_report, trade_pv, ir_stress_pv, vol_stress_pv):
+    # Reports as stored by the risk factor workflow: one row per risk factor
+    findings = []
+    for report in (ir_report, vol_report):
+        report = report if isinstance(report, pd.DataFrame) else pd.DataFrame(report).T
+        for risk, row in report[~report["Observable"].astype(bool)].iterrows():
+            findings.append(
+                f"{risk}: base PV {float(row['Base PV']):,.2f}, stress factor {float(row['StressFactor']):g}, "
+                f"stressed PV {float(row['Stressed PV']):,.2f}"
+            )
+    share = (ir_stress_pv + vol_stress_pv) / trade_pv if trade_pv else 0.0
+    return template_rationale(model_pred, share, findings)
+
+
+def rationale_from_summaries(model_pred, ir_summary, vol_summary, trade_pv, unobservable_pv):
+    findings = [line.replace("⚠️", "").strip() for line in f"{ir_summary}\n{vol_summary}".splitlines() if line.strip()]
+    share = unobservable_pv / trade_pv if trade_pv else 0.0
+    return template_rationale(model_pred, share, findings)
+
+
+# --- Process-wide share of rationale requests served by the fast path ---
+class RoutingStats:
+    def __init__(self):
+        self.template = 0
+        self.llm = 0
+        self._lock = threading.Lock()
+
+    def record(self, route, count=1):
+        with self._lock:
+            if route == "template":
+                self.template += count
+            else:
+                self.llm += count
+
+    def fast_path_share(self):
+        total = self.template + self.llm
+        return self.template / total if total else 0.0
+
+
+routing_stats = RoutingStats()
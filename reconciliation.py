@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from app_config import get_secret
+from batch_inference import INPUT_COLUMNS, PREDICTION_COLUMN
+from grid_history import VALUATION_DATE
+
+# --- Model vs. risk factor observability: disagreement statistics and the review queue ---
+# A run's trades carry the model's predicted level and the stress test's Observability Level. Every
+# trade where the two differ goes to the review queue, ranked by the unobservable PV at stake, and
+# the disagreement counts are kept per product, currency and desk (a missing desk counts as "n/a").
+# Counts are partial sums per chunk, so a run reconciles chunk by chunk without holding its results.
+OBSERVABILITY_COLUMN = "Observability Level"
+DIMENSIONS = ["product_type", "currency", "trading_desk"]
+REVIEW_STATUSES = ["open", "model confirmed", "observability confirmed", "escalated"]
+# Trade fields kept with each queue item for the reviewer
+ITEM_FIELDS = ["trade_id", *INPUT_COLUMNS, VALUATION_DATE]
+# set_status() without a note leaves the item's note as it is
+KEEP_NOTE = object()
+
+
+def level_numbers(levels):
+    # "Level 3" -> 3; anything else (e.g. a failed prediction) -> NaN. Parsed once per distinct label
+    codes, labels = pd.factorize(pd.Series(levels).astype(str))
+    numbers = pd.to_numeric(pd.Series(labels).str.extract(r"(\d)\s*$", expand=False), errors="coerce").to_numpy()
+    return np.append(numbers, np.nan)[codes]
+
+
+def _column(df, col, default="n/a"):
+    # A missing column or a blank cell counts as `default`; astype(str) alone keeps blanks missing on
+    # pandas 3 (and groupby drops them) but turns them into "None" / "nan" on pandas 2
+    if col not in df.columns:
+        return pd.Series(default, index=df.index)
+    return df[col].astype(object).where(df[col].notna(), default).astype(str)
+
+
+class Reconciler:
+    # Accumulates one run: add() each chunk of results (predictions joined with observability)
+    def __init__(self):
+        self.trades = 0
+        self._counts = []
+        self._items = []
+
+    def add(self, chunk):
+        model = level_numbers(chunk[PREDICTION_COLUMN])
+        observed = level_numbers(chunk[OBSERVABILITY_COLUMN])
+        disagree = model != observed
+        unobservable_pv = chunk["Unobservable PV"].to_numpy(dtype=float)
+        flags = pd.DataFrame({
+            "trades": 1,
+            "disagreements": disagree.astype(int),
+            # The model put the trade at a lower level than its observability: under-reported Level 3 risk
+            "model_below": (disagree & (model < observed)).astype(int),
+            "pv_at_stake": np.where(disagree, unobservable_pv, 0.0),
+        }, index=chunk.index)
+        for dimension in DIMENSIONS:
+            counts = flags.groupby(_column(chunk, dimension).to_numpy()).sum()
+            self._counts.append(counts.rename_axis("value").reset_index().assign(dimension=dimension))
+
+        if disagree.any():
+            rows = chunk[disagree]
+            items = pd.DataFrame({
+                "row": self.trades + np.flatnonzero(disagree),
+                "product_type": _column(rows, "product_type").to_numpy(),
+                "currency": _column(rows, "currency").to_numpy(),
+                "trading_desk": _column(rows, "trading_desk").to_numpy(),
+                "model_level": rows[PREDICTION_COLUMN].astype(str).to_numpy(),
+                "observability_level": rows[OBSERVABILITY_COLUMN].astype(str).to_numpy(),
+                "unobservable_pv": unobservable_pv[disagree],
+                "trade_pv": rows["Trade PV"].to_numpy(dtype=float),
+                "trade": rows[[col for col in ITEM_FIELDS if col in rows.columns]].to_json(
+                    orient="records", lines=True, date_format="iso").splitlines(),
+            })
+            self._items.append(items)
+        self.trades += len(chunk)
+        return self
+
+    def stats(self, dimension=None):
+        # Disagreements per dimension value, worst PV at stake first
+        if not self._counts:
+            return pd.DataFrame(columns=["dimension", "value", "trades", "disagreements", "model_below", "pv_at_stake", "rate"])
+        stats = pd.concat(self._counts).groupby(["dimension", "value"], as_index=False).sum()
+        stats["rate"] = stats["disagreements"] / stats["trades"]
+        if dimension:
+            stats = stats[stats["dimension"] == dimension]
+        return stats.sort_values(["dimension", "pv_at_stake"], ascending=[True, False], ignore_index=True)
+
+    def summary(self):
+        # Run totals: every trade falls in exactly one product, so the product rows add up to the run
+        totals = self.stats(DIMENSIONS[0])[["disagreements", "model_below", "pv_at_stake"]].sum()
+        disagreements = int(totals["disagreements"])
+        return {
+            "trades": self.trades,
+            "disagreements": disagreements,
+            "disagreement_rate": round(disagreements / self.trades, 4) if self.trades else 0.0,
+            "model_below": int(totals["model_below"]),
+            "model_above": disagreements - int(totals["model_below"]),
+            "pv_at_stake": round(float(totals["pv_at_stake"]), 2),
+        }
+
+    def items(self):
+        # The disagreeing trades in review order: most unobservable PV first, ties in input order
+        if not self._items:
+            return pd.DataFrame(columns=["rank", "row", "product_type", "currency", "trading_desk", "model_level",
+                                         "observability_level", "unobservable_pv", "trade_pv", "trade"])
+        items = pd.concat(self._items, ignore_index=True)
+        order = np.lexsort((items["row"].to_numpy(), -items["unobservable_pv"].to_numpy()))
+        items = items.iloc[order].reset_index(drop=True)
+        items.insert(0, "rank", np.arange(1, len(items) + 1))
+        return items
+
+
+def reconcile(df):
+    # One-shot reconciliation of a frame already holding both levels
+    return Reconciler().add(df)
+
+
+# --- Persisted review queue: one SQLite file, paged by rank ---
+# Items are written once per run in rank order; reviewers only update status and note. Pages read
+# through the (run_id, rank) primary key, or the (run_id, status, rank) index when filtered by status.
+class ReviewQueue:
+    def __init__(self, path=".review/review_queue.sqlite3"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_runs (run_id TEXT PRIMARY KEY, source TEXT NOT NULL, "
+                "created_at REAL NOT NULL, summary TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_items (run_id TEXT NOT NULL, rank INTEGER NOT NULL, "
+                "row INTEGER NOT NULL, product_type TEXT, currency TEXT, trading_desk TEXT, "
+                "model_level TEXT, observability_level TEXT, unobservable_pv REAL, trade_pv REAL, "
+                "trade TEXT, status TEXT NOT NULL DEFAULT 'open', note TEXT, updated_at REAL, "
+                "PRIMARY KEY (run_id, rank)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS review_items_status ON review_items (run_id, status, rank)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_stats (run_id TEXT NOT NULL, dimension TEXT NOT NULL, "
+                "value TEXT NOT NULL, trades INTEGER, disagreements INTEGER, model_below INTEGER, pv_at_stake REAL, "
+                "PRIMARY KEY (run_id, dimension, value))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, reconciler, source):
+        run_id = uuid.uuid4().hex[:12]
+        items = reconciler.items()
+        stats = reconciler.stats()
+        with self._connect() as conn:
+            conn.execute("INSERT INTO review_runs VALUES (?, ?, ?, ?)",
+                         (run_id, source, time.time(), json.dumps(reconciler.summary())))
+            conn.executemany(
+                "INSERT INTO review_items (run_id, rank, row, product_type, currency, trading_desk, model_level, "
+                "observability_level, unobservable_pv, trade_pv, trade) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, *values) for values in items.itertuples(index=False, name=None))
+            )
+            conn.executemany(
+                "INSERT INTO review_stats VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, *values) for values in stats[
+                    ["dimension", "value", "trades", "disagreements", "model_below", "pv_at_stake"]
+                ].itertuples(index=False, name=None))
+            )
+        return run_id
+
+    def runs(self, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM review_runs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [{**dict(row), "summary": json.loads(row["summary"])} for row in rows]
+
+    def stats(self, run_id, dimension=None):
+        query, params = "SELECT * FROM review_stats WHERE run_id = ?", [run_id]
+        if dimension:
+            query, params = query + " AND dimension = ?", params + [dimension]
+        with self._connect() as conn:
+            stats = pd.read_sql_query(query + " ORDER BY dimension, pv_at_stake DESC", conn, params=params)
+        stats["rate"] = stats["disagreements"] / stats["trades"]
+        return stats.drop(columns="run_id")
+
+    def _where(self, run_id, filters):
+        # filters: {column: [values]} over status and the DIMENSIONS
+        clauses, params = ["run_id = ?"], [run_id]
+        for col, values in (filters or {}).items():
+            if values:
+                if col not in ["status", *DIMENSIONS]:
+                    raise ValueError(f"Cannot filter the review queue on {col!r}")
+                clauses.append(f"{col} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        return " AND ".join(clauses), params
+
+    def count(self, run_id, filters=None):
+        where, params = self._where(run_id, filters)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM review_items WHERE {where}", params).fetchone()[0]
+
+    def page(self, run_id, filters=None, after_rank=0, page_size=50):
+        # Keyset paging: the page after `after_rank`, so a deep page costs the same as the first
+        where, params = self._where(run_id, filters)
+        with self._connect() as conn:
+            page = pd.read_sql_query(
+                f"SELECT rank, row, product_type, currency, trading_desk, model_level, observability_level, "
+                f"unobservable_pv, trade_pv, status, note, trade FROM review_items "
+                f"WHERE {where} AND rank > ? ORDER BY rank LIMIT ?",
+                conn, params=params + [after_rank, page_size]
+            )
+        return page
+
+    def status_counts(self, run_id):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM review_items WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def set_status(self, run_id, ranks, status, note=KEEP_NOTE):
+        # Any note passed is stored as given ("" or None clears it); leave it out to keep the current one
+        if status not in REVIEW_STATUSES:
+            raise ValueError(f"Unknown review status {status!r}")
+        now = time.time()
+        with self._connect() as conn:
+            if note is KEEP_NOTE:
+                conn.executemany(
+                    "UPDATE review_items SET status = ?, updated_at = ? WHERE run_id = ? AND rank = ?",
+                    [(status, now, run_id, int(rank)) for rank in ranks]
+                )
+            else:
+                conn.executemany(
+                    "UPDATE review_items SET status = ?, note = ?, updated_at = ? WHERE run_id = ? AND rank = ?",
+                    [(status, note or None, now, run_id, int(rank)) for rank in ranks]
+                )
+
+
+_review_queue = None
+_review_lock = threading.Lock()
+
+
+def get_review_queue():
+    global _review_queue
+    with _review_lock:
+        if _review_queue is None:
+            _review_queue = ReviewQueue(get_secret("REVIEW_DB_PATH", ".review/review_queue.sqlite3"))
+        return _review_queue
@@ -0,0 +1,187 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+# --- Rolling latency window (seconds) ---
+class LatencyTracker:
+    def __init__(self, window=500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.hedged = 0
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            if not ok:
+                self.errors += 1
+
+    def record_hedge(self):
+        # Hedges fire from concurrent callers; counted under the same lock as the samples
+        with self._lock:
+            self.hedged += 1
+
+    def percentile(self, q):
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return None
+        return float(np.percentile(samples, q))
+
+    def __len__(self):
+        return len(self._samples)
+
+
+# --- Circuit breaker: closed -> open after N consecutive failures -> half-open trial after reset_timeout ---
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                self._trial_in_flight = False
+            if self.state == "half-open" and not self._trial_in_flight:
+                # Let exactly one probe through while the endpoint is on probation
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        # The probe was abandoned without an outcome; the next caller may probe instead
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half-open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+# --- Hedged request: fire a duplicate if the first call outlives hedge_delay, keep the first success ---
+# Each attempt runs in its own copy of the caller's context, so spans opened by fn join the caller's trace
+def hedged_call(fn, hedge_delay, pool, on_hedge=None):
+    primary = pool.submit(contextvars.copy_context().run, fn)
+    if hedge_delay is None:
+        return primary.result()
+    done, _ = wait([primary], timeout=hedge_delay)
+    if done:
+        return primary.result()
+
+    if on_hedge:
+        on_hedge()
+    pending = {primary, pool.submit(contextvars.copy_context().run, fn)}
+    first_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            first_error = first_error or future.exception()
+    raise first_error
+
+
+class ResilientEndpoint:
+    def __init__(self, name, hedge_percentile=95.0, min_samples=20, failure_threshold=5,
+                 reset_timeout=30.0, window=500, max_workers=16):
+        self.name = name
+        self.hedge_percentile = hedge_percentile if hedge_percentile and hedge_percentile > 0 else None
+        self.min_samples = min_samples
+        self.latency = LatencyTracker(window)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+
+    def hedge_delay(self):
+        # Only hedge once there is enough history to know what "slow" means
+        if self.hedge_percentile is None or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    @property
+    def hedged(self):
+        return self.latency.hedged
+
+    def ensure_available(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open; endpoint marked unhealthy")
+
+    def record_outcome(self, seconds, ok):
+        # Used directly by callers that cannot be hedged (e.g. streamed responses)
+        self.latency.record(seconds, ok=ok)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def record_abandoned(self):
+        # The caller walked away mid-call (e.g. a stream closed by a rerun): neither success nor failure
+        self.breaker.release_trial()
+
+    def call(self, fn, *args, **kwargs):
+        self.ensure_available()
+        start = time.perf_counter()
+        try:
+            result = hedged_call(lambda: fn(*args, **kwargs), self.hedge_delay(), self._pool, self.latency.record_hedge)
+        except Exception:
+            self.record_outcome(time.perf_counter() - start, ok=False)
+            raise
+        self.record_outcome(time.perf_counter() - start, ok=True)
+        return result
+
+    def metrics(self):
+        return {
+            "endpoint": self.name,
+            "circuit": self.breaker.state,
+            "calls": self.latency.count,
+            "errors": self.latency.errors,
+            "hedged": self.hedged,
+            "p50_s": self.latency.percentile(50),
+            "p99_s": self.latency.percentile(99),
+        }
+
+
+# --- Process-wide registry so every session shares one breaker and latency history per endpoint ---
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def get_endpoint(name, **settings):
+    with _endpoints_lock:
+        if name not in _endpoints:
+            _endpoints[name] = ResilientEndpoint(name, **settings)
+        return _endpoints[name]
+
+
+def all_endpoint_metrics():
+    with _endpoints_lock:
+        endpoints = list(_endpoints.values())
+    return [endpoint.metrics() for endpoint in endpoints]
@@ -0,0 +1,218 @@
+import copy
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from app_config import get_int_setting, get_float_setting
+
+
+# --- Artifact size and content address ---
+def artifact_bytes(value):
+    # Resident size estimate: deep memory usage for frames, pickled size for everything else
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def content_key(value):
+    if isinstance(value, pd.DataFrame):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        # Row hashes ignore labels and dtypes; add them so equal values under other columns stay distinct
+        digest.update(repr((list(value.columns), list(value.dtypes))).encode("utf-8"))
+        return digest.hexdigest()
+    return hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def frozen(value):
+    # The stored copy: one artifact serves every session holding it, so the store keeps its own
+    # copy, with a frame's arrays marked read-only
+    value = copy.deepcopy(value)
+    if isinstance(value, pd.DataFrame):
+        for block in value._mgr.blocks:
+            if isinstance(block.values, np.ndarray):
+                block.values.flags.writeable = False
+    return value
+
+
+def read_only(value):
+    # What a session gets back: frames as views that share the read-only arrays, anything else as a copy
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    return copy.deepcopy(value)
+
+
+# --- Shared content-addressed store: sessions hold handles, artifacts are stored once ---
+class ArtifactStore:
+    def __init__(self, global_budget_bytes=256 * 2**20, session_budget_bytes=16 * 2**20, idle_seconds=3600):
+        self.global_budget_bytes = global_budget_bytes
+        self.session_budget_bytes = session_budget_bytes
+        self.idle_seconds = idle_seconds
+        # content key -> [value, size, refcount]; order is global LRU (least recent first)
+        self._artifacts = OrderedDict()
+        # session id -> OrderedDict(name -> content key); order is that session's LRU
+        self._sessions = {}
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.stats = {"puts": 0, "dedup_hits": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+    def put(self, session_id, name, value):
+        key = content_key(value)
+        with self._lock:
+            self.stats["puts"] += 1
+            handles = self._sessions.setdefault(session_id, OrderedDict())
+            self._last_seen[session_id] = time.time()
+            if handles.get(name) == key:
+                self._touch(handles, name, key)
+                return key
+            entry = self._artifacts.get(key)
+            if entry is None:
+                size = artifact_bytes(value)
+                self._artifacts[key] = [frozen(value), size, 0]
+                self.resident_bytes += size
+            else:
+                self.stats["dedup_hits"] += 1
+            self._artifacts[key][2] += 1
+            self._release(handles, name)
+            handles[name] = key
+            self._touch(handles, name, key)
+            self._purge_idle()
+            self._enforce_session_budget(session_id, keep=name)
+            self._enforce_global_budget(keep=key)
+            return key
+
+    def get(self, session_id, name, default=None):
+        with self._lock:
+            self._last_seen[session_id] = time.time()
+            handles = self._sessions.get(session_id)
+            key = handles.get(name) if handles else None
+            if key is None:
+                self.stats["misses"] += 1
+                return default
+            self._touch(handles, name, key)
+            self.stats["hits"] += 1
+            value = self._artifacts[key][0]
+        return read_only(value)
+
+    def has(self, session_id, name):
+        with self._lock:
+            return name in self._sessions.get(session_id, ())
+
+    def drop(self, session_id, name):
+        with self._lock:
+            handles = self._sessions.get(session_id)
+            if handles:
+                self._release(handles, name)
+
+    def end_session(self, session_id):
+        with self._lock:
+            self._end_session(session_id)
+
+    def session_bytes(self, session_id):
+        with self._lock:
+            return self._session_bytes(session_id)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "resident_bytes": self.resident_bytes,
+                "artifacts": len(self._artifacts),
+                "handles": sum(len(h) for h in self._sessions.values()),
+                "sessions": len(self._sessions),
+                "global_budget_bytes": self.global_budget_bytes,
+                "session_budget_bytes": self.session_budget_bytes,
+                **self.stats
+            }
+
+    # Callers hold self._lock for everything below
+    def _touch(self, handles, name, key):
+        handles.move_to_end(name)
+        self._artifacts.move_to_end(key)
+
+    def _release(self, handles, name):
+        key = handles.pop(name, None)
+        if key is None:
+            return
+        entry = self._artifacts[key]
+        entry[2] -= 1
+        if entry[2] == 0:
+            self.resident_bytes -= entry[1]
+            del self._artifacts[key]
+
+    def _session_bytes(self, session_id):
+        # A shared artifact counts in full against every session holding it
+        return sum(self._artifacts[key][1] for key in self._sessions.get(session_id, {}).values())
+
+    def _end_session(self, session_id):
+        handles = self._sessions.pop(session_id, None)
+        self._last_seen.pop(session_id, None)
+        for name in list(handles or ()):
+            self._release(handles, name)
+
+    def _purge_idle(self):
+        # Streamlit gives no session-end hook; sessions unseen for idle_seconds release their handles
+        if not self.idle_seconds:
+            return
+        cutoff = time.time() - self.idle_seconds
+        for session_id in [s for s, seen in self._last_seen.items() if seen < cutoff]:
+            self._end_session(session_id)
+
+    def _enforce_session_budget(self, session_id, keep):
+        handles = self._sessions[session_id]
+        while self._session_bytes(session_id) > self.session_budget_bytes and len(handles) > 1:
+            name = next(n for n in handles if n != keep)
+            self._release(handles, name)
+            self.stats["evictions"] += 1
+
+    def _enforce_global_budget(self, keep):
+        while self.resident_bytes > self.global_budget_bytes and len(self._artifacts) > 1:
+            key = next(k for k in self._artifacts if k != keep)
+            # Evicting an artifact drops every handle to it
+            for handles in self._sessions.values():
+                for name in [n for n, k in handles.items() if k == key]:
+                    self._release(handles, name)
+            self.stats["evictions"] += 1
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    # One store per server process, shared by every session and page
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(
+                global_budget_bytes=get_int_setting("SESSION_STORE_BUDGET_MB", 256) * 2**20,
+                session_budget_bytes=get_int_setting("SESSION_STORE_SESSION_BUDGET_MB", 16) * 2**20,
+                idle_seconds=get_float_setting("SESSION_STORE_IDLE_SECONDS", 3600)
+            )
+        return _store
+
+
+# --- Session-facing helpers: st.session_state never holds the artifacts themselves ---
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "headless"
+
+
+def put_artifact(name, value):
+    return get_artifact_store().put(_session_id(), name, value)
+
+
+def get_artifact(name, default=None):
+    return get_artifact_store().get(_session_id(), name, default)
+
+
+def has_artifacts(*names):
+    store = get_artifact_store()
+    session_id = _session_id()
+    return all(store.has(session_id, name) for name in names)
@@ -0,0 +1,53 @@
+import streamlit as st
+
+import gpt_client
+import job_manager
+import ml_client
+import Observability_Stress_Module as stress
+
+# --- Process-wide resources shared by every session and page ---
+# st.cache_resource builds each object once per server process; reruns, sessions
+# and pages all receive the same instance instead of rebuilding it. The app and the
+# pages hand these to ml_client / gpt_client; headless callers (CLI, service, batch
+# jobs) use those modules' own per-process defaults.
+
+
+@st.cache_resource(show_spinner=False)
+def get_observability_grids():
+    # The grid tables the stress tests read, loaded once when the stress module is imported
+    # (process-pool workers and the CLI share that copy); treat as read-only
+    return {
+        "ir": stress.ir_grid,
+        "vol": stress.vol_grid,
+        "credit": stress.credit_grid,
+        "caplet": stress.caplet_grid,
+        "version": stress.GRID_VERSION,
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    # Keep-alive connection pool to the scoring endpoint
+    return ml_client.build_http_session()
+
+
+@st.cache_resource(show_spinner=False)
+def get_ml_dispatcher():
+    # Coalesced single-trade model calls from every session, sent through the shared session
+    return ml_client.create_dispatcher(session=get_http_session())
+
+
+@st.cache_resource(show_spinner=False)
+def _openai_client(api_key, azure_endpoint, timeout):
+    return gpt_client.build_openai_client(api_key, azure_endpoint, timeout)
+
+
+def get_openai_client():
+    # Keyed by the credentials, so rotated secrets get a new client on the next call
+    return _openai_client(*gpt_client.openai_settings())
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    # Built once per process; resumes any batch job a restart interrupted
+    return job_manager.create_job_manager()
@@ -1,3 +1,18 @@
 #!/bin/bash
-pip install -r requirements.txt
-streamlit run app.py --server.port=$PORT --server.enableCORS false
\ No newline at end of file
+# --- Dependencies: install only when the environment does not match requirements.txt ---
+# The stamp lives in site-packages, so a fresh environment always installs and a warm
+# container restart skips pip entirely. The CI build ships wheelhouse/ (every pinned wheel
+# resolved at build time), so the install itself runs offline from the lock.
+SITE_PACKAGES=$(python -c "import sysconfig; print(sysconfig.get_paths()['purelib'])")
+STAMP="$SITE_PACKAGES/.swaption_ui_requirements.sha256"
+REQUIREMENTS_HASH=$(cat requirements.txt wheelhouse/requirements.lock 2>/dev/null | sha256sum | cut -d' ' -f1)
+
+if [ "$(cat "$STAMP" 2>/dev/null)" != "$REQUIREMENTS_HASH" ]; then
+    if [ -f wheelhouse/requirements.lock ]; then
+        pip install --no-index --find-links wheelhouse -r wheelhouse/requirements.lock
+    else
+        pip install -r requirements.txt
+    fi && echo "$REQUIREMENTS_HASH" > "$STAMP"
+fi
+
+streamlit run app.py --server.port=$PORT --server.enableCORS false --server.fileWatcherType none --runner.postScriptGC false
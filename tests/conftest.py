@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import sys
+import tempfile
+from http.server import ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+
+# Flat top-level modules and grid CSVs are resolved from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# Caches, traces and logs go to a scratch directory, never the working tree
+_scratch = tempfile.mkdtemp(prefix="ifrs13-tests-")
+os.environ.setdefault("TRACE_DB_PATH", os.path.join(_scratch, "traces.sqlite3"))
+os.environ.setdefault("RATIONALE_CACHE_PATH", os.path.join(_scratch, "rationale_cache.sqlite3"))
+os.environ.setdefault("AUDIT_LOG_DIR", os.path.join(_scratch, "audit"))
+os.environ.setdefault("JOB_ROOT", os.path.join(_scratch, "jobs"))
+os.environ.setdefault("REVIEW_DB_PATH", os.path.join(_scratch, "review_queue.sqlite3"))
+
+
+@pytest.fixture
+def stub_server():
+    # Starts benchmarks.stubs on a free port with per-test latency/error settings; returns the base URL
+    from benchmarks.stubs import StubHandler
+
+    servers = []
+
+    class RecordingHandler(StubHandler):
+        # Keeps every request (path, JSON body) in `calls`, then answers as the stub does
+        def do_POST(self):
+            raw, rfile = self.rfile.read(int(self.headers.get("Content-Length", 0))), self.rfile
+            type(self).calls.append((self.path, json.loads(raw or b"{}")))
+            self.rfile = io.BytesIO(raw)
+            try:
+                super().do_POST()
+            finally:
+                self.rfile = rfile
+
+    def start(**settings):
+        handler = type("TestStubHandler", (RecordingHandler,), {"calls": [], **settings})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", handler
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def openai_stub(stub_server, monkeypatch):
+    # Fresh breaker / latency history per test, pointed at a local OpenAI-compatible stub
+    import gpt_client
+    import resilience
+
+    def start(**settings):
+        url, handler = stub_server(**{"openai_latency": 0.05, **settings})
+        monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", url)
+        monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("AZURE_OPENAI_MODEL", "stub-model")
+        monkeypatch.setattr(resilience, "_endpoints", {})
+        monkeypatch.setattr(gpt_client, "ttft_tracker", resilience.LatencyTracker())
+        return handler
+
+    return start
@@ -0,0 +1,153 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import Observability_Stress_Module as stress
+
+from audit_log import HEADER, AuditLog, replay, report_decision, trade_id_for
+from benchmarks.bench_classification_rules import make_mixed_book
+from classify_portfolio import classify_chunk
+from grid_history import RECORDED_AT, VALID_FROM, VALID_TO
+from Observability_Stress_Module import new_seed, run_full_observability_stress_test, simulate_trade
+
+SWAPTION = {"product_type": "IR Swaption", "currency": "EUR", "option_type": "Payer", "notional": 10_000_000,
+            "strike": 2.5, "expiry_tenor": 5, "maturity_tenor": 30}
+
+
+@pytest.fixture
+def log(tmp_path):
+    # No background flushes: the tests flush (or read, which flushes) themselves
+    return AuditLog(str(tmp_path), flush_seconds=3600)
+
+
+def records(count, ts=1_700_000_000.0):
+    return [{"trade_id": f"T{n % 2}", "ts": ts + n * 3600, "report": {"level": f"Level {2 + n % 2}"}, "n": n}
+            for n in range(count)]
+
+
+def test_append_then_read_back(log):
+    log.append_many(records(4))
+    assert log.find("T0") == records(4)[0::2]
+    assert [record["n"] for record in log.scan()] == [0, 1, 2, 3]
+    assert log.stats() == {"decisions": 4, "trades": 2, "log_bytes": os.path.getsize(log.log_path),
+                           "corrupt_records": 0}
+
+    # A second log over the same directory sees the same records
+    assert AuditLog(log.root, flush_seconds=3600).find("T1") == records(4)[1::2]
+
+
+def test_index_lookups_by_trade_and_time(log):
+    ts = 1_700_000_000.0
+    log.append_many(records(6, ts))
+    assert [r["n"] for r in log.find("T0", start=ts + 3600, end=ts + 4 * 3600)] == [2]
+    assert [r["n"] for r in log.find("T1", start=ts + 3600)] == [1, 3, 5]
+    assert log.as_of("T1", ts + 4 * 3600)["n"] == 3
+    assert log.as_of("T1", ts) is None
+    day = datetime.fromtimestamp(ts).date()
+    on_day = log.on_date("T0", day)
+    assert on_day[0]["n"] == 0
+    assert all(datetime.fromtimestamp(r["ts"]).date() == day for r in on_day)
+    assert log.find("missing") == []
+
+
+def test_recover_cuts_a_torn_last_record(log):
+    log.append_many(records(3))
+    log.flush()
+    good_size = os.path.getsize(log.log_path)
+    with open(log.log_path, "rb") as f:
+        first = f.read(HEADER.unpack(f.read(HEADER.size))[0] + HEADER.size)
+    # A crash halfway through writing a fourth record
+    with open(log.log_path, "ab") as f:
+        f.write(first[:len(first) // 2])
+
+    reopened = AuditLog(log.root, flush_seconds=3600)
+    assert os.path.getsize(log.log_path) == good_size
+    reopened.append({"trade_id": "T9", "ts": 1.0, "report": {"level": "Level 2"}})
+    assert [record["n"] for record in reopened.scan() if "n" in record] == [0, 1, 2]
+    assert reopened.find("T9")[0]["ts"] == 1.0
+
+
+def test_recover_indexes_records_written_but_not_indexed(log):
+    log.append_many(records(3))
+    log.flush()
+    os.remove(log.index_path)
+    reopened = AuditLog(log.root, flush_seconds=3600)
+    assert reopened.stats()["decisions"] == 3
+    assert reopened.find("T0") == records(3)[0::2]
+
+
+def test_corrupt_record_is_skipped_and_reported(log):
+    log.append_many(records(3))
+    log.flush()
+    size = os.path.getsize(log.log_path)
+    with open(log.log_path, "r+b") as f:
+        first = HEADER.size + HEADER.unpack(f.read(HEADER.size))[0]
+        # Flip a byte inside the second record's payload
+        f.seek(first + HEADER.size + 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    # An indexed record that was damaged later fails loudly on lookup
+    with pytest.raises(ValueError, match="corrupt"):
+        log.find("T1")
+
+    # Rebuilding the index skips it, counts it and keeps the records after it
+    os.remove(log.index_path)
+    reopened = AuditLog(log.root, flush_seconds=3600)
+    assert os.path.getsize(log.log_path) == size  # nothing after the bad record is cut off
+    assert [record["n"] for record in reopened.scan()] == [0, 2]
+    assert reopened.stats()["corrupt_records"] == 1 and reopened.stats()["decisions"] == 2
+    assert [record["n"] for record in reopened.find("T0")] == [0, 2]
+    assert reopened.find("T1") == []
+
+
+def test_replay_matches_a_single_trade_decision(log):
+    trade = dict(SWAPTION)
+    seed = new_seed()
+    greeks, trade["trade_pv"], generated_pvs = simulate_trade(trade, seed)
+    greeks.update(generated_pvs)
+    _, final_report, _ = run_full_observability_stress_test(trade, greeks)
+    log.append(report_decision(trade, greeks, final_report, model_pred="Level 2", seed=seed))
+
+    [record] = log.find(trade_id_for(trade))
+    result = replay(record)
+    assert result["matches"] and result["greeks_regenerated"] and result["grid_version_matches"]
+    assert result["level"] == record["report"]["level"]
+
+    # A changed report no longer matches
+    record["report"]["unobservable_pv"] += 100
+    assert not replay(record)["matches"]
+
+
+def test_replay_matches_batch_decisions(monkeypatch):
+    monkeypatch.setenv("AZURE_ML_ENDPOINT", "http://127.0.0.1:9/score")  # unreachable: rules fallback
+    book = make_mixed_book(60).assign(trade_id=[f"B{n}" for n in range(60)])
+    _, _, _, records = classify_chunk(book, "mixed", audit=True)
+    results = [replay(record) for record in records]
+    assert all(result["matches"] for result in results)
+    # Chunk seeds re-test the recorded greeks; they do not claim to redraw them
+    assert not any("greeks_regenerated" in result for result in results)
+
+
+def test_replay_uses_the_grids_known_when_the_decision_was_taken(tmp_path, monkeypatch):
+    # EUR.OIS became observable to 40y by a row recorded on 2024-07-01; before that no row covered it
+    pd.DataFrame([{"Curve ID": "EUR.OIS", "Observable Tenor (Years)": 40, "Stress Factor (%)": 0.9,
+                   VALID_FROM: None, VALID_TO: "2100-01-01", RECORDED_AT: "2024-07-01"}]
+                 ).to_csv(tmp_path / stress.IR_GRID_FILE, index=False)
+    monkeypatch.setattr(stress, "grid_histories", stress.load_grid_histories(str(tmp_path)))
+    monkeypatch.setenv("AZURE_ML_ENDPOINT", "http://127.0.0.1:9/score")
+
+    # Parsed dates as trade_schema loads them; the blank ones are NaT
+    book = pd.DataFrame([SWAPTION] * 4).assign(
+        trade_id=["K0", "K1", "K2", "K3"], valuation_date=pd.to_datetime(["2024-06-28", None, "2024-06-28", None])
+    )
+    _, _, _, records = classify_chunk(book, "mixed", audit=True, known_at="2024-06-30")
+    assert [record["grids_known_at"] for record in records] == ["2024-06-30"] * 4
+    assert [record["valuation_date"] for record in records] == ["2024-06-28 00:00:00", None] * 2
+    assert all(replay(record)["matches"] for record in records)
+
+    # Replayed against every recording the IR buckets turn observable, so the decision differs
+    unpinned = dict(records[0], grids_known_at=None)
+    assert not replay(unpinned)["matches"]
@@ -0,0 +1,142 @@
+import pandas as pd
+import pytest
+
+import batch_rationale
+from batch_rationale import RateBudget, estimate_tokens, generate_batch_rationale, get_rate_budget
+from benchmarks.stubs import RATIONALE
+from gpt_client import build_rationale_messages
+
+PREDICTION = "Predicted IFRS13 Level"
+
+
+class FakeClock:
+    # Stands in for the time module inside batch_rationale: sleeping advances the clock instantly,
+    # by at least a microsecond as a real sleep would
+    def __init__(self, on_sleep=None):
+        self.now = 1000.0
+        self.slept = 0.0
+        self.on_sleep = on_sleep
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        seconds = max(seconds, 1e-6)
+        self.now += seconds
+        self.slept += seconds
+        if self.on_sleep:
+            self.on_sleep()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(batch_rationale, "time", clock)
+    return clock
+
+
+def book(tag, groups, per_group=3, fast_path=0):
+    # `groups` signatures the model and observability disagree on (GPT), plus agreeing fast-path trades
+    rows = [
+        {"ir_summary": f"{tag} IR {g}", "vol_summary": f"{tag} vol {g}", PREDICTION: "Level 2",
+         "Trade PV": 1_000_000.0, "Unobservable PV": 500_000.0}
+        for g in range(groups) for _ in range(per_group)
+    ]
+    rows += [
+        {"ir_summary": f"{tag} observable", "vol_summary": f"{tag} observable", PREDICTION: "Level 2",
+         "Trade PV": 1_000_000.0, "Unobservable PV": 0.0}
+    ] * fast_path
+    return pd.DataFrame(rows, index=[f"T{n}" for n in range(len(rows))])
+
+
+def chat_calls(handler):
+    return [body for path, body in handler.calls if "/chat/completions" in path]
+
+
+def test_one_call_per_signature_and_result_on_every_trade(openai_stub, clock):
+    handler = openai_stub(openai_latency=0.0)
+    trades = book("dedup", groups=2, per_group=3, fast_path=2)
+    rationale, stats = generate_batch_rationale(trades)
+
+    calls = chat_calls(handler)
+    assert len(calls) == 2
+    assert sorted(call["messages"][1]["content"] for call in calls) == sorted(
+        build_rationale_messages(f"dedup IR {g}", f"dedup vol {g}", "Level 2")[1]["content"] for g in range(2)
+    )
+    assert list(rationale.index) == list(trades.index)
+    assert (rationale.iloc[:6] == RATIONALE).all()
+    assert rationale.iloc[6:].str.startswith("**Level 2**").all()
+    assert stats["unique_signatures"] == 2 and stats["fast_path_trades"] == 2 and stats["failed_signatures"] == 0
+
+    # A rerun is served from the rationale cache without calling the endpoint
+    assert generate_batch_rationale(trades)[0].equals(rationale)
+    assert len(chat_calls(handler)) == 2
+
+
+@pytest.mark.parametrize("limit", ["requests", "tokens"])
+def test_rate_budget_spaces_calls_to_the_per_minute_limits(openai_stub, clock, limit):
+    handler = openai_stub(openai_latency=0.0)
+    trades = book(f"throttle {limit}", groups=3, per_group=1)
+    messages = build_rationale_messages(f"throttle {limit} IR 0", f"throttle {limit} vol 0", "Level 2")
+    # Room for one call per minute, by request count or by estimated tokens
+    budget = {"requests_per_minute": 1, "tokens_per_minute": 10**6} if limit == "requests" else \
+        {"requests_per_minute": 1000, "tokens_per_minute": estimate_tokens(messages)}
+    # One worker, so the waits happen one after another on the fake clock
+    rationale, stats = generate_batch_rationale(trades, max_workers=1, **budget)
+
+    assert len(chat_calls(handler)) == 3
+    assert (rationale == RATIONALE).all()
+    # The first call spends the full bucket; each of the other two waits for a minute of refill
+    assert clock.slept == pytest.approx(120, abs=0.01)
+    assert stats["elapsed_s"] == pytest.approx(120, abs=0.01)
+
+
+def test_concurrent_batches_draw_on_a_shared_budget(openai_stub, clock):
+    handler = openai_stub(openai_latency=0.0)
+    assert get_rate_budget() is get_rate_budget()
+
+    # Two requests of one signature each: the second waits for the minute the first one spent
+    budget = RateBudget(requests_per_minute=1, tokens_per_minute=10**6)
+    generate_batch_rationale(book("shared first", groups=1, per_group=1), budget=budget)
+    generate_batch_rationale(book("shared second", groups=1, per_group=1), budget=budget)
+    assert len(chat_calls(handler)) == 2
+    assert clock.slept == pytest.approx(60, abs=0.01)
+
+    # Without a shared budget each batch starts with a full allowance of its own
+    clock.slept = 0.0
+    generate_batch_rationale(book("own first", groups=1, per_group=1), requests_per_minute=1)
+    generate_batch_rationale(book("own second", groups=1, per_group=1), requests_per_minute=1)
+    assert clock.slept == 0.0
+
+
+def test_failed_calls_are_retried_with_backoff(openai_stub, clock):
+    handler = openai_stub(openai_latency=0.0, openai_error_rate=1.0)
+
+    def recover():
+        handler.openai_error_rate = 0.0
+
+    # The endpoint recovers during the first backoff
+    clock.on_sleep = recover
+    trades = book("retry", groups=1, per_group=2)
+    rationale, stats = generate_batch_rationale(trades, max_retries=2)
+
+    assert len(chat_calls(handler)) == 2
+    assert 1.0 <= clock.slept < 2.0
+    assert (rationale == RATIONALE).all()
+    assert stats["failed_signatures"] == 0
+
+
+def test_exhausted_retries_are_counted_and_reported_per_trade(openai_stub, clock):
+    handler = openai_stub(openai_latency=0.0, openai_error_rate=1.0)
+    trades = book("exhausted", groups=1, per_group=3, fast_path=1)
+    rationale, stats = generate_batch_rationale(trades, max_retries=2)
+
+    # The first attempt and two retries, with 1s and 2s base backoff in between
+    assert len(chat_calls(handler)) == 3
+    assert clock.slept >= 3.0
+    assert stats["failed_signatures"] == 1 and stats["unique_signatures"] == 1
+    assert rationale.iloc[:3].str.startswith("Rationale generation failed:").all()
+    assert rationale.iloc[3].startswith("**Level 2**")
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_classification_rules import make_mixed_book, scalar_reference
+from classification_rules import UNKNOWN_LEVEL, classify_frame, classify_trade, compile_rules
+
+
+def test_frame_matches_the_scalar_rules_row_by_row():
+    book = make_mixed_book(2000)
+    levels = classify_frame(book)
+
+    assert list(levels) == list(book.apply(scalar_reference, axis=1))
+    assert list(levels[:200]) == [classify_trade(trade) for trade in book.head(200).to_dict(orient="records")]
+    assert set(levels) <= {"Level 1", "Level 2", "Level 3"}
+
+
+def test_first_matching_rule_wins_then_the_default():
+    trades = pd.DataFrame([
+        {"product_type": "IR Swaption", "expiry_tenor": 2, "maturity_tenor": 10, "strike": 2.5},
+        {"product_type": "IR Swaption", "expiry_tenor": 2, "maturity_tenor": 10, "strike": 3.0},
+        {"product_type": "CapFloor", "expiry_tenor": 3, "maturity_tenor": 10, "strike": 4.9},
+        {"product_type": "IRSwap", "expiry_tenor": 10, "maturity_tenor": 30, "strike": 2.5},
+        {"product_type": "Equity Option", "expiry_tenor": 1, "maturity_tenor": 1, "strike": 1.0},
+    ])
+    assert list(classify_frame(trades)) == ["Level 2", "Level 3", "Level 2", "Level 2", UNKNOWN_LEVEL]
+
+
+def test_missing_and_unparseable_columns_fail_the_condition():
+    # No rating column: bonds keep their default; a text strike never satisfies "<"
+    trades = pd.DataFrame([
+        {"product_type": "Bond", "expiry_tenor": 0, "maturity_tenor": 5, "strike": 0.0},
+        {"product_type": "IR Swaption", "expiry_tenor": 2, "maturity_tenor": 10, "strike": "n/a"},
+    ])
+    assert list(classify_frame(trades)) == ["Level 1", "Level 3"]
+    rated = trades.assign(rating=["B", None])
+    assert classify_frame(rated)[0] == "Level 2"
+
+
+def test_custom_rule_table_and_empty_table():
+    rules = compile_rules({"IRSwap": {"default": "Level 2", "rules": [
+        {"level": "Level 3", "when": [("currency", "in", ["JPY"]), ("notional", ">=", 1e8)]},
+    ]}})
+    trades = pd.DataFrame({"product_type": ["IRSwap"] * 3, "currency": ["JPY", "JPY", "EUR"],
+                           "notional": [1e8, 1e7, 1e9]})
+    assert list(classify_frame(trades, rules)) == ["Level 3", "Level 2", "Level 2"]
+    assert (classify_frame(trades, []) == np.full(3, UNKNOWN_LEVEL, dtype=object)).all()
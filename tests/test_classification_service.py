@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+from starlette.testclient import TestClient
+
+from benchmarks.bench_classification_rules import make_mixed_book
+from classification_service import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    # One spawned stress worker for the whole module; model calls fall back to the rules
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SERVICE_WORKERS", "1")
+        mp.setenv("AZURE_ML_ENDPOINT", "http://127.0.0.1:9/score")
+        with TestClient(app) as client:
+            yield client
+
+
+def trades(rows):
+    book = make_mixed_book(rows)
+    return book.assign(trade_id=[f"T{n}" for n in range(rows)]).to_dict(orient="records")
+
+
+def test_batch_lines_come_back_in_input_order(client):
+    book = trades(40)
+    book[3]["comment"] = "checked"  # the other trades have no comment: NaN in the frame, null on the wire
+    response = client.post("/classify/batch", params={"chunk_size": 3}, json={"trades": book})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line, parse_constant=pytest.fail) for line in response.text.splitlines()]
+    assert [line["trade_id"] for line in lines] == [trade["trade_id"] for trade in book]
+    assert lines[3]["comment"] == "checked" and lines[0]["comment"] is None
+    assert all(line["predicted_level"].startswith("Level") for line in lines)
+
+
+def test_single_trade(client):
+    trade = trades(1)[0]
+    response = client.post("/classify", json={**trade, "valuation_date": "2024-03-28"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["trade_id"] == trade["trade_id"] and body["valuation_date"] == "2024-03-28"
+    assert body["observability_level"].startswith("Level")
+
+
+def test_invalid_trades_are_rejected_with_their_errors(client):
+    book = trades(3)
+    book[1]["currency"] = "XYZ"
+    book[2]["maturity_tenor"] = "ten"
+    response = client.post("/classify/batch", json=book)
+    assert response.status_code == 422
+    body = response.json()
+    assert body["error"] == "2 of 3 trades failed validation"
+    assert [(error["row"], error["column"], error["value"]) for error in body["errors"]] == [
+        (2, "currency", "XYZ"), (3, "maturity_tenor", "ten")
+    ]
+
+    response = client.post("/classify", json={**book[0], "notional": -1})
+    assert response.status_code == 422
+    assert response.json()["errors"][0]["column"] == "notional"
+
+
+@pytest.mark.parametrize("request_args", [
+    {"params": {"chunk_size": "ten"}, "json": {"trades": trades(2)}},
+    {"json": {"trades": [{"product_type": "Bond"}]}},
+    {"json": {"trades": "T1"}},
+    {"content": b"not json"},
+])
+def test_malformed_batch_requests_are_unprocessable(client, request_args):
+    response = client.post("/classify/batch", **request_args)
+    assert response.status_code == 422
+    assert response.json()["error"]
+
+
+def test_export_is_served_from_the_job_directory(client):
+    exports = os.path.join(os.environ["JOB_ROOT"], "0123456789ab", "exports")
+    os.makedirs(exports, exist_ok=True)
+    content = b"trade_id,level\n" + b"T1,Level 2\n" * 50_000
+    with open(os.path.join(exports, "abcdef012345.csv"), "wb") as f:
+        f.write(content)
+
+    response = client.get("/exports/0123456789ab/abcdef012345.csv", params={"filename": "results.csv"})
+    assert response.status_code == 200
+    assert response.content == content
+    assert 'filename="results.csv"' in response.headers["content-disposition"]
+
+
+@pytest.mark.parametrize("path", [
+    "/exports/0123456789ab/000000000000.csv",  # not prepared
+    "/exports/0123456789ab/abcdef012345.txt",  # not an export format
+    "/exports/..%2F..%2Fetc/passwd",
+    "/exports/jobs.sqlite3/abcdef012345.csv",
+])
+def test_unknown_or_malformed_exports_are_not_found(client, path):
+    assert client.get(path).status_code == 404
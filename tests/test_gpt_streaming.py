@@ -0,0 +1,56 @@
+import pytest
+
+import gpt_client
+from benchmarks.stubs import RATIONALE
+from gpt_client import get_cached_completion, get_openai_endpoint, stream_chat_completion
+
+STREAMED = "".join(word + " " for word in RATIONALE.split(" "))
+
+
+def messages(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_stream_yields_deltas_then_caches_the_text(openai_stub):
+    handler = openai_stub()
+    prompt = messages("stream and cache")
+    deltas = list(stream_chat_completion(prompt))
+
+    assert len(deltas) == len(RATIONALE.split(" "))
+    assert "".join(deltas) == STREAMED
+    assert get_cached_completion(prompt) == STREAMED
+    assert len(gpt_client.ttft_tracker) == 1
+    assert gpt_client.ttft_tracker.percentile(50) >= 0.05
+    assert get_openai_endpoint().breaker.state == "closed"
+
+    # The second request is served from the cache in one piece, without calling the endpoint
+    assert list(stream_chat_completion(prompt)) == [STREAMED]
+    assert len(handler.calls) == 1
+
+
+def test_stream_error_counts_as_failure(openai_stub):
+    openai_stub(openai_error_rate=1.0)
+    with pytest.raises(Exception):
+        list(stream_chat_completion(messages("failing stream"), use_cache=False))
+    endpoint = get_openai_endpoint()
+    assert endpoint.latency.errors == 1
+    assert len(gpt_client.ttft_tracker) == 0
+
+
+def test_abandoned_stream_releases_the_half_open_probe(openai_stub):
+    openai_stub()
+    endpoint = get_openai_endpoint()
+    for _ in range(endpoint.breaker.failure_threshold):
+        endpoint.breaker.record_failure()
+    endpoint.breaker.reset_timeout = 0.0
+
+    # The probe is abandoned after its first delta, as a rerun mid-stream does
+    stream = stream_chat_completion(messages("abandoned probe"), use_cache=False)
+    next(stream)
+    stream.close()
+    assert endpoint.breaker.state == "half-open"
+    assert endpoint.latency.count == 0
+
+    # The next request may probe, and its success closes the circuit
+    assert "".join(stream_chat_completion(messages("second probe"), use_cache=False)) == STREAMED
+    assert endpoint.breaker.state == "closed"
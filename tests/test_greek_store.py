@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_classification_rules import make_mixed_book
+from greek_store import GreekStore, stress_store
+from Observability_Stress_Module import run_observability_for_frame
+
+
+def book(rows, dated=False):
+    trades = make_mixed_book(rows)
+    if dated:
+        dates = pd.Series(pd.to_datetime("2024-01-31") + pd.to_timedelta(np.arange(rows) % 400, unit="D"))
+        trades["valuation_date"] = dates.where(np.arange(rows) % 7 != 0)  # every 7th trade undated: today
+    return trades
+
+
+def store_from_detail(path, trades, detail, chunk_size):
+    # The greeks and PVs a direct run drew, appended chunk by chunk in the store's factor layout
+    store = GreekStore(path)
+    greeks = np.zeros((len(trades), len(store.factors)))
+    pvs = np.zeros_like(greeks)
+    for row, (trade_greeks, risk_pvs) in enumerate(zip(detail["greeks"], detail["risk_pvs"])):
+        for name, value in trade_greeks.items():
+            greeks[row, store.factor_index[name]] = value
+            pvs[row, store.factor_index[name]] = risk_pvs[f"{name} PV"]
+    for lo in range(0, len(trades), chunk_size):
+        store.append(trades.iloc[lo:lo + chunk_size], greeks[lo:lo + chunk_size], pvs[lo:lo + chunk_size])
+    return store, greeks, pvs
+
+
+def test_window_reads_back_what_was_appended(tmp_path):
+    trades = book(250, dated=True)
+    detail = run_observability_for_frame(trades, detail=True)
+    store, greeks, pvs = store_from_detail(str(tmp_path), trades, detail, chunk_size=100)
+    assert store.rows == 250 and GreekStore(str(tmp_path)).rows == 250
+
+    window, window_greeks, window_pvs = store.window(90, 210)
+    expected = trades.iloc[90:210].reset_index(drop=True)
+    for col in ["product_type", "currency", "expiry_tenor", "maturity_tenor"]:
+        assert list(window[col]) == list(expected[col])
+    assert window["valuation_date"].isna().tolist() == expected["valuation_date"].isna().tolist()
+    assert (window_greeks == greeks[90:210]).all() and (window_pvs == pvs[90:210]).all()
+
+
+def test_a_store_is_either_dated_or_not(tmp_path):
+    store = GreekStore(str(tmp_path))
+    store.append_simulated(book(20))
+    with pytest.raises(ValueError):
+        store.append_simulated(book(20, dated=True))
+    assert store.rows == 20
+
+
+@pytest.mark.parametrize("dated, known_at", [(False, None), (True, None), (True, "2024-06-30")])
+def test_streamed_stress_matches_a_direct_run(tmp_path, dated, known_at):
+    trades = book(900, dated)
+    detail = run_observability_for_frame(trades, detail=True, known_at=known_at)
+    store, _, _ = store_from_detail(str(tmp_path), trades, detail, chunk_size=400)
+
+    # Small windows over several workers: the merged result columns cover every row once
+    report = stress_store(str(tmp_path), window=128, workers=2, known_at=known_at, log=lambda msg: None)
+    results = store.results()
+    assert report["trades"] == 900 and 0 < report["level3_trades"] < 900
+    assert report["level3_trades"] == int((detail["Observability Level"] == "Level 3").sum())
+    assert np.allclose(results["Trade PV"], detail["Trade PV"].to_numpy())
+    assert np.allclose(results["Unobservable PV"], detail["Unobservable PV"].to_numpy())
+    assert list(results["Observability Level"]) == list(detail["Observability Level"])
+    assert [sorted(names) for names in results["unobservable"]] == [sorted(names) for names in detail["unobservable"]]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from grid_history import RECORDED_AT, VALID_FROM, VALID_TO, GridHistory, dated_rows, valuation_dates
+
+TENOR = "Observable Tenor (Years)"
+LIVE = pd.DataFrame({"Curve ID": ["A", "B"], TENOR: [10, 10], "Stress Factor": [1.0, 2.0]})
+HISTORY = pd.DataFrame([
+    # A until 2024: 5y, corrected for the second half of 2023 by a later recording
+    {"Curve ID": "A", TENOR: 5, "Stress Factor": 3.0, VALID_FROM: None, VALID_TO: "2024-01-01", RECORDED_AT: "2023-01-01"},
+    {"Curve ID": "A", TENOR: 7, "Stress Factor": 4.0, VALID_FROM: "2023-06-01", VALID_TO: "2024-01-01",
+     RECORDED_AT: "2024-03-01"},
+    # B only has a dated row for the first half of 2025; before it no row covers B
+    {"Curve ID": "B", TENOR: 20, "Stress Factor": 5.0, VALID_FROM: "2025-01-01", VALID_TO: "2025-07-01", RECORDED_AT: None},
+])
+
+
+@pytest.fixture
+def history():
+    return GridHistory(dated_rows(LIVE, HISTORY, ["Curve ID"]), "Curve ID")
+
+
+def tenors(grid, keys, dates):
+    # Observable tenor of the first row in force per trade, None when no row covers it
+    ids = grid.lookup(np.array(keys, dtype=object), pd.to_datetime(dates))
+    tenor = grid.rows[TENOR].to_numpy()
+    return [None if i < 0 else int(tenor[grid.first[i]]) for i in ids]
+
+
+def test_each_date_falls_in_its_interval(history):
+    grid = history.as_of()
+    keys = ["A", "A", "A", "A", "B", "B", "C"]
+    dates = ["2020-05-05", "2023-06-01", "2023-12-31", "2024-01-01", "2025-03-01", "2025-07-01", "2024-01-01"]
+    assert tenors(grid, keys, dates) == [5, 7, 7, 10, 20, 10, None]
+
+
+def test_lookups_as_known_at_an_earlier_time_ignore_later_corrections(history):
+    keys, dates = ["A", "A"], ["2023-03-01", "2023-09-01"]
+    assert tenors(history.as_of("2024-02-01"), keys, dates) == [5, 5]
+    assert tenors(history.as_of("2024-03-01"), keys, dates) == [5, 7]
+    assert tenors(history.as_of(), keys, dates) == [5, 7]
+    assert history.as_of("2024-02-01") is history.as_of(pd.Timestamp("2024-02-01"))
+
+
+def test_uncovered_dates_stress_like_a_missing_key(history):
+    # The live B row only applies after B's last dated row; before 2025 nothing covers B
+    grid = history.as_of()
+    ids = grid.lookup(np.array(["B", "B", "C"], dtype=object), pd.to_datetime(["2024-06-01", "2026-01-01", "2026-01-01"]))
+    assert ids[0] == -1 and ids[2] == -1
+    assert grid.factors[ids].tolist() == [1.0, 2.0, 1.0]
+
+
+def test_trades_without_a_date_use_today():
+    trades = pd.DataFrame({"valuation_date": ["2024-03-28", None, "not a date"]})
+    today = pd.Timestamp.today().normalize()
+    assert list(valuation_dates(trades)) == [pd.Timestamp("2024-03-28"), today, today]
+    assert list(valuation_dates(pd.DataFrame(index=range(2)))) == [today, today]
@@ -0,0 +1,66 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_classification_rules import make_mixed_book
+from job_manager import FACET_COLUMNS, JobManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("AZURE_ML_ENDPOINT", "http://127.0.0.1:9/score")  # unreachable: rules fallback
+    return JobManager(root=str(tmp_path), max_workers=1, chunk_size=100, facet_cache_jobs=2)
+
+
+def run_job(manager, rows=250):
+    job_id = manager.submit(make_mixed_book(rows), "mixed")
+    deadline = time.time() + 60
+    while manager.status(job_id)["status"] not in ("done", "failed"):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    assert manager.status(job_id)["status"] == "done"
+    return job_id
+
+
+def test_export_with_no_matching_rows(manager):
+    job_id = run_job(manager)
+    for fmt in ("csv", "parquet"):
+        path = manager.export(job_id, {"currency": ["CHF"]}, fmt)
+        df = pd.read_csv(path) if fmt == "csv" else pd.read_parquet(path)
+        assert df.empty
+
+
+def test_export_of_a_job_without_finished_chunks(manager):
+    job_id = run_job(manager)
+    for chunk_no in manager._done_chunks(job_id):
+        os.remove(manager._chunk_path(job_id, chunk_no))
+    assert pd.read_parquet(manager.export(job_id, None, "parquet")).empty
+
+
+def test_facet_cache_keeps_the_most_recent_jobs(manager):
+    jobs = [run_job(manager, rows=150) for _ in range(3)]
+    for job_id in jobs:
+        manager.result_facets(job_id)
+    assert list(manager._facets) == jobs[1:]
+    # An evicted job is rebuilt from its facet files on the next read
+    assert manager.result_facets(jobs[0])["count"].sum() == 150
+    assert list(manager._facets) == [jobs[2], jobs[0]]
+
+
+def test_viewer_of_a_job_without_finished_chunks(manager):
+    job_id = run_job(manager)
+    for chunk_no in manager._done_chunks(job_id):
+        os.remove(manager._chunk_path(job_id, chunk_no))
+    assert manager.result_facets(job_id).empty
+    assert manager.facet_values(job_id) == {col: [] for col in FACET_COLUMNS}
+    page, matches = manager.read_page(job_id, {"currency": ["EUR"]})
+    assert page.empty and matches == 0
+
+
+def test_results_can_be_read_one_chunk_at_a_time(manager):
+    job_id = run_job(manager)
+    chunks = list(manager.iter_results(job_id))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    pd.testing.assert_frame_equal(pd.concat(chunks), manager.load_results(job_id))
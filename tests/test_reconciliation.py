@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_inference import PREDICTION_COLUMN
+from reconciliation import OBSERVABILITY_COLUMN, Reconciler, ReviewQueue, reconcile
+
+
+def results(rows, seed=0):
+    # A classified run: model and observability levels, PVs, and a desk on most trades
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "trade_id": [f"T{n}" for n in range(rows)],
+        "product_type": rng.choice(["IR Swaption", "Bond", "CapFloor"], rows),
+        "currency": rng.choice(["EUR", "USD"], rows),
+        "trading_desk": rng.choice(["Rates", "Credit", None], rows, p=[0.5, 0.4, 0.1]),
+        PREDICTION_COLUMN: rng.choice(["Level 2", "Level 3"], rows),
+        OBSERVABILITY_COLUMN: rng.choice(["Level 2", "Level 3"], rows),
+        "Unobservable PV": rng.choice([0.0, 1000.0, 2500.0, 4000.0], rows),
+        "Trade PV": 10_000.0,
+    })
+
+
+def test_counts_match_the_run_whatever_the_chunking():
+    run = results(1000)
+    whole = reconcile(run)
+    chunked = Reconciler()
+    for lo in range(0, len(run), 137):
+        chunked.add(run.iloc[lo:lo + 137])
+
+    disagree = run[PREDICTION_COLUMN] != run[OBSERVABILITY_COLUMN]
+    below = disagree & (run[PREDICTION_COLUMN] < run[OBSERVABILITY_COLUMN])
+    assert chunked.summary() == whole.summary() == {
+        "trades": 1000,
+        "disagreements": int(disagree.sum()),
+        "disagreement_rate": round(disagree.mean(), 4),
+        "model_below": int(below.sum()),
+        "model_above": int((disagree & ~below).sum()),
+        "pv_at_stake": round(float(run.loc[disagree, "Unobservable PV"].sum()), 2),
+    }
+    pd.testing.assert_frame_equal(chunked.stats(), whole.stats())
+    pd.testing.assert_frame_equal(chunked.items(), whole.items())
+
+    desks = chunked.stats("trading_desk").set_index("value")
+    # Trades without a desk are counted under "n/a", not dropped
+    assert desks["trades"].sum() == 1000
+    assert desks.loc["n/a", "trades"] == run["trading_desk"].isna().sum() > 0
+    assert desks.loc["Rates", "disagreements"] == int(disagree[run["trading_desk"] == "Rates"].sum())
+
+
+def test_items_rank_by_pv_at_stake_then_input_order():
+    run = results(300)
+    items = reconcile(run).items()
+    disagree = np.flatnonzero(run[PREDICTION_COLUMN] != run[OBSERVABILITY_COLUMN])
+    assert sorted(items["row"]) == list(disagree)
+    assert list(items["rank"]) == list(range(1, len(items) + 1))
+    expected = sorted(disagree, key=lambda row: (-run["Unobservable PV"].iloc[row], row))
+    assert list(items["row"]) == expected
+    assert items["trade"].iloc[0].startswith('{"trade_id":"T')
+
+
+def test_unparseable_levels_count_as_disagreements():
+    run = results(4).assign(**{PREDICTION_COLUMN: ["Level 2", "error", "Level 3", "Level 3"],
+                               OBSERVABILITY_COLUMN: ["Level 2", "Level 2", "Level 2", "Level 3"]})
+    assert reconcile(run).summary()["disagreements"] == 2
+    assert reconcile(run.iloc[:0]).summary()["trades"] == 0
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ReviewQueue(str(tmp_path / "queue.sqlite3"))
+
+
+def test_keyset_pages_cover_the_queue_once(queue):
+    reconciler = reconcile(results(2000))
+    run_id = queue.save(reconciler, source="test")
+    items = reconciler.items()
+    assert queue.count(run_id) == len(items)
+    assert queue.runs()[0]["summary"] == reconciler.summary()
+
+    pages, after = [], 0
+    while True:
+        page = queue.page(run_id, after_rank=after, page_size=64)
+        if page.empty:
+            break
+        pages.append(page)
+        after = int(page["rank"].iloc[-1])
+    paged = pd.concat(pages, ignore_index=True)
+    assert list(paged["rank"]) == list(items["rank"])
+    assert list(paged["row"]) == list(items["row"])
+    assert (paged["status"] == "open").all()
+
+    # Filtered pages follow rank order within the filter
+    eur = queue.page(run_id, {"currency": ["EUR"]}, after_rank=0, page_size=10**6)
+    assert list(eur["rank"]) == list(items.loc[items["currency"] == "EUR", "rank"])
+    assert queue.count(run_id, {"currency": ["EUR"]}) == len(eur)
+    with pytest.raises(ValueError):
+        queue.page(run_id, {"trade": ["x"]})
+
+
+def test_status_and_note_updates(queue):
+    run_id = queue.save(reconcile(results(200)), source="test")
+    queue.set_status(run_id, [1, 2], "escalated", "check the vol grid")
+    queue.set_status(run_id, [1], "model confirmed")
+    note = lambda rank: queue.page(run_id, after_rank=rank - 1, page_size=1)["note"].iloc[0]
+    assert note(1) == "check the vol grid" and note(2) == "check the vol grid"
+
+    # A note can be cleared, not only replaced
+    queue.set_status(run_id, [1], "model confirmed", "")
+    queue.set_status(run_id, [2], "escalated", None)
+    assert note(1) is None and note(2) is None
+    assert queue.status_counts(run_id)["model confirmed"] == 1
+    assert queue.count(run_id, {"status": ["escalated"]}) == 1
+    with pytest.raises(ValueError):
+        queue.set_status(run_id, [1], "closed")
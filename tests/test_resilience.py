@@ -0,0 +1,127 @@
+import time
+
+import pandas as pd
+import pytest
+
+import resilience
+from batch_inference import predict_mixed_frame
+from classification_rules import classify_frame
+from ml_client import MicroBatchDispatcher, get_ml_endpoint, predict_batch
+from resilience import CircuitOpenError
+from tracing import get_span_recorder, span
+
+TRADES = pd.DataFrame({
+    "product_type": ["IR Swaption", "IR Swaption", "Bond"],
+    "currency": ["EUR", "USD", "EUR"],
+    "option_type": ["Payer", "Receiver", "N/A"],
+    "notional": [10_000_000, 5_000_000, 1_000_000],
+    "strike": [2.5, 3.0, 0.0],
+    "expiry_tenor": [1, 5, 0],
+    "maturity_tenor": [5, 20, 10],
+})
+SWAPTIONS = TRADES[TRADES["product_type"] == "IR Swaption"].to_dict(orient="records")
+
+
+@pytest.fixture
+def ml_stub(stub_server, monkeypatch):
+    # Fresh breaker / latency history per test, pointed at a local scoring stub
+    def start(**settings):
+        url, handler = stub_server(**settings)
+        monkeypatch.setenv("AZURE_ML_ENDPOINT", url + "/score")
+        monkeypatch.setenv("ML_BREAKER_FAILURES", "2")
+        monkeypatch.setenv("ML_BREAKER_RESET_SECONDS", "0.2")
+        monkeypatch.setattr(resilience, "_endpoints", {})
+        return handler
+
+    return start
+
+
+def test_hedges_once_a_call_outlives_the_latency_percentile(ml_stub):
+    handler = ml_stub(ml_latency=0.01)
+    endpoint = get_ml_endpoint()
+    # No hedging until there is enough history to know what "slow" means
+    for _ in range(endpoint.min_samples):
+        assert predict_batch(SWAPTIONS) == ["Level 2", "Level 3"]
+    assert endpoint.hedged == 0
+    assert len(handler.calls) == endpoint.min_samples
+
+    # A call slower than the p95 of that history gets a duplicate request; the first answer wins
+    handler.ml_latency = 0.2
+    assert predict_batch(SWAPTIONS) == ["Level 2", "Level 3"]
+    assert endpoint.hedged == 1
+    assert len(handler.calls) == endpoint.min_samples + 2
+
+
+def test_open_circuit_falls_back_to_rules_without_calling_the_endpoint(ml_stub):
+    handler = ml_stub(ml_latency=0.0, ml_error_rate=1.0)
+    endpoint = get_ml_endpoint()
+    rules = list(classify_frame(TRADES))
+    for _ in range(endpoint.breaker.failure_threshold):
+        levels, fallback = predict_mixed_frame(TRADES)
+        assert list(levels) == rules and fallback == 2
+    assert endpoint.breaker.state == "open"
+
+    calls = len(handler.calls)
+    with pytest.raises(CircuitOpenError):
+        predict_batch(SWAPTIONS)
+    levels, fallback = predict_mixed_frame(TRADES)
+    assert list(levels) == rules and fallback == 2
+    assert len(handler.calls) == calls
+
+
+def test_half_open_probe_recovers_the_circuit(ml_stub):
+    handler = ml_stub(ml_latency=0.0, ml_error_rate=1.0)
+    endpoint = get_ml_endpoint()
+    for _ in range(endpoint.breaker.failure_threshold):
+        predict_mixed_frame(TRADES)
+    assert endpoint.breaker.state == "open"
+
+    # A failed probe after the reset timeout reopens the circuit...
+    time.sleep(endpoint.breaker.reset_timeout)
+    with pytest.raises(Exception):
+        predict_batch(SWAPTIONS)
+    assert endpoint.breaker.state == "open"
+
+    # ...a successful one closes it, and the model serves the swaptions again
+    handler.ml_error_rate = 0.0
+    time.sleep(endpoint.breaker.reset_timeout)
+    levels, fallback = predict_mixed_frame(TRADES)
+    assert fallback == 0 and list(levels[:2]) == ["Level 2", "Level 3"]
+    assert endpoint.breaker.state == "closed"
+
+
+def test_metrics_report_latency_percentiles_and_errors(ml_stub):
+    handler = ml_stub(ml_latency=0.02)
+    endpoint = get_ml_endpoint()
+    for _ in range(10):
+        predict_batch(SWAPTIONS)
+    handler.ml_error_rate = 1.0
+    with pytest.raises(Exception):
+        predict_batch(SWAPTIONS)
+
+    metrics = endpoint.metrics()
+    assert metrics["endpoint"] == "azure_ml" and metrics["circuit"] == "closed"
+    assert metrics["calls"] == 11 and metrics["errors"] == 1 and metrics["hedged"] == 0
+    assert 0.02 <= metrics["p50_s"] <= metrics["p99_s"] < 1.0
+
+
+def test_model_calls_join_the_callers_trace(ml_stub):
+    handler = ml_stub(ml_latency=0.01)
+    endpoint = get_ml_endpoint()
+    for _ in range(endpoint.min_samples):
+        predict_batch(SWAPTIONS)
+    dispatcher = MicroBatchDispatcher(max_wait_ms=1.0)
+
+    # Through the dispatcher's sender thread and the endpoint pool, including a hedged duplicate
+    handler.ml_latency = 0.2
+    with span("test.caller"):
+        assert dispatcher.predict(SWAPTIONS[1], timeout=5) == "Level 3"
+    assert endpoint.hedged == 1
+
+    # Both attempts finish before the spans are read, the losing one after the dispatcher returned
+    time.sleep(0.3)
+    spans = list(get_span_recorder().recent)
+    trace_id, span_id = next(row[:2] for row in reversed(spans) if row[3] == "test.caller")
+    calls = [row for row in spans if row[0] == trace_id and row[3] == "ml.http"]
+    assert len(calls) == 2
+    assert all(row[2] == span_id for row in calls)
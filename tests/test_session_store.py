@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from session_store import ArtifactStore, artifact_bytes
+
+
+def frame(seed, rows=1000):
+    return pd.DataFrame({"value": np.random.default_rng(seed).random(rows), "label": "x"})
+
+
+def test_equal_artifacts_are_stored_once_and_counted_per_handle():
+    store = ArtifactStore()
+    store.put("A", "report", frame(1))
+    store.put("B", "report", frame(1))
+    store.put("B", "copy", frame(1))
+    metrics = store.metrics()
+    assert metrics["artifacts"] == 1 and metrics["handles"] == 3 and metrics["dedup_hits"] == 2
+    assert store.resident_bytes == artifact_bytes(frame(1))
+
+    # The artifact stays until its last handle goes
+    store.drop("B", "copy")
+    store.end_session("A")
+    assert store.metrics()["artifacts"] == 1
+    assert store.get("B", "report").equals(frame(1))
+    store.put("B", "report", frame(2))
+    assert store.metrics()["artifacts"] == 1 and store.get("B", "report").equals(frame(2))
+    store.end_session("B")
+    assert store.metrics()["artifacts"] == 0 and store.resident_bytes == 0
+    assert store.get("B", "report", "gone") == "gone"
+
+
+def test_session_budget_evicts_that_sessions_least_recently_used_handle():
+    size = artifact_bytes(frame(1))
+    store = ArtifactStore(session_budget_bytes=2 * size)
+    store.put("A", "first", frame(1))
+    store.put("A", "second", frame(2))
+    store.put("B", "first", frame(1))
+    store.get("A", "first")  # "second" is now the least recently used
+
+    store.put("A", "third", frame(3))
+    assert not store.has("A", "second")
+    assert store.has("A", "first") and store.has("A", "third")
+    assert store.session_bytes("A") == 2 * size
+    # Other sessions keep their handles to the shared artifact
+    assert store.has("B", "first")
+    assert store.metrics()["evictions"] == 1
+
+
+def test_global_budget_evicts_the_least_recently_used_artifact_from_every_session():
+    size = artifact_bytes(frame(1))
+    store = ArtifactStore(global_budget_bytes=2 * size)
+    store.put("A", "report", frame(1))
+    store.put("B", "report", frame(1))
+    store.put("B", "other", frame(2))
+
+    store.put("C", "new", frame(3))
+    assert not store.has("A", "report") and not store.has("B", "report")
+    assert store.has("B", "other") and store.has("C", "new")
+    assert store.resident_bytes == 2 * size and store.metrics()["artifacts"] == 2
+
+
+def test_sessions_cannot_change_a_shared_artifact():
+    store = ArtifactStore()
+    store.put("A", "report", frame(1))
+    store.put("A", "greeks", {"delta": [1.0]})
+    store.put("B", "report", frame(1))
+
+    view = store.get("A", "report")
+    with pytest.raises(ValueError):
+        view["value"].to_numpy()[0] = -1.0
+    try:
+        view.loc[0, "value"] = -1.0
+    except ValueError:
+        pass  # read-only arrays without copy-on-write
+    view["added"] = 1
+    store.get("A", "greeks")["delta"].append(2.0)
+
+    assert store.get("B", "report").equals(frame(1))
+    assert store.get("A", "greeks") == {"delta": [1.0]}
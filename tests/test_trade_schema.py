@@ -0,0 +1,82 @@
+import importlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_inference import INPUT_COLUMNS, predict_mixed_frame
+from benchmarks.bench_classification_rules import make_mixed_book
+from Observability_Stress_Module import run_observability_for_frame
+import trade_schema
+from trade_schema import load_trades, validate_trades
+
+
+def as_csv(df):
+    return io.StringIO(df.to_csv(index=False))
+
+
+@pytest.fixture
+def book():
+    book = make_mixed_book(400).astype({"expiry_tenor": object, "strike": object, "currency": object})
+    book["trading_desk"] = np.where(np.arange(len(book)) % 2, "Rates", "Credit")
+    return book
+
+
+def test_invalid_rows_are_reported_and_dropped(book):
+    book.loc[3, "currency"] = "CHF"
+    book.loc[5, "expiry_tenor"] = 2.5
+    book.loc[7, "strike"] = "abc"
+    trades, errors = load_trades(as_csv(book))
+    assert list(errors[["row", "column"]].itertuples(index=False, name=None)) == [
+        (4, "currency"), (6, "expiry_tenor"), (8, "strike")
+    ]
+    assert len(trades) == len(book) - 3
+    assert isinstance(trades["currency"].dtype, pd.CategoricalDtype)
+    assert trades["expiry_tenor"].dtype == "int8"
+
+
+def test_bonds_without_an_option_are_accepted(book):
+    # The Prediction page books bonds with option type "N/A" and expiry 0
+    bonds = book["product_type"] == "Bond"
+    book.loc[bonds, "option_type"] = "N/A"
+    book.loc[bonds, "expiry_tenor"] = 0
+    swaption = book.index[book["product_type"] == "IR Swaption"][:2]
+    book.loc[swaption[0], "option_type"] = "N/A"
+    book.loc[swaption[1], "expiry_tenor"] = 0
+    trades, errors = validate_trades(book)
+    assert set(errors["row"]) == {swaption[0] + 1, swaption[1] + 1}
+    assert bonds.sum() == (trades["product_type"] == "Bond").sum()
+
+
+def test_validated_frame_runs_through_inference_and_stress(book, monkeypatch):
+    # Regression: categorical currency / product_type broke the stress pass on pandas 2.x
+    monkeypatch.setenv("AZURE_ML_ENDPOINT", "http://127.0.0.1:9/score")  # unreachable: rules fallback
+    trades, _ = load_trades(as_csv(book))
+    plain = pd.read_csv(as_csv(book))
+
+    lean_levels, _ = predict_mixed_frame(trades)
+    plain_levels, _ = predict_mixed_frame(plain)
+    assert (lean_levels.to_numpy() == plain_levels.to_numpy()).all()
+
+    np.random.seed(3)
+    lean = run_observability_for_frame(trades[INPUT_COLUMNS])
+    np.random.seed(3)
+    expected = run_observability_for_frame(plain[INPUT_COLUMNS])
+    assert (lean.index == trades.index).all()
+    assert (lean["Observability Level"].to_numpy() == expected["Observability Level"].to_numpy()).all()
+    assert np.allclose(lean["Unobservable PV"], expected["Unobservable PV"])
+
+
+def test_tenor_dtype_holds_the_configured_limit(book, monkeypatch):
+    # Past 127 years an int8 would wrap round; the tenor type widens with the setting
+    monkeypatch.setenv("UPLOAD_MAX_TENOR_YEARS", "200")
+    try:
+        schema = importlib.reload(trade_schema)
+        book.loc[0, "maturity_tenor"] = 150
+        trades, errors = schema.validate_trades(book)
+        assert errors.empty
+        assert trades["maturity_tenor"].dtype == "int16" and trades.loc[0, "maturity_tenor"] == 150
+    finally:
+        monkeypatch.delenv("UPLOAD_MAX_TENOR_YEARS")
+        importlib.reload(trade_schema)
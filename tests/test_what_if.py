@@ -0,0 +1,82 @@
+import pytest
+import streamlit as st
+
+import what_if
+from what_if import mark_fresh, recompute, stale_stages
+
+TRADE = {"product_type": "IR Swaption", "currency": "EUR", "option_type": "Payer", "notional": 10_000_000,
+         "strike": 2.5, "expiry_tenor": 5, "maturity_tenor": 20}
+STAGES = ["model", "greeks", "stress"]
+
+
+@pytest.fixture(autouse=True)
+def session():
+    # Bare-mode session state is one dict per process; each test starts from an empty session
+    st.session_state.clear()
+    yield
+    st.session_state.clear()
+
+
+@pytest.fixture
+def predictions():
+    calls = []
+
+    def predict(trade):
+        calls.append(dict(trade))
+        return "Level 2", False
+
+    predict.calls = calls
+    return predict
+
+
+@pytest.mark.parametrize("field, value, stale", [
+    ("strike", 3.0, ["model"]),
+    ("option_type", "Receiver", ["model"]),
+    ("currency", "USD", ["model", "stress"]),
+    ("expiry_tenor", 2, ["model", "stress"]),
+    ("notional", 20_000_000, ["model", "greeks", "stress"]),
+    ("maturity_tenor", 30, ["model", "greeks", "stress"]),
+])
+def test_an_edit_makes_only_the_stages_reading_it_stale(predictions, field, value, stale):
+    assert stale_stages(TRADE, STAGES) == STAGES
+    assert recompute(TRADE, STAGES, predictions) == STAGES
+    assert stale_stages(TRADE, STAGES) == []
+
+    edited = dict(TRADE, **{field: value})
+    assert stale_stages(edited, STAGES) == stale
+    # A page that shows fewer stages only recomputes those
+    assert stale_stages(edited, ["stress"]) == (["stress"] if "stress" in stale else [])
+    assert recompute(edited, STAGES, predictions) == stale
+    assert stale_stages(edited, STAGES) == []
+    assert len(predictions.calls) == 2
+
+
+def test_unrelated_edits_keep_the_greeks_and_one_seed_reproduces_them(predictions):
+    recompute(TRADE, STAGES, predictions)
+    state = what_if.what_if_state()
+    greeks = state["greeks"]
+    pv = st.session_state["trade_pv"]
+
+    recompute(dict(TRADE, currency="USD"), STAGES, predictions)
+    assert state["greeks"] is greeks and st.session_state["trade_pv"] == pv
+
+    # Changing the notional redraws; changing it back draws the same greeks and PVs from the session seed
+    recompute(dict(TRADE, notional=20_000_000), STAGES, predictions)
+    assert state["greeks"] != greeks
+    recompute(TRADE, STAGES, predictions)
+    assert state["greeks"] == greeks and st.session_state["trade_pv"] == pv
+
+
+def test_workflow_results_are_not_recomputed(predictions):
+    # The workflow buttons ran the greeks and stress stages with their own seed
+    recompute(TRADE, ["model"], predictions)
+    greeks, trade_pv, generated_pvs = what_if.simulate_trade(dict(TRADE), 1234)
+    mark_fresh(TRADE, ["greeks", "stress"], seed=1234, greeks={**greeks, **generated_pvs},
+               trade_pv=trade_pv, generated_pvs=generated_pvs)
+    assert stale_stages(TRADE, STAGES) == []
+
+    st.session_state["rationale_text"] = "written for the old inputs"
+    assert recompute(dict(TRADE, currency="GBP"), STAGES, predictions) == ["model", "stress"]
+    assert what_if.what_if_state()["greeks"][1] == trade_pv
+    assert st.session_state["rationale_stale"]
+    assert st.session_state["audit_decision"]["seed"] == 1234
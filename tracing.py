@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from app_config import get_secret, get_int_setting, get_float_setting
+
+# (trace_id, span_id) of the innermost open span in this thread / task
+_current = ContextVar("current_span", default=None)
+
+
+# --- Span recorder: in-memory ring buffer, flushed to SQLite by a background thread ---
+class SpanRecorder:
+    def __init__(self, path, buffer_size=10000, flush_seconds=1.0, retention_hours=72):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.retention_hours = retention_hours
+        # Recent spans of this process, newest last; the SQLite file holds every process
+        self.recent = deque(maxlen=buffer_size)
+        self._pending = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spans (trace_id TEXT NOT NULL, span_id TEXT NOT NULL, parent_id TEXT, "
+                "name TEXT NOT NULL, start REAL NOT NULL, duration_ms REAL NOT NULL, ok INTEGER NOT NULL, attrs TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS spans_start ON spans (start)")
+            conn.execute("CREATE INDEX IF NOT EXISTS spans_trace ON spans (trace_id)")
+        self._thread = threading.Thread(target=self._flush_loop, name="span-flush", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def record(self, row):
+        with self._lock:
+            self.recent.append(row)
+            self._pending.append(row)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # tracing must never take the app down; spans stay in the ring buffer
+
+    def flush(self):
+        with self._lock:
+            rows = list(self._pending)
+            self._pending.clear()
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                if self.retention_hours and time.time() - self._last_prune > 600:
+                    conn.execute("DELETE FROM spans WHERE start < ?", (time.time() - self.retention_hours * 3600,))
+                    self._last_prune = time.time()
+        finally:
+            conn.close()
+
+    def query(self, since):
+        self.flush()
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT trace_id, span_id, parent_id, name, start, duration_ms, ok, attrs FROM spans "
+                "WHERE start >= ? ORDER BY start", (since,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def trace(self, trace_id):
+        self.flush()
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT trace_id, span_id, parent_id, name, start, duration_ms, ok, attrs FROM spans "
+                "WHERE trace_id = ? ORDER BY start", (trace_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_span_recorder():
+    # One recorder per process; every process appends to the same SQLite file
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = SpanRecorder(
+                path=get_secret("TRACE_DB_PATH", ".cache/traces.sqlite3"),
+                buffer_size=get_int_setting("TRACE_BUFFER_SIZE", 10000),
+                flush_seconds=get_float_setting("TRACE_FLUSH_SECONDS", 1.0),
+                retention_hours=get_float_setting("TRACE_RETENTION_HOURS", 72)
+            )
+        return _recorder
+
+
+_enabled = None
+
+
+def tracing_enabled():
+    # Read once per process; TRACING=off turns every span into a no-op
+    global _enabled
+    if _enabled is None:
+        _enabled = get_secret("TRACING", "on").lower() not in ("0", "off", "false")
+    return _enabled
+
+
+# --- Spans: nested spans share the trace id of the outermost one ---
+@contextmanager
+def span(name, **attrs):
+    if not tracing_enabled():
+        yield attrs
+        return
+    parent = _current.get()
+    trace_id = parent[0] if parent else uuid.uuid4().hex[:16]
+    span_id = uuid.uuid4().hex[:16]
+    token = _current.set((trace_id, span_id))
+    start = time.time()
+    counter = time.perf_counter()
+    ok = True
+    try:
+        # Callers may add attributes while the span is open (row counts, cache hits, routes)
+        yield attrs
+    except BaseException as e:
+        # Streamlit's st.rerun() / st.stop() unwind through spans as exceptions; they are not failures
+        ok = isinstance(e, GeneratorExit) or type(e).__name__ in ("RerunException", "StopException")
+        if not ok:
+            attrs["error"] = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        _current.reset(token)
+        duration_ms = (time.perf_counter() - counter) * 1000
+        get_span_recorder().record((
+            trace_id, span_id, parent[1] if parent else None, name, start, duration_ms, int(ok),
+            json.dumps(attrs, default=str) if attrs else None
+        ))
+
+
+def record_span(name, start, duration_ms, ok=True, **attrs):
+    # A finished span timed by the caller, as a child of the current span. For generators
+    # (streamed completions) that cannot hold a span open across their yields.
+    if not tracing_enabled():
+        return
+    parent = _current.get()
+    get_span_recorder().record((
+        parent[0] if parent else uuid.uuid4().hex[:16], uuid.uuid4().hex[:16], parent[1] if parent else None,
+        name, start, duration_ms, int(ok), json.dumps(attrs, default=str) if attrs else None
+    ))
+
+
+def traced(name):
+    # Decorator form of span() for functions that are a stage on their own
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+from app_config import get_float_setting, get_int_setting
+from batch_inference import INPUT_COLUMNS
+from classification_rules import PRODUCT_RULES
+from grid_history import VALUATION_DATE
+from Observability_Stress_Module import ois_curve_map
+
+# --- Trade file ingestion: explicit dtypes and vectorized domain checks ---
+# Batch uploads and CLI trade files are parsed into a lean frame with these types:
+# - categoricals for the low-cardinality text columns
+# - the smallest integer type for tenors that holds the tenor limit (int8 for the default 50 years)
+# - float64 strikes and notionals
+# Each domain rule is checked once over the whole file; the option type and expiry rules depend on
+# the product. A failing row is reported as (row, column, value, error) and left out of the frame,
+# so inference and the stress pass only see trades that the endpoint and the grids accept.
+PRODUCT_TYPES = list(PRODUCT_RULES)
+CURRENCIES = list(ois_curve_map)
+OPTION_TYPES = ["Receiver", "Payer"]
+# Bonds carry no option: the Prediction page books them with option type "N/A" and expiry tenor 0
+NO_OPTION = "N/A"
+NO_OPTION_PRODUCTS = ["Bond"]
+CATEGORIES = {"product_type": PRODUCT_TYPES, "currency": CURRENCIES, "option_type": [*OPTION_TYPES, NO_OPTION]}
+TENOR_COLUMNS = ["expiry_tenor", "maturity_tenor"]
+# Optional columns stored as categoricals of whatever values the file holds
+OPEN_CATEGORIES = ["trading_desk", "rating"]
+MAX_TENOR_YEARS = get_int_setting("UPLOAD_MAX_TENOR_YEARS", 50)
+TENOR_DTYPE = next(dtype for dtype in ("int8", "int16", "int32") if MAX_TENOR_YEARS <= np.iinfo(dtype).max)
+STRIKE_BOUNDS = (get_float_setting("UPLOAD_MIN_STRIKE", -5.0), get_float_setting("UPLOAD_MAX_STRIKE", 25.0))
+ERROR_COLUMNS = ["row", "column", "value", "error"]
+
+
+def missing_columns(columns, required=INPUT_COLUMNS):
+    return [col for col in required if col not in columns]
+
+
+def parse_trades(source, fmt="csv"):
+    # Text columns are parsed as categories, so each distinct string is held once
+    if fmt == "parquet":
+        return pd.read_parquet(source)
+    return pd.read_csv(source, dtype={col: "category" for col in [*CATEGORIES, *OPEN_CATEGORIES]})
+
+
+def _as_category(values):
+    return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+
+
+def validate_trades(df):
+    # (valid rows with the upload dtypes, one error row per failed check); row 1 is the first data row
+    problems = []
+
+    def flag(mask, col, error):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            problems.append(pd.DataFrame({
+                "row": np.flatnonzero(mask) + 1, "column": col,
+                "value": df[col].astype(str).to_numpy()[mask], "error": error
+            }))
+
+    checked = {}
+    for col, allowed in CATEGORIES.items():
+        values = _as_category(df[col])
+        checked[col] = values.cat.set_categories(allowed)
+        flag(values.isna(), col, "missing")
+        flag(values.notna() & checked[col].isna(), col, f"not one of {', '.join(allowed)}")
+
+    for col in ["notional", "strike", *TENOR_COLUMNS]:
+        checked[col] = pd.to_numeric(df[col], errors="coerce")
+        flag(df[col].isna(), col, "missing")
+        flag(df[col].notna() & checked[col].isna(), col, "not a number")
+    flag(checked["notional"] <= 0, "notional", "not positive")
+    low, high = STRIKE_BOUNDS
+    flag((checked["strike"] < low) | (checked["strike"] > high), "strike", f"outside {low:g} to {high:g}")
+
+    # Per-product rules: only products without an option may use "N/A" and a zero expiry
+    no_option = checked["product_type"].isin(NO_OPTION_PRODUCTS).to_numpy()
+    flag((checked["option_type"] == NO_OPTION).to_numpy() & ~no_option, "option_type",
+         f"{NO_OPTION} only for {', '.join(NO_OPTION_PRODUCTS)}")
+    min_tenor = {"expiry_tenor": np.where(no_option, 0, 1), "maturity_tenor": 1}
+    for col in TENOR_COLUMNS:
+        tenor = checked[col]
+        flag(tenor % 1 > 0, col, "not whole years")
+        flag((tenor < min_tenor[col]) | (tenor > MAX_TENOR_YEARS), col, f"outside 1 to {MAX_TENOR_YEARS} years"
+             + (f" (0 for {', '.join(NO_OPTION_PRODUCTS)})" if col == "expiry_tenor" else ""))
+
+    if VALUATION_DATE in df.columns:
+        # Blank dates are allowed (classified as of today); text that is not a date is not
+        checked[VALUATION_DATE] = pd.to_datetime(df[VALUATION_DATE], errors="coerce")
+        flag(df[VALUATION_DATE].notna() & checked[VALUATION_DATE].isna(), VALUATION_DATE, "not a date")
+
+    errors = pd.concat(problems, ignore_index=True) if problems else pd.DataFrame(columns=ERROR_COLUMNS)
+    keep = np.ones(len(df), dtype=bool)
+    keep[errors["row"].to_numpy(dtype=int) - 1] = False
+
+    trades = df[keep].copy()
+    for col, values in checked.items():
+        trades[col] = values[keep]
+    for col in TENOR_COLUMNS:
+        trades[col] = trades[col].astype(TENOR_DTYPE)
+    if (trades["notional"] % 1 == 0).all():
+        trades["notional"] = trades["notional"].astype("int64")
+    for col in OPEN_CATEGORIES:
+        if col in trades.columns:
+            trades[col] = _as_category(trades[col])
+    return trades, errors.sort_values(["row", "column"], ignore_index=True)
+
+
+def load_trades(source, fmt="csv"):
+    # Parse and validate; a file missing required columns is rejected as a whole
+    df = parse_trades(source, fmt)
+    missing = missing_columns(df.columns)
+    if missing:
+        raise ValueError(f"Trade file is missing columns: {', '.join(missing)}")
+    return validate_trades(df)
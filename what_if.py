@@ -0,0 +1,166 @@
+import time
+
+import pandas as pd
+import streamlit as st
+
+from app_config import get_float_setting
+from audit_log import report_decision
+from ml_client import MODEL_COLUMNS, build_payload
+from Observability_Stress_Module import (
+    ir_delta_stress_test,
+    new_seed,
+    ois_curve_map,
+    simulate_trade,
+    vol_risk_stress_test
+)
+from session_store import put_artifact
+from tracing import span
+
+# --- What-if mode: recompute only the workflow stages a sidebar edit makes stale ---
+# Each stage is keyed by the trade inputs it reads plus the keys of the stages it builds on; a stage
+# whose key is unchanged keeps its result. Greeks and PVs are drawn from one seed per session, so
+# a rerun with the same inputs reproduces them and an unrelated edit never reshuffles the PVs.
+STAGE_INPUTS = {
+    "model": MODEL_COLUMNS,                                                  # every feature goes to the endpoint
+    "greeks": ["product_type", "notional", "maturity_tenor"],                # the greek generators' inputs
+    "stress": ["product_type", "currency", "expiry_tenor", "maturity_tenor"] # OIS curve and grid lookups
+}
+STAGE_UPSTREAM = {"stress": ["greeks"]}
+STAGE_ORDER = ["model", "greeks", "stress"]
+
+# Sidebar edits closer together than this are coalesced into one recompute
+DEBOUNCE_SECONDS = get_float_setting("WHAT_IF_DEBOUNCE_SECONDS", 0.5)
+
+
+def stage_keys(trade, seed):
+    keys = {}
+    for stage in STAGE_ORDER:
+        keys[stage] = tuple(trade[field] for field in STAGE_INPUTS[stage]) + tuple(
+            keys[upstream] for upstream in STAGE_UPSTREAM.get(stage, [])
+        )
+    keys["greeks"] += (seed,)
+    return keys
+
+
+def what_if_state():
+    if "what_if" not in st.session_state:
+        st.session_state["what_if"] = {"seed": new_seed(), "keys": {}, "greeks": None, "trade": None,
+                                       "changed_at": 0.0, "last": None}
+    return st.session_state["what_if"]
+
+
+def stale_stages(trade, stages):
+    state = what_if_state()
+    keys = stage_keys(trade, state["seed"])
+    stale = [stage for stage in stages if state["keys"].get(stage) != keys[stage]]
+    # A stale upstream stage makes its dependants stale too, even if their own key matched
+    for stage in stages:
+        if any(upstream in stale for upstream in STAGE_UPSTREAM.get(stage, [])) and stage not in stale:
+            stale.append(stage)
+    return [stage for stage in STAGE_ORDER if stage in stale]
+
+
+def mark_fresh(trade, stages, seed=None, greeks=None, trade_pv=None, generated_pvs=None):
+    # The workflow buttons ran these stages themselves; what-if continues from their results
+    state = what_if_state()
+    if seed is not None:
+        state["seed"] = seed
+    if greeks is not None:
+        state["greeks"] = ({k: v for k, v in greeks.items() if not k.endswith(" PV")}, trade_pv, dict(generated_pvs))
+    keys = stage_keys(trade, state["seed"])
+    for stage in stages:
+        state["keys"][stage] = keys[stage]
+
+
+# --- Stages: compute one stage and publish it where the workflow sections read their results ---
+def _run_model(trade, state, predict):
+    start = time.time()
+    prediction, used_fallback = predict(trade)
+    put_artifact("model_payload", build_payload([trade]))
+    put_artifact("model_output", [prediction])
+    st.session_state.update({
+        "model_pred": prediction,
+        "ifrs13_level": prediction,
+        "ml_done": True,
+        "ML_Model_elapsed_time": round(time.time() - start, 4),
+        "ML_Model_fallback": used_fallback
+    })
+
+
+def _run_greeks(trade, state, predict):
+    state["greeks"] = simulate_trade(dict(trade), state["seed"])
+
+
+def _run_stress(trade, state, predict):
+    base_greeks, trade_pv, generated_pvs = state["greeks"]
+    greeks = {**base_greeks, **generated_pvs, "OIS Curve": ois_curve_map.get(trade["currency"], "UNKNOWN")}
+    trade = dict(trade, trade_pv=trade_pv)
+    ir_stressed, ir_report, ir_stress_pv, ir_msgs = ir_delta_stress_test(trade, greeks)
+    vol_stressed, vol_report, vol_stress_pv, vol_msgs = vol_risk_stress_test(trade, greeks)
+    level = "Level 3" if ir_stress_pv + vol_stress_pv > 0.1 * trade_pv else "Level 2"
+
+    put_artifact("greeks", greeks)
+    put_artifact("generated_pvs", generated_pvs)
+    put_artifact("ir_report_df", pd.DataFrame(ir_report).T)
+    put_artifact("vol_report_df", pd.DataFrame(vol_report).T)
+    st.session_state.update({
+        "ir_summary": ir_msgs,
+        "vol_summary": vol_msgs,
+        "trade_pv": trade_pv,
+        "ir_stress_pv": ir_stress_pv,
+        "vol_stress_pv": vol_stress_pv,
+        "rf_level": level,
+        "final_level": level,
+        "rf_done": True,
+        # Audited when a rationale is generated for it, not on every what-if edit
+        "audit_decision": report_decision(trade, greeks, {**ir_report, **vol_report},
+                                          model_pred=st.session_state.get("model_pred"), seed=state["seed"])
+    })
+
+
+STAGE_RUNNERS = {"model": _run_model, "greeks": _run_greeks, "stress": _run_stress}
+
+
+def recompute(trade, stages, predict=None):
+    state = what_if_state()
+    stale = stale_stages(trade, stages)
+    if not stale:
+        return stale
+    start = time.perf_counter()
+    with span("what_if.recompute", stages=",".join(stale)):
+        keys = stage_keys(trade, state["seed"])
+        for stage in stale:
+            STAGE_RUNNERS[stage](trade, state, predict)
+            state["keys"][stage] = keys[stage]
+    if "rationale_text" in st.session_state:
+        st.session_state["rationale_stale"] = True
+    state["last"] = (stale, (time.perf_counter() - start) * 1000)
+    return stale
+
+
+@st.fragment(run_every=0.25)
+def _debounced_recompute(trade, stages, predict):
+    # Polls only while an edit is pending: the full rerun below no longer renders this fragment
+    state = what_if_state()
+    if time.time() - state["changed_at"] < DEBOUNCE_SECONDS:
+        st.caption("⏳ Updating what-if results…")
+        return
+    recompute(trade, stages, predict)
+    st.rerun()
+
+
+def what_if_sidebar(trade, stages, predict=None):
+    # Sidebar toggle; in what-if mode, stale stages recompute once the inputs settle
+    if not st.sidebar.toggle("What-if mode", key="what_if_mode",
+                             help="Recompute only the results a trade input change affects, as you edit"):
+        return
+    state = what_if_state()
+    if state["trade"] != trade:
+        state["trade"] = dict(trade)
+        state["changed_at"] = time.time()
+    with st.sidebar:
+        if stale_stages(trade, stages):
+            _debounced_recompute(trade, stages, predict)
+        elif state["last"]:
+            ran, ms = state["last"]
+            st.caption(f"What-if: recomputed {', '.join(ran)} in {ms:.0f} ms")